@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, UniqueConstraint
+from datetime import datetime
+from db import Base
+
+
+class IdempotencyKey(Base):
+    """Result of a successfully applied batch operation, keyed by the client-supplied key"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    op = Column(String, nullable=False)  # meal, hydration, sleep, mood, workout
+    status_code = Column(Integer, nullable=False)
+    response_json = Column(Text, nullable=False)  # Serialized result returned on replay
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
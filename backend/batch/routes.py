@@ -0,0 +1,151 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, List, Tuple
+import json
+
+from db import get_db
+from auth.routes import get_current_user
+from auth.models import User
+from batch.models import IdempotencyKey
+from nutrition.routes import add_meal
+from hydration.routes import add_water_intake
+from sleep.routes import add_sleep_log
+from mind.routes import add_mood_log
+from mind.schemas import MoodResponse
+from fitness.routes import update_workout_log
+from schemas import (
+    BatchRequest, BatchResponse,
+    MealResponse, HydrationResponse, SleepLogResponse, WorkoutLogResponse
+)
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+# op -> (staging function, response schema, success status code)
+BATCH_HANDLERS = {
+    "meal": (add_meal, MealResponse, status.HTTP_201_CREATED),
+    "hydration": (add_water_intake, HydrationResponse, status.HTTP_200_OK),
+    "sleep": (add_sleep_log, SleepLogResponse, status.HTTP_200_OK),
+    "mood": (add_mood_log, MoodResponse, status.HTTP_200_OK),
+    "workout": (update_workout_log, WorkoutLogResponse, status.HTTP_200_OK),
+}
+
+
+def _is_key_conflict(error: IntegrityError) -> bool:
+    return "idempotency_keys" in str(error.orig)
+
+
+def _apply_operations(db: Session, user_id: int, operations) -> Tuple[List[Dict], int]:
+    """Stage every operation (caller commits); returns (per-item results, applied count)"""
+    keys = {op.idempotency_key for op in operations if op.idempotency_key}
+    applied_keys = {}
+    if keys:
+        applied_keys = {
+            row.key: row
+            for row in db.query(IdempotencyKey).filter(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key.in_(keys)
+            ).all()
+        }
+    
+    results = []
+    applied = 0
+    
+    for index, operation in enumerate(operations):
+        result = {
+            "index": index,
+            "op": operation.op,
+            "idempotency_key": operation.idempotency_key
+        }
+        
+        # Replay a previously applied operation (including earlier in this batch)
+        previous = applied_keys.get(operation.idempotency_key) if operation.idempotency_key else None
+        if previous:
+            result.update(
+                status_code=previous.status_code,
+                replayed=True,
+                data=json.loads(previous.response_json)
+            )
+            results.append(result)
+            continue
+        
+        handler, response_schema, success_code = BATCH_HANDLERS[operation.op]
+        try:
+            record = handler(db, user_id, operation.data)
+        except HTTPException as e:
+            # Handlers run their checks before staging any change
+            result.update(status_code=e.status_code, error=e.detail)
+            results.append(result)
+            continue
+        
+        data = response_schema.model_validate(record).model_dump(mode="json")
+        result.update(status_code=success_code, data=data)
+        applied += 1
+        
+        if operation.idempotency_key:
+            key_row = IdempotencyKey(
+                user_id=user_id,
+                key=operation.idempotency_key,
+                op=operation.op,
+                status_code=success_code,
+                response_json=json.dumps(data)
+            )
+            db.add(key_row)
+            applied_keys[operation.idempotency_key] = key_row
+        
+        results.append(result)
+    
+    return results, applied
+
+
+@router.post("", response_model=BatchResponse)
+def run_batch(
+    batch: BatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Apply many logging operations (meal, hydration, sleep, mood, workout) in one transaction.
+    
+    Each operation is validated with the same schema as its single-record endpoint.
+    Operations that fail a check (e.g. unknown workout log) are reported per item and
+    skipped; everything else is committed together. Operations carrying an
+    idempotency_key that was already applied are not re-run - the stored result is
+    returned with replayed=true.
+    
+    When a concurrent batch commits one of the same idempotency keys first, the batch
+    is rolled back and run once more, replaying that batch's results; a second
+    conflict returns 409.
+    """
+    for attempt in range(2):
+        try:
+            results, applied = _apply_operations(db, current_user.id, batch.operations)
+            db.commit()
+            break
+        except IntegrityError as e:
+            db.rollback()
+            if not _is_key_conflict(e):
+                print(f"Batch failed: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Batch failed and was rolled back: {str(e)}"
+                )
+            if attempt == 1:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Idempotency keys in this batch are being applied by another request; retry later"
+                )
+            print("Batch idempotency key conflict, re-running to replay the other request's results")
+        except Exception as e:
+            db.rollback()
+            print(f"Batch failed: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Batch failed and was rolled back: {str(e)}"
+            )
+    
+    return {
+        "results": results,
+        "applied": applied,
+        "failed": sum(1 for r in results if r.get("error"))
+    }
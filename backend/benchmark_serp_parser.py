@@ -0,0 +1,127 @@
+"""
+Benchmark SERP HTML parsing over a corpus of saved Google result pages.
+
+Times rag.serp_parser.parse_google_results against the previous BeautifulSoup
+(html.parser) implementation, when bs4 is installed, and reports pages where
+the two disagree on result URLs.
+
+Usage:
+    python benchmark_serp_parser.py                  # rag/serp_corpus + SERP_DEBUG_DIR
+    python benchmark_serp_parser.py <dir|file> ...   # specific pages
+    python benchmark_serp_parser.py -n 50 <dir>      # repetitions per page (default 20)
+"""
+import os
+import statistics
+import sys
+import time
+
+from rag.serp_parser import DEBUG_DIR, parse_google_results
+
+DEFAULT_CORPUS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag", "serp_corpus"), DEBUG_DIR]
+
+
+def legacy_parse(html):
+    """The BeautifulSoup parser this benchmark is measured against"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+    for h3 in soup.find_all('h3', limit=10):
+        link_elem = h3.find_parent('a')
+        if not link_elem:
+            parent = h3.find_parent('div')
+            if parent:
+                link_elem = parent.find('a', href=True)
+        if not link_elem:
+            continue
+        title = h3.get_text(strip=True)
+        url = link_elem.get('href', '')
+        if url.startswith('/url?q='):
+            url = url.split('/url?q=')[1].split('&')[0]
+        text = ''
+        parent_div = h3.find_parent('div')
+        if parent_div:
+            for sibling in parent_div.find_all('div'):
+                sibling_text = sibling.get_text(strip=True)
+                if len(sibling_text) > 50 and sibling_text != title:
+                    text = sibling_text[:300]
+                    break
+        if url and url.startswith('http'):
+            results.append({'title': title, 'url': url, 'text': text})
+            if len(results) >= 5:
+                break
+    return results
+
+
+def load_corpus(paths):
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".html")]
+        elif os.path.isfile(path):
+            files = [path]
+        else:
+            continue
+        for file_path in files:
+            with open(file_path, encoding="utf-8", errors="replace") as f:
+                pages.append((file_path, f.read()))
+    return pages
+
+
+def time_parser(parse, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = parse(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, results
+
+
+def summarize(name, timings):
+    timings = sorted(timings)
+    p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+    print(f"{name:>8}: median {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms   max {timings[-1]:7.2f} ms")
+
+
+def run(paths, repeat):
+    pages = load_corpus(paths)
+    if not pages:
+        print(f"❌ No .html pages found in {', '.join(paths)}")
+        return
+
+    try:
+        import bs4  # noqa: F401
+        parsers = {"lxml": parse_google_results, "bs4": legacy_parse}
+    except ImportError:
+        print("beautifulsoup4 not installed, timing the lxml parser only")
+        parsers = {"lxml": parse_google_results}
+
+    totals = {name: [] for name in parsers}
+    mismatches = 0
+    for file_path, html in pages:
+        urls = {}
+        for name, parse in parsers.items():
+            timings, results = time_parser(parse, html, repeat)
+            totals[name].extend(timings)
+            urls[name] = [result["url"] for result in results]
+        if len(set(map(tuple, urls.values()))) > 1:
+            mismatches += 1
+            print(f"⚠️  {os.path.basename(file_path)}: result URLs differ")
+            for name, parsed in urls.items():
+                print(f"      {name}: {parsed}")
+
+    print(f"\n{len(pages)} pages x {repeat} runs ({sum(len(html) for _, html in pages) // 1024} KB)")
+    for name, timings in totals.items():
+        summarize(name, timings)
+    if mismatches:
+        print(f"⚠️  {mismatches} page(s) parsed differently")
+    else:
+        print("✅ Parsers agree on result URLs for every page")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = 20
+    if len(args) >= 2 and args[0] == "-n":
+        repeat = int(args[1])
+        args = args[2:]
+    run(args or DEFAULT_CORPUS, repeat)
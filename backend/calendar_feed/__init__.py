@@ -0,0 +1 @@
+# Calendar module
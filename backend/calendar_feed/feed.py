@@ -0,0 +1,275 @@
+"""
+Per-user health calendar.
+
+Merges appointments, enabled reminders and lab retest dates (LabReport.next_test_date)
+into one time-ordered event stream. Each source yields events in start order:
+appointments and retests come from window-bounded indexed queries, recurring
+reminders are expanded lazily occurrence by occurrence up to the window end,
+and heapq.merge interleaves them without materializing every occurrence first.
+
+Rendered feeds are cached per (user, format, window) and revalidated against a
+version fingerprint: the newest sync change id for the user's reminders and
+appointments (every write to those tables lands in sync_changes) plus the count
+and latest update of their lab reports with a retest date. The fingerprint is
+also the basis of the ETag, so unchanged polls are answered without rendering.
+"""
+import hashlib
+import heapq
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from appointment.models import Appointment
+from nutrition.models import LabReport
+from reminder.models import Reminder
+from reminder.scheduler import DAY_CODES, ReminderSpec
+from sync.models import SyncChange
+
+CACHE_SIZE = 2048
+ICS_PAST_DAYS = 30  # Window for one-time events in the .ics feed
+ICS_FUTURE_DAYS = 365
+
+_cache: "OrderedDict[Tuple, Tuple[Tuple, bytes]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def calendar_version(db: Session, user_id: int) -> Tuple:
+    """Fingerprint that changes on any write to the user's calendar sources"""
+    last_change = db.query(func.max(SyncChange.id)).filter(
+        SyncChange.user_id == user_id,
+        SyncChange.entity.in_(("reminders", "appointments"))
+    ).scalar()
+    lab_count, lab_updated = db.query(func.count(LabReport.id), func.max(LabReport.updated_at)).filter(
+        LabReport.user_id == user_id,
+        LabReport.next_test_date.isnot(None)
+    ).one()
+    return (last_change, lab_count, lab_updated.isoformat() if lab_updated else None)
+
+
+def calendar_etag(version: Tuple, key: Tuple) -> str:
+    digest = hashlib.sha1(repr((version, key)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def cached_render(db: Session, user_id: int, key: Tuple, render) -> Tuple[bytes, str]:
+    """
+    Return (body, etag) for a feed, rendering it only when the user's calendar changed.
+
+    Args:
+        key: Identifies the feed variant (format and window)
+        render: Callable producing the body bytes
+    """
+    version = calendar_version(db, user_id)
+    cache_key = (user_id,) + key
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(cache_key)
+            return cached[1], calendar_etag(version, key)
+
+    body = render()
+    with _cache_lock:
+        _cache[cache_key] = (version, body)
+        _cache.move_to_end(cache_key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return body, calendar_etag(version, key)
+
+
+# ----- event sources (each yields events in start order) -----
+
+def _appointment_events(db: Session, user_id: int, start: datetime, end: datetime) -> Iterator[Dict]:
+    rows = db.query(
+        Appointment.id, Appointment.title, Appointment.appointment_type, Appointment.appointment_datetime,
+        Appointment.location, Appointment.doctor_name, Appointment.notes, Appointment.is_completed
+    ).filter(
+        Appointment.user_id == user_id,
+        Appointment.appointment_datetime >= start,
+        Appointment.appointment_datetime < end
+    ).order_by(Appointment.appointment_datetime)
+    for row in rows:
+        yield {
+            "uid": f"appointment-{row.id}",
+            "source": "appointment",
+            "source_id": row.id,
+            "title": row.title,
+            "category": row.appointment_type,
+            "start": row.appointment_datetime,
+            "description": row.notes,
+            "location": row.location,
+            "doctor_name": row.doctor_name,
+            "completed": bool(row.is_completed)
+        }
+
+
+def _lab_retest_events(db: Session, user_id: int, start: datetime, end: datetime) -> Iterator[Dict]:
+    rows = db.query(LabReport.id, LabReport.report_name, LabReport.next_test_date).filter(
+        LabReport.user_id == user_id,
+        LabReport.next_test_date >= start,
+        LabReport.next_test_date < end
+    ).order_by(LabReport.next_test_date)
+    for row in rows:
+        yield {
+            "uid": f"lab-retest-{row.id}",
+            "source": "lab_retest",
+            "source_id": row.id,
+            "title": f"Lab retest: {row.report_name}",
+            "category": "lab_test",
+            "start": row.next_test_date,
+            "description": "Follow-up test recommended from your lab report analysis",
+            "location": None,
+            "doctor_name": None,
+            "completed": False
+        }
+
+
+def _reminder_rows(db: Session, user_id: int):
+    return db.query(
+        Reminder.id, Reminder.user_id, Reminder.title, Reminder.reminder_type, Reminder.description,
+        Reminder.time, Reminder.days, Reminder.reminder_datetime, Reminder.is_completed
+    ).filter(
+        Reminder.user_id == user_id,
+        Reminder.enabled.is_(True)
+    ).all()
+
+
+def _reminder_event(spec: ReminderSpec, occurrence: datetime, completed: bool = False) -> Dict:
+    return {
+        "uid": f"reminder-{spec.id}-{occurrence:%Y%m%dT%H%M}" if spec.recurring else f"reminder-{spec.id}",
+        "source": "reminder",
+        "source_id": spec.id,
+        "title": spec.title,
+        "category": spec.reminder_type,
+        "start": occurrence,
+        "description": spec.description,
+        "location": None,
+        "doctor_name": None,
+        "completed": completed
+    }
+
+
+def _occurrences(spec: ReminderSpec, start: datetime, end: datetime) -> Iterator[Dict]:
+    """Lazily expand one reminder's occurrences within [start, end)"""
+    occurrence = spec.next_fire(start - timedelta(microseconds=1))
+    while occurrence is not None and occurrence < end:
+        yield _reminder_event(spec, occurrence)
+        occurrence = spec.next_fire(occurrence)
+
+
+def calendar_events(db: Session, user_id: int, start: datetime, end: datetime) -> Iterator[Dict]:
+    """All calendar events in [start, end), merged in start order"""
+    sources = [_appointment_events(db, user_id, start, end), _lab_retest_events(db, user_id, start, end)]
+    for row in _reminder_rows(db, user_id):
+        spec = ReminderSpec(row)
+        if spec.recurring:
+            sources.append(_occurrences(spec, start, end))
+        elif spec.reminder_datetime and start <= spec.reminder_datetime < end:
+            sources.append(iter([_reminder_event(spec, spec.reminder_datetime, bool(row.is_completed))]))
+    return heapq.merge(*sources, key=lambda event: event["start"])
+
+
+def render_json(db: Session, user_id: int, start: date, end: date) -> bytes:
+    window_start = datetime.combine(start, datetime.min.time())
+    window_end = datetime.combine(end, datetime.min.time()) + timedelta(days=1)
+    events = list(calendar_events(db, user_id, window_start, window_end))
+    return orjson.dumps({"from": start, "to": end, "events": events})
+
+
+# ----- iCalendar -----
+
+def _ics_escape(text: Optional[str]) -> str:
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _ics_fold(line: str) -> str:
+    """Fold content lines longer than 75 octets (RFC 5545 3.1)"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Do not split a multi-byte UTF-8 sequence
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts)
+
+
+def _ics_time(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")  # Floating (server-local) time, like the stored values
+
+
+def _vevent(uid: str, stamp: str, start: datetime, title: str, description: Optional[str],
+            location: Optional[str] = None, rrule: Optional[str] = None) -> List[str]:
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@vitaledger",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_ics_time(start)}",
+        f"DURATION:PT{15 if rrule else 30}M",
+        f"SUMMARY:{_ics_escape(title)}",
+    ]
+    if description:
+        lines.append(f"DESCRIPTION:{_ics_escape(description)}")
+    if location:
+        lines.append(f"LOCATION:{_ics_escape(location)}")
+    if rrule:
+        lines.append(f"RRULE:{rrule}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def _rrule(spec: ReminderSpec) -> str:
+    if spec.days is None:
+        return "FREQ=DAILY"
+    byday = ",".join(DAY_CODES[day][:2].upper() for day in sorted(spec.days))
+    return f"FREQ=WEEKLY;BYDAY={byday}"
+
+
+def render_ics(db: Session, user_id: int, today: date) -> bytes:
+    """
+    iCalendar feed. One-time events within ICS_PAST_DAYS/ICS_FUTURE_DAYS of today are
+    listed individually; recurring reminders are emitted once with an RRULE so the
+    calendar app expands them.
+    """
+    start = datetime.combine(today - timedelta(days=ICS_PAST_DAYS), datetime.min.time())
+    end = datetime.combine(today + timedelta(days=ICS_FUTURE_DAYS), datetime.min.time())
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//VitaLedger//Health Calendar//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:VitaLedger",
+    ]
+
+    one_time = heapq.merge(
+        _appointment_events(db, user_id, start, end),
+        _lab_retest_events(db, user_id, start, end),
+        key=lambda event: event["start"]
+    )
+    for event in one_time:
+        lines.extend(_vevent(event["uid"], stamp, event["start"], event["title"], event["description"],
+                             event["location"]))
+
+    for row in _reminder_rows(db, user_id):
+        spec = ReminderSpec(row)
+        if spec.recurring:
+            # Anchor the series at its first occurrence in the window
+            first = spec.next_fire(start - timedelta(microseconds=1))
+            if first is not None:
+                lines.extend(_vevent(f"reminder-{spec.id}", stamp, first, spec.title, spec.description, rrule=_rrule(spec)))
+        elif spec.reminder_datetime and start <= spec.reminder_datetime < end:
+            lines.extend(_vevent(f"reminder-{spec.id}", stamp, spec.reminder_datetime, spec.title, spec.description))
+
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_ics_fold(line) for line in lines) + "\r\n").encode("utf-8")
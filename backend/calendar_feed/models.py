@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from datetime import datetime
+from db import Base
+
+
+class CalendarFeedToken(Base):
+    """
+    Read-only token for subscribing to the .ics feed from calendar apps.
+
+    Only the SHA-256 of the token is stored; the token itself is shown once when
+    issued. Issuing a new token revokes the previous one.
+    """
+    __tablename__ = "calendar_feed_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    token_hash = Column(String, nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    revoked_at = Column(DateTime, nullable=True)
@@ -0,0 +1,139 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import Optional
+import hashlib
+import secrets
+
+from db import get_db
+from auth.models import User
+from auth.routes import get_current_user
+from auth.utils import verify_token
+from file_responses import etag_matches
+from calendar_feed.feed import cached_render, render_ics, render_json
+from calendar_feed.models import CalendarFeedToken
+from schemas import CalendarResponse, CalendarFeedTokenResponse
+
+router = APIRouter(tags=["calendar"])
+
+MAX_WINDOW_DAYS = 366
+DEFAULT_WINDOW_DAYS = 30
+
+optional_security = HTTPBearer(auto_error=False)
+
+
+def _hash_feed_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_feed_user(
+    token: Optional[str] = Query(None, description="Calendar feed token (POST /calendar/feed-token), for calendar apps that cannot send headers"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Authenticate the .ics feed with the Authorization header or a ?token= calendar
+    feed token. Access tokens are never accepted in the query string.
+    """
+    user = None
+    if credentials:
+        token_data = verify_token(credentials.credentials)
+        if token_data is not None:
+            user = db.query(User).filter(User.email == token_data.email).first()
+    elif token:
+        user = db.query(User).join(CalendarFeedToken, CalendarFeedToken.user_id == User.id).filter(
+            CalendarFeedToken.token_hash == _hash_feed_token(token),
+            CalendarFeedToken.revoked_at.is_(None)
+        ).first()
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+def _revoke_feed_tokens(db: Session, user_id: int) -> None:
+    db.query(CalendarFeedToken).filter(
+        CalendarFeedToken.user_id == user_id,
+        CalendarFeedToken.revoked_at.is_(None)
+    ).update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+
+
+@router.post("/calendar/feed-token", response_model=CalendarFeedTokenResponse)
+def create_feed_token(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Issue a read-only calendar feed token (revoking the previous one) and its subscription URL"""
+    token = secrets.token_urlsafe(32)
+    _revoke_feed_tokens(db, current_user.id)
+    db.add(CalendarFeedToken(user_id=current_user.id, token_hash=_hash_feed_token(token)))
+    db.commit()
+    return {"token": token, "ics_url": f"{request.url_for('get_calendar_ics')}?token={token}"}
+
+
+@router.delete("/calendar/feed-token", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_feed_token(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Revoke the calendar feed token; subscribed calendar apps stop receiving updates"""
+    _revoke_feed_tokens(db, current_user.id)
+    db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _conditional_response(request: Request, body: bytes, etag: str, media_type: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+@router.get("/calendar.ics")
+def get_calendar_ics(
+    request: Request,
+    current_user: User = Depends(get_feed_user),
+    db: Session = Depends(get_db)
+):
+    """iCalendar feed of appointments, reminders and lab retest dates"""
+    today = date.today()
+    body, etag = cached_render(
+        db, current_user.id, ("ics", today),
+        lambda: render_ics(db, current_user.id, today)
+    )
+    return _conditional_response(request, body, etag, "text/calendar; charset=utf-8")
+
+
+@router.get("/calendar", response_model=CalendarResponse)
+def get_calendar(
+    request: Request,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Calendar events between from and to (inclusive dates, default the next 30 days)"""
+    start = from_date or date.today()
+    end = to_date or start + timedelta(days=DEFAULT_WINDOW_DAYS)
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'to' must not be before 'from'"
+        )
+    if (end - start).days > MAX_WINDOW_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Calendar window cannot exceed {MAX_WINDOW_DAYS} days"
+        )
+
+    body, etag = cached_render(
+        db, current_user.id, ("json", start, end),
+        lambda: render_json(db, current_user.id, start, end)
+    )
+    return _conditional_response(request, body, etag, "application/json")
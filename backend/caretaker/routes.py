@@ -12,6 +12,8 @@ from auth.routes import get_current_user
 from rag.store import get_store
 from caretaker.knowledge_base import APPLICATION_KNOWLEDGE
 from groq import Groq
+from limits.admission import llm_admission
+from llm.dispatch import llm_dispatcher, INTERACTIVE
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/caretaker", tags=["caretaker"])
@@ -138,7 +140,7 @@ def index_knowledge_base():
 @router.post("/assistant/chat")
 async def caretaker_chat(
     payload: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(llm_admission())
 ):
     """
     CareTaker AI Assistant - answers questions about VitalEdger application.
@@ -186,7 +188,9 @@ User question: {message}
 Provide a clear, helpful response about the VitalEdger application. Include specific feature names and how to use them when relevant."""
 
         client = get_groq_client()
-        response = client.chat.completions.create(
+        response = await llm_dispatcher.acomplete(
+            client,
+            INTERACTIVE,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": full_prompt}
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -20,3 +20,23 @@ def get_db():
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+
+def bulk_insert(db, model, rows):
+    """
+    Insert many rows of a model with a single executemany statement (caller commits).
+    Returns the new primary keys.
+    """
+    if not rows:
+        return []
+    return list(db.execute(insert(model).returning(model.id), rows).scalars())
+
+def json_array_item(db, model, column, array_path, key, value, *criteria):
+    """
+    Return the JSON text of the element in a JSON array column whose `key` equals
+    `value` (e.g. one day of a plan), or None. Uses SQLite JSON1 json_each so only
+    that slice is read out of the stored document.
+    """
+    items = func.json_each(column, array_path).table_valued("value").alias("items")
+    return db.query(items.c.value).select_from(model).join(
+        items, func.json_extract(items.c.value, f"$.{key}") == value
+    ).filter(*criteria).limit(1).scalar()
@@ -0,0 +1,152 @@
+"""
+File download helpers.
+
+`file_download` serves a file from disk with conditional GET (If-None-Match)
+and single-range HTTP Range requests, streaming it in chunks so large files are
+never held in memory. Multi-range requests are answered with the full file,
+which RFC 9110 allows.
+"""
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that sends only `length` bytes starting at `offset`"""
+
+    def __init__(self, path, offset: int, length: int, **kwargs):
+        super().__init__(path, **kwargs)
+        self.offset = offset
+        self.length = length
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; end the body rather than hang the client
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison for If-None-Match (RFC 9110 13.1.2), so validators weakened by
+    the compression middleware still match.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into an inclusive (start, end) pair.
+
+    Returns None when the header is absent or not a single byte range (serve the
+    whole file) and raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def file_download(
+    request: Request,
+    path,
+    etag: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    cache_control: str = "private, no-cache"
+) -> Response:
+    """
+    Serve `path` for `request`, honouring If-None-Match, Range and If-Range.
+
+    Args:
+        etag: Strong validator for the file contents (already quoted)
+        cache_control: Cache-Control header sent with every response
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    headers = {
+        "etag": etag,
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # A stale If-Range validator means the client's partial copy is outdated
+    if_range = request.headers.get("if-range")
+    range_header = request.headers.get("range") if not if_range or if_range == etag else None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    if byte_range is None:
+        return FileResponse(
+            path,
+            headers=headers,
+            media_type=media_type,
+            filename=filename,
+            stat_result=stat_result,
+            content_disposition_type="inline"
+        )
+
+    start, end = byte_range
+    length = end - start + 1
+    return RangeFileResponse(
+        path,
+        offset=start,
+        length=length,
+        status_code=206,
+        headers={**headers, "content-range": f"bytes {start}-{end}/{size}", "content-length": str(length)},
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat_result,
+        content_disposition_type="inline"
+    )
@@ -2,6 +2,7 @@ import os
 import json
 from groq import Groq
 from typing import Dict, Any, Optional
+from llm.dispatch import llm_dispatcher, GENERATION
 
 # Initialize Groq client lazily
 def get_groq_client():
@@ -134,7 +135,9 @@ Include 1-2 rest or active recovery days. Make exercises realistic for home or g
     try:
         # Call Groq API
         client = get_groq_client()
-        chat_completion = client.chat.completions.create(
+        chat_completion = llm_dispatcher.complete(
+            client,
+            GENERATION,
             messages=[
                 {
                     "role": "system",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Date, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Date, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -49,3 +49,8 @@ class WorkoutLog(Base):
     
     user = relationship("User", back_populates="workout_logs")
     plan = relationship("FitnessPlan")
+
+    __table_args__ = (
+        Index('idx_workout_logs_plan_day', 'plan_id', 'day_number', 'completed'),
+        Index('idx_workout_logs_user_completion', 'user_id', 'completion_date'),
+    )
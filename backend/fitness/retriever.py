@@ -8,6 +8,8 @@ from rag.pipeline import fetch_external_knowledge, assemble_prompt, format_respo
 import logging
 from groq import Groq
 import os
+from limits.admission import llm_admission
+from llm.dispatch import llm_dispatcher, INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,7 @@ def get_groq_client():
     return Groq(api_key=api_key)
 
 
-def naive_coach_reply(prompt_data: dict) -> str:
+async def naive_coach_reply(prompt_data: dict) -> str:
     """
     Generate fitness coach reply using Groq with RAG context.
     References retrieved sources with practical advice.
@@ -44,7 +46,9 @@ Provide a motivating, science-backed fitness response that:
     
     try:
         client = get_groq_client()
-        response = client.chat.completions.create(
+        response = await llm_dispatcher.acomplete(
+            client,
+            INTERACTIVE,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": full_prompt}
@@ -98,7 +102,7 @@ def register_fitness_retriever_routes(router):
     @router.post("/advice")
     async def fitness_advice(
         payload: dict,
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(llm_admission())
     ):
         """
         Get AI fitness coaching advice with web knowledge integration.
@@ -127,7 +131,7 @@ def register_fitness_retriever_routes(router):
             prompt_data = assemble_prompt("fitness", message, docs)
             
             # Generate response
-            reply = naive_coach_reply(prompt_data)
+            reply = await naive_coach_reply(prompt_data)
             
             # Format with sources
             result = format_response_with_sources(reply, docs)
@@ -142,7 +146,9 @@ def register_fitness_retriever_routes(router):
                 from groq import Groq
                 import os
                 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-                response = client.chat.completions.create(
+                response = await llm_dispatcher.acomplete(
+                    client,
+                    INTERACTIVE,
                     messages=[
                         {"role": "system", "content": "You are an expert fitness coach."},
                         {"role": "user", "content": message}
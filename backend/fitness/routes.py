@@ -1,21 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import desc, func, type_coerce, Text
 from datetime import datetime, date
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 
-from db import get_db
+from db import get_db, bulk_insert, json_array_item
 from auth.models import User
 from auth.routes import get_current_user
 from fitness.models import FitnessGoal, FitnessPlan, WorkoutLog
 from status.models import RecoveryStatus
 from nutrition.models import LabReport
+from nutrition.lab_results import get_lab_abnormalities, format_abnormalities
 from fitness.ai_service import generate_fitness_plan
-from schemas import FitnessGoalCreate, WorkoutLogUpdate
+from rollups.engine import refresh_day
+from sync.tracker import record_changes
+from responses import RawJSON, raw_json_response
+from schemas import FitnessGoalCreate, WorkoutLogUpdate, WorkoutLogResponse
+from limits.admission import llm_admission
 
 router = APIRouter(prefix="/fitness", tags=["fitness"])
 
 
+def get_plan_progress(db: Session, plan_id: int) -> Dict[str, Any]:
+    """Count total and completed workouts for a plan in a single aggregate query"""
+    total, completed = db.query(
+        func.count(WorkoutLog.id),
+        func.count(WorkoutLog.id).filter(WorkoutLog.completed == True)
+    ).filter(WorkoutLog.plan_id == plan_id).one()
+    
+    return {
+        'total_workouts': total,
+        'completed': completed,
+        'completion_percentage': (completed / total * 100) if total else 0
+    }
+
+
 @router.post("/set-goal")
 async def set_fitness_goal(
     goal_data: FitnessGoalCreate,
@@ -64,7 +84,7 @@ async def get_current_goal(
 
 @router.post("/generate-plan")
 async def generate_plan(
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(llm_admission(cost=3)),
     db: Session = Depends(get_db)
 ):
     """Generate a new 30-day fitness plan based on current health status and goals"""
@@ -106,6 +126,12 @@ async def generate_plan(
     
     lab_insights = latest_lab.ai_summary if latest_lab and latest_lab.ai_summary else None
     
+    # Current abnormal lab values across reports (cached view)
+    lab_abnormalities = get_lab_abnormalities(db, current_user.id)
+    if lab_abnormalities:
+        abnormal_values = f"Current abnormal lab values:\n{format_abnormalities(lab_abnormalities)}"
+        lab_insights = f"{lab_insights}\n\n{abnormal_values}" if lab_insights else abnormal_values
+    
     # Get workout history to identify skipped exercises
     workout_history = None
     existing_plan = db.query(FitnessPlan).filter(
@@ -127,7 +153,8 @@ async def generate_plan(
     
     # Generate plan using AI
     try:
-        plan_data = generate_fitness_plan(
+        plan_data = await run_in_threadpool(
+            generate_fitness_plan,
             user_goal=goal.goal_type,
             recovery_status=recovery_data,
             lab_insights=lab_insights,
@@ -136,13 +163,13 @@ async def generate_plan(
         )
         
         # Deactivate old plans
-        old_plans = db.query(FitnessPlan).filter(
+        active_plans = db.query(FitnessPlan).filter(
             FitnessPlan.user_id == current_user.id,
             FitnessPlan.is_active == True
-        ).all()
-        
-        for old_plan in old_plans:
-            old_plan.is_active = False
+        )
+        deactivated_ids = [row.id for row in active_plans.with_entities(FitnessPlan.id)]
+        active_plans.update({'is_active': False}, synchronize_session=False)
+        record_changes(db, FitnessPlan, current_user.id, deactivated_ids)
         
         # Save new plan
         new_plan = FitnessPlan(
@@ -158,25 +185,25 @@ async def generate_plan(
         )
         
         db.add(new_plan)
+        db.flush()
+        
+        # Create workout logs for tracking in the same transaction
+        bulk_insert(db, WorkoutLog, [
+            {
+                'user_id': current_user.id,
+                'plan_id': new_plan.id,
+                'day_number': day_data['day'],
+                'workout_name': exercise['name'],
+                'completed': False
+            }
+            for day_data in plan_data.get('days', [])
+            for exercise in day_data.get('exercises', [])
+            if exercise.get('type') != 'rest'
+        ])
+        
         db.commit()
         db.refresh(new_plan)
         
-        # Create workout logs for tracking
-        if 'days' in plan_data:
-            for day_data in plan_data['days']:
-                for exercise in day_data.get('exercises', []):
-                    if exercise.get('type') != 'rest':
-                        workout_log = WorkoutLog(
-                            user_id=current_user.id,
-                            plan_id=new_plan.id,
-                            day_number=day_data['day'],
-                            workout_name=exercise['name'],
-                            completed=False
-                        )
-                        db.add(workout_log)
-            
-            db.commit()
-        
         return {
             "message": "Fitness plan generated successfully",
             "plan": new_plan,
@@ -197,7 +224,16 @@ async def get_current_plan(
     db: Session = Depends(get_db)
 ):
     """Get user's current active fitness plan"""
-    plan = db.query(FitnessPlan).filter(
+    # Select the JSON columns as stored text so they are passed through without re-encoding
+    plan = db.query(
+        FitnessPlan.id,
+        FitnessPlan.user_id,
+        FitnessPlan.goal_id,
+        type_coerce(FitnessPlan.plan_data, Text).label("plan_data"),
+        type_coerce(FitnessPlan.health_snapshot, Text).label("health_snapshot"),
+        FitnessPlan.is_active,
+        FitnessPlan.created_at
+    ).filter(
         FitnessPlan.user_id == current_user.id,
         FitnessPlan.is_active == True
     ).first()
@@ -205,33 +241,61 @@ async def get_current_plan(
     if not plan:
         return {"message": "No active plan. Please generate a plan first."}
     
-    # Get workout logs for this plan
-    logs = db.query(WorkoutLog).filter(
-        WorkoutLog.plan_id == plan.id
-    ).all()
-    
-    completion_data = {
-        'total_workouts': len(logs),
-        'completed': len([l for l in logs if l.completed]),
-        'completion_percentage': (len([l for l in logs if l.completed]) / len(logs) * 100) if logs else 0
-    }
-    
-    return {
-        "plan": plan,
-        "progress": completion_data
-    }
+    return raw_json_response({
+        "plan": {
+            "id": plan.id,
+            "user_id": plan.user_id,
+            "goal_id": plan.goal_id,
+            "plan_data": RawJSON(plan.plan_data),
+            "health_snapshot": RawJSON(plan.health_snapshot),
+            "is_active": plan.is_active,
+            "created_at": plan.created_at
+        },
+        "progress": get_plan_progress(db, plan.id)
+    })
 
 
-@router.post("/log-workout")
-async def log_workout(
-    log_data: WorkoutLogUpdate,
+@router.get("/current-plan/days/{day_number}")
+async def get_current_plan_day(
+    day_number: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Mark a workout as completed or update notes"""
+    """Get one day of the active fitness plan with its workout logs"""
+    plan_id = db.query(FitnessPlan.id).filter(
+        FitnessPlan.user_id == current_user.id,
+        FitnessPlan.is_active == True
+    ).limit(1).scalar()
+    
+    if not plan_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active plan. Please generate a plan first."
+        )
+    
+    day = json_array_item(db, FitnessPlan, FitnessPlan.plan_data, "$.days", "day", day_number, FitnessPlan.id == plan_id)
+    if day is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Day {day_number} not found in active plan"
+        )
+    
+    logs = db.query(WorkoutLog).filter(
+        WorkoutLog.plan_id == plan_id,
+        WorkoutLog.day_number == day_number
+    ).order_by(WorkoutLog.id).all()
+    
+    return raw_json_response({
+        "plan_id": plan_id,
+        "day": RawJSON(day),
+        "workout_logs": [WorkoutLogResponse.model_validate(log).model_dump() for log in logs]
+    })
+
+def update_workout_log(db: Session, user_id: int, log_data: WorkoutLogUpdate) -> WorkoutLog:
+    """Stage a workout completion/notes update and its daily rollups (caller commits)"""
     workout_log = db.query(WorkoutLog).filter(
         WorkoutLog.id == log_data.workout_log_id,
-        WorkoutLog.user_id == current_user.id
+        WorkoutLog.user_id == user_id
     ).first()
     
     if not workout_log:
@@ -240,10 +304,28 @@ async def log_workout(
             detail="Workout log not found"
         )
     
+    previous_completion = workout_log.completion_date
+    
     workout_log.completed = log_data.completed
     workout_log.completion_date = datetime.utcnow() if log_data.completed else None
     workout_log.notes = log_data.notes
     
+    # Keep daily rollups in sync for the day(s) whose completed count changed
+    touched_days = {d.date() for d in (previous_completion, workout_log.completion_date) if d}
+    for day in touched_days:
+        refresh_day(db, user_id, day)
+    
+    return workout_log
+
+
+@router.post("/log-workout")
+async def log_workout(
+    log_data: WorkoutLogUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Mark a workout as completed or update notes"""
+    workout_log = update_workout_log(db, current_user.id, log_data)
     db.commit()
     db.refresh(workout_log)
     
@@ -256,7 +338,9 @@ async def get_progress(
     db: Session = Depends(get_db)
 ):
     """Get user's workout progress statistics"""
-    active_plan = db.query(FitnessPlan).filter(
+    active_plan = db.query(FitnessPlan).options(
+        joinedload(FitnessPlan.goal)
+    ).filter(
         FitnessPlan.user_id == current_user.id,
         FitnessPlan.is_active == True
     ).first()
@@ -264,11 +348,7 @@ async def get_progress(
     if not active_plan:
         return {"message": "No active plan"}
     
-    logs = db.query(WorkoutLog).filter(
-        WorkoutLog.plan_id == active_plan.id
-    ).all()
-    
-    completed_logs = [l for l in logs if l.completed]
+    progress = get_plan_progress(db, active_plan.id)
     
     # Calculate days active
     plan_age_days = (datetime.utcnow() - active_plan.created_at).days
@@ -276,14 +356,47 @@ async def get_progress(
     return {
         "plan_created": active_plan.created_at,
         "days_active": plan_age_days + 1,
-        "total_workouts": len(logs),
-        "completed_workouts": len(completed_logs),
-        "completion_percentage": (len(completed_logs) / len(logs) * 100) if logs else 0,
+        "total_workouts": progress['total_workouts'],
+        "completed_workouts": progress['completed'],
+        "completion_percentage": progress['completion_percentage'],
         "current_day": min(plan_age_days + 1, 30),
         "goal_type": active_plan.goal.goal_type if active_plan.goal else "Not set"
     }
 
 
+@router.get("/progress/days")
+async def get_daily_progress(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get per-day workout completion for the active plan"""
+    active_plan = db.query(FitnessPlan.id).filter(
+        FitnessPlan.user_id == current_user.id,
+        FitnessPlan.is_active == True
+    ).first()
+    
+    if not active_plan:
+        return []
+    
+    rows = db.query(
+        WorkoutLog.day_number,
+        func.count(WorkoutLog.id),
+        func.count(WorkoutLog.id).filter(WorkoutLog.completed == True)
+    ).filter(
+        WorkoutLog.plan_id == active_plan.id
+    ).group_by(WorkoutLog.day_number).order_by(WorkoutLog.day_number).all()
+    
+    return [
+        {
+            "day_number": day_number,
+            "total_workouts": total,
+            "completed": completed,
+            "completion_percentage": (completed / total * 100) if total else 0
+        }
+        for day_number, total, completed in rows
+    ]
+
+
 @router.get("/workout-logs")
 async def get_workout_logs(
     day_number: Optional[int] = None,
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -15,3 +15,7 @@ class HydrationLog(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="hydration_logs")
+
+    __table_args__ = (
+        Index('idx_hydration_logs_user_date', 'user_id', 'date'),
+    )
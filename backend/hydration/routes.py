@@ -7,6 +7,7 @@ from db import get_db
 from auth.routes import get_current_user
 from auth.models import User
 from hydration.models import HydrationLog
+from rollups.engine import refresh_day
 from schemas import HydrationCreate, HydrationUpdate, HydrationResponse
 
 router = APIRouter(prefix="/hydration", tags=["hydration"])
@@ -38,23 +39,18 @@ def get_today_hydration(
     
     return log
 
-@router.post("/add", response_model=HydrationResponse)
-def add_water(
-    hydration_data: HydrationCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Add water intake to today's log"""
+def add_water_intake(db: Session, user_id: int, hydration_data: HydrationCreate) -> HydrationLog:
+    """Stage water intake on today's log and its daily rollup (caller commits)"""
     today = date.today()
     
     log = db.query(HydrationLog).filter(
-        HydrationLog.user_id == current_user.id,
+        HydrationLog.user_id == user_id,
         HydrationLog.date == today
     ).first()
     
     if not log:
         log = HydrationLog(
-            user_id=current_user.id,
+            user_id=user_id,
             date=today,
             amount_ml=hydration_data.amount_ml,
             daily_goal_ml=hydration_data.daily_goal_ml or 2000
@@ -65,6 +61,17 @@ def add_water(
         if hydration_data.daily_goal_ml:
             log.daily_goal_ml = hydration_data.daily_goal_ml
     
+    refresh_day(db, user_id, today)
+    return log
+
+@router.post("/add", response_model=HydrationResponse)
+def add_water(
+    hydration_data: HydrationCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Add water intake to today's log"""
+    log = add_water_intake(db, current_user.id, hydration_data)
     db.commit()
     db.refresh(log)
     return log
@@ -129,6 +136,7 @@ def reset_today_hydration(
     
     if log:
         log.amount_ml = 0
+        refresh_day(db, current_user.id, today)
         db.commit()
         return {"message": "Today's hydration reset successfully"}
     
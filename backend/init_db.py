@@ -1,7 +1,7 @@
 """Initialize the database with all tables and columns"""
 from db import Base, engine
 from auth.models import User
-from nutrition.models import LabReport, Meal, NutritionRecommendation
+from nutrition.models import LabReport, LabResult, UploadBlob, Meal, NutritionRecommendation, MealPlan
 from reminder.models import Reminder
 from sleep.models import SleepSchedule, SleepLog
 from status.models import RecoveryStatus, Caretaker
@@ -9,7 +9,12 @@ from appointment.models import Appointment
 from hydration.models import HydrationLog
 from fitness.models import FitnessGoal, FitnessPlan, WorkoutLog
 from mind.models import MoodLog
-from rag.store import WebCache
+from rollups.models import UserDailyStats
+from batch.models import IdempotencyKey
+from sync.models import SyncChange
+from calendar_feed.models import CalendarFeedToken
+from rag.store import WebCache, PageFetch
+from limits.models import RateLimitBucket, LLMUsage
 
 print("Dropping all tables...")
 Base.metadata.drop_all(bind=engine)
@@ -0,0 +1 @@
+# Limits module
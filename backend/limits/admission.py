@@ -0,0 +1,137 @@
+"""
+Admission control for LLM-backed endpoints.
+
+Each user gets a token bucket for request rate and daily request/LLM-token
+budgets, sized by their plan tier (subscriptions.guard.PLAN_RANKS; users without
+an active subscription or trial get the free tier). llm_admission() is a route
+dependency that rejects with 429 + Retry-After when a limit is hit and reports
+the remaining budget in response headers.
+
+LLM calls made while handling an admitted request report their token usage with
+record_llm_usage() (llm.dispatch does this for every completion); the account
+travels in a context variable, which FastAPI's threadpool and asyncio.to_thread
+both propagate.
+"""
+import contextvars
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from auth.routes import get_current_user
+from db import get_db
+from limits.store import get_limit_store
+from subscriptions.cache import get_subscription_snapshot
+from subscriptions.guard import PLAN_RANKS
+
+
+class TierLimits(NamedTuple):
+    burst: int  # Bucket capacity (requests)
+    per_minute: float  # Bucket refill rate
+    daily_requests: int
+    daily_tokens: int  # LLM tokens (prompt + completion) per UTC day
+
+
+FREE_TIER = 0
+TIER_LIMITS: Dict[int, TierLimits] = {
+    FREE_TIER: TierLimits(burst=5, per_minute=5, daily_requests=50, daily_tokens=20_000),
+    PLAN_RANKS["basic"]: TierLimits(burst=10, per_minute=10, daily_requests=200, daily_tokens=100_000),
+    PLAN_RANKS["plus"]: TierLimits(burst=20, per_minute=20, daily_requests=500, daily_tokens=300_000),
+    PLAN_RANKS["pro"]: TierLimits(burst=40, per_minute=40, daily_requests=2_000, daily_tokens=1_000_000),
+}
+
+limit_store = get_limit_store()
+
+_current_account: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_account", default=None)
+
+
+def user_tier(db: Session, user_id: int) -> int:
+    """Plan rank of the user's active subscription or trial, else the free tier"""
+    subscription = get_subscription_snapshot(db, str(user_id))
+    if not subscription or subscription.status not in ("active", "trial") or subscription.trial_expired():
+        return FREE_TIER
+    return PLAN_RANKS.get(subscription.plan, FREE_TIER)
+
+
+def _seconds_until_tomorrow(now: datetime) -> int:
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return math.ceil((tomorrow - now).total_seconds())
+
+
+def _too_many_requests(detail: str, retry_after: float, headers: Dict[str, str]):
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={**headers, "Retry-After": str(max(math.ceil(retry_after), 1))}
+    )
+
+
+def llm_admission(cost: int = 1):
+    """
+    Dependency that admits a request to an LLM endpoint.
+
+    Args:
+        cost: Bucket tokens the request consumes (heavier generation endpoints cost more)
+    """
+
+    def _check(response: Response, current_user, db: Session):
+        limits = TIER_LIMITS[user_tier(db, current_user.id)]
+        key = f"llm:{current_user.id}"
+        now = datetime.utcnow()
+        today = now.date()
+
+        usage = limit_store.usage(key, today)
+        budget_headers = {
+            "X-LLM-Tokens-Limit": str(limits.daily_tokens),
+            "X-LLM-Tokens-Remaining": str(max(limits.daily_tokens - usage["tokens"], 0)),
+            "X-LLM-Requests-Limit": str(limits.daily_requests),
+            "X-LLM-Requests-Remaining": str(max(limits.daily_requests - usage["requests"], 0)),
+        }
+        if usage["tokens"] >= limits.daily_tokens:
+            _too_many_requests("Daily AI token budget used up. It resets at midnight UTC.", _seconds_until_tomorrow(now), budget_headers)
+        if usage["requests"] + cost > limits.daily_requests:
+            _too_many_requests("Daily AI request limit reached. It resets at midnight UTC.", _seconds_until_tomorrow(now), budget_headers)
+
+        allowed, remaining, retry_after = limit_store.take(
+            key, limits.burst, limits.per_minute / 60, time.time(), cost
+        )
+        rate_headers = {
+            "X-RateLimit-Limit": str(limits.burst),
+            "X-RateLimit-Remaining": str(math.floor(remaining)),
+        }
+        if not allowed:
+            _too_many_requests("Too many AI requests. Please slow down.", retry_after, {**budget_headers, **rate_headers})
+
+        usage = limit_store.add_usage(key, today, requests=cost)
+        budget_headers["X-LLM-Requests-Remaining"] = str(max(limits.daily_requests - usage["requests"], 0))
+        response.headers.update({**budget_headers, **rate_headers})
+        return key
+
+    async def _admit(
+        response: Response,
+        current_user=Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ):
+        # Limiter I/O runs in the threadpool; the account is set here so the endpoint's context sees it
+        _current_account.set(await run_in_threadpool(_check, response, current_user, db))
+        return current_user
+
+    return _admit
+
+
+def current_account() -> Optional[str]:
+    """Limiter key of the user whose request is being handled, if it was admitted"""
+    return _current_account.get()
+
+
+def record_llm_usage(completion) -> None:
+    """Charge a Groq completion's token usage to the account of the current request"""
+    key = _current_account.get()
+    usage = getattr(completion, "usage", None)
+    tokens = getattr(usage, "total_tokens", None)
+    if key and tokens:
+        limit_store.add_usage(key, datetime.utcnow().date(), tokens=int(tokens))
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Float, Date, PrimaryKeyConstraint
+from db import Base
+
+
+class RateLimitBucket(Base):
+    """Token-bucket state for the SQLite limiter backend (shared by all workers)"""
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)  # e.g. "llm:42"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix time of the last refill
+
+
+class LLMUsage(Base):
+    """Per-user daily LLM request and token counters"""
+    __tablename__ = "llm_usage"
+
+    key = Column(String, nullable=False)
+    day = Column(Date, nullable=False)  # UTC day
+    requests = Column(Integer, nullable=False, default=0)
+    tokens = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('key', 'day'),
+    )
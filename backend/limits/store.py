@@ -0,0 +1,116 @@
+"""
+Limiter state backends.
+
+MemoryLimitStore keeps buckets and daily counters in process (one worker, or
+per-worker limits). SQLiteLimitStore keeps them in the application database so
+every worker shares them; each operation is a single atomic UPSERT.
+Select with RATE_LIMIT_BACKEND=memory|sqlite.
+"""
+import os
+import threading
+from datetime import date
+from typing import Dict, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from db import SessionLocal
+from limits.models import LLMUsage, RateLimitBucket
+
+# take() result: (allowed, tokens left, seconds until `cost` tokens are available)
+TakeResult = Tuple[bool, float, float]
+
+
+def _retry_after(tokens: float, cost: float, refill_per_second: float) -> float:
+    return max(cost - tokens, 0) / refill_per_second if refill_per_second > 0 else float("inf")
+
+
+class MemoryLimitStore:
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._usage: Dict[Tuple[str, date], Dict[str, int]] = {}
+        self._usage_day = None
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float, cost: float = 1) -> TakeResult:
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return False, tokens, _retry_after(tokens, cost, refill_per_second)
+            tokens -= cost
+            self._buckets[key] = (tokens, now)
+            return True, tokens, 0.0
+
+    def usage(self, key: str, day: date) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage.get((key, day), {"requests": 0, "tokens": 0}))
+
+    def add_usage(self, key: str, day: date, requests: int = 0, tokens: int = 0) -> Dict[str, int]:
+        with self._lock:
+            if self._usage_day != day:
+                # New day: drop counters from earlier days
+                self._usage = {usage_key: value for usage_key, value in self._usage.items() if usage_key[1] >= day}
+                self._usage_day = day
+            counters = self._usage.setdefault((key, day), {"requests": 0, "tokens": 0})
+            counters["requests"] += requests
+            counters["tokens"] += tokens
+            return dict(counters)
+
+
+class SQLiteLimitStore:
+    def take(self, key: str, capacity: float, refill_per_second: float, now: float, cost: float = 1) -> TakeResult:
+        refilled = func.min(capacity, RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * refill_per_second)
+        statement = insert(RateLimitBucket).values(key=key, tokens=capacity - cost, updated_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[RateLimitBucket.key],
+            set_={"tokens": refilled - cost, "updated_at": now},
+            where=refilled >= cost
+        ).returning(RateLimitBucket.tokens)
+
+        db = SessionLocal()
+        try:
+            tokens = db.execute(statement).scalar()
+            if tokens is None:
+                # Denied: report the refilled level without consuming
+                row = db.execute(
+                    select(RateLimitBucket.tokens, RateLimitBucket.updated_at).where(RateLimitBucket.key == key)
+                ).one()
+                current = min(capacity, row.tokens + (now - row.updated_at) * refill_per_second)
+                db.commit()
+                return False, current, _retry_after(current, cost, refill_per_second)
+            db.commit()
+            return True, tokens, 0.0
+        finally:
+            db.close()
+
+    def usage(self, key: str, day: date) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                select(LLMUsage.requests, LLMUsage.tokens).where(LLMUsage.key == key, LLMUsage.day == day)
+            ).first()
+            return {"requests": row.requests, "tokens": row.tokens} if row else {"requests": 0, "tokens": 0}
+        finally:
+            db.close()
+
+    def add_usage(self, key: str, day: date, requests: int = 0, tokens: int = 0) -> Dict[str, int]:
+        statement = insert(LLMUsage).values(key=key, day=day, requests=requests, tokens=tokens)
+        statement = statement.on_conflict_do_update(
+            index_elements=[LLMUsage.key, LLMUsage.day],
+            set_={"requests": LLMUsage.requests + requests, "tokens": LLMUsage.tokens + tokens}
+        ).returning(LLMUsage.requests, LLMUsage.tokens)
+
+        db = SessionLocal()
+        try:
+            row = db.execute(statement).one()
+            db.commit()
+            return {"requests": row.requests, "tokens": row.tokens}
+        finally:
+            db.close()
+
+
+def get_limit_store():
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    return SQLiteLimitStore() if backend == "sqlite" else MemoryLimitStore()
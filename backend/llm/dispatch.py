@@ -0,0 +1,394 @@
+"""
+Priority dispatch for outbound LLM (Groq) calls.
+
+Every Groq completion goes through llm_dispatcher, which caps the number of
+in-flight calls and decides who goes next when the cap is reached:
+
+- Priority classes: INTERACTIVE (chat/advice), GENERATION (plans, lab analyses,
+  recommendations) and BACKGROUND (work nobody is waiting on). Classes share the
+  slots by smooth weighted round robin, so generations keep moving without
+  starving chat, and INTERACTIVE_RESERVED slots are only ever given to chat.
+- Within a class, accounts (the admitted user, see limits.admission) are served
+  round robin, so one user's burst of plan generations queues behind itself.
+- Each class has a bounded queue (LLMQueueFull when full) and a queue deadline:
+  requests still waiting when it passes are dropped with LLMDeadlineExceeded
+  instead of being sent upstream after the caller has given up.
+
+Once a slot is granted, llm.governor paces the call against Groq's reported
+rate limits using the class's rate policy (chat may be shortened, generations
+wait). acomplete() waits for its slot on a future rather than a thread, so deep
+queues never tie up the default executor that asyncio.to_thread relies on. Queue wait per class is reported by metrics().
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
+
+from groq import RateLimitError
+
+import resilience
+from limits.admission import current_account, record_llm_usage
+from llm.governor import DOWNGRADE, FAIL_FAST, WAIT, groq_governor
+
+INTERACTIVE = "interactive"
+GENERATION = "generation"
+BACKGROUND = "background"
+
+
+class ClassConfig(NamedTuple):
+    weight: int  # Share of slots when several classes are waiting
+    max_depth: int  # Queued (not yet running) requests
+    deadline_seconds: float  # Longest a request may wait for a slot and upstream allowance
+    rate_policy: str  # llm.governor policy when the Groq allowance is short
+
+
+CLASS_CONFIG: Dict[str, ClassConfig] = {
+    # A shorter chat answer beats a canned fallback; truncated plan JSON would not parse
+    INTERACTIVE: ClassConfig(weight=6, max_depth=int(os.getenv("LLM_INTERACTIVE_QUEUE_DEPTH", "100")), deadline_seconds=15, rate_policy=DOWNGRADE),
+    GENERATION: ClassConfig(weight=3, max_depth=int(os.getenv("LLM_GENERATION_QUEUE_DEPTH", "30")), deadline_seconds=120, rate_policy=WAIT),
+    BACKGROUND: ClassConfig(weight=1, max_depth=int(os.getenv("LLM_BACKGROUND_QUEUE_DEPTH", "200")), deadline_seconds=600, rate_policy=WAIT),
+}
+
+# Concurrent Groq calls allowed from this process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Slots held back for INTERACTIVE requests
+INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "1"))
+WAIT_SAMPLES = 500  # Recent queue waits kept per class for percentiles
+THROTTLED_RETRIES = 2  # Retries after a Groq 429 (the SDK's own retries are disabled)
+DEFAULT_MAX_TOKENS = 1024
+
+
+class LLMQueueFull(RuntimeError):
+    """The request's priority class already has max_depth requests waiting"""
+
+
+class LLMDeadlineExceeded(RuntimeError):
+    """The request waited longer than its deadline for a slot"""
+
+
+class _Ticket:
+    __slots__ = ("priority", "account", "enqueued_at", "deadline", "state", "waiter")
+
+    def __init__(
+        self,
+        priority: str,
+        account: str,
+        enqueued_at: float,
+        deadline: float,
+        waiter: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = None
+    ):
+        self.priority = priority
+        self.account = account
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline
+        self.state = "queued"  # -> "running" | "expired"
+        self.waiter = waiter  # acomplete()'s loop and future, resolved when the ticket leaves the queue
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _ClassStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.rejected = 0  # Queue full
+        self.expired = 0  # Deadline passed while queued
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.waits.append(seconds)
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+
+def _percentile(sorted_values, fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+class LLMDispatcher:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, interactive_reserved: int = INTERACTIVE_RESERVED):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.interactive_reserved = min(max(interactive_reserved, 0), self.max_concurrency - 1)
+        self._lock = threading.Condition()
+        # priority -> account -> FIFO of tickets; account order is the round robin order
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Ticket]]"] = {name: OrderedDict() for name in CLASS_CONFIG}
+        self._depth = {name: 0 for name in CLASS_CONFIG}
+        self._running = {name: 0 for name in CLASS_CONFIG}
+        self._current_weight = {name: 0 for name in CLASS_CONFIG}
+        self._active = 0
+        self._stats = {name: _ClassStats() for name in CLASS_CONFIG}
+
+    def complete(
+        self,
+        client,
+        priority: str = INTERACTIVE,
+        deadline_seconds: Optional[float] = None,
+        rate_policy: Optional[str] = None,
+        **create_kwargs
+    ):
+        """
+        Run client.chat.completions.create(**create_kwargs) once a slot is granted.
+
+        Blocks the calling thread while queued; use acomplete() from async code.
+        Raises LLMQueueFull, LLMDeadlineExceeded or resilience.DependencyUnavailable
+        (Groq circuit open) without calling upstream, and GroqRateLimited when the
+        Groq allowance does not recover before the deadline.
+
+        Args:
+            rate_policy: WAIT, DOWNGRADE or FAIL_FAST (default: the class's policy)
+        """
+        ticket = self._acquire(priority, deadline_seconds)
+        response = self._run(ticket, client, rate_policy, create_kwargs)
+        record_llm_usage(response)
+        return response
+
+    async def acomplete(
+        self,
+        client,
+        priority: str = INTERACTIVE,
+        deadline_seconds: Optional[float] = None,
+        rate_policy: Optional[str] = None,
+        **create_kwargs
+    ):
+        """
+        complete() for async code. Waiting for a slot is a future resolved by the
+        dispatcher, so queued requests hold no thread; only the granted Groq call
+        (at most max_concurrency of them) runs in a worker thread.
+        """
+        ticket = await self._aacquire(priority, deadline_seconds)
+        # The worker thread releases the slot even if this task is cancelled meanwhile
+        response = await asyncio.to_thread(self._run, ticket, client, rate_policy, create_kwargs)
+        record_llm_usage(response)
+        return response
+
+    def _run(self, ticket: _Ticket, client, rate_policy: Optional[str], create_kwargs: Dict):
+        """Make the Groq call of a granted ticket, then give its slot back"""
+        try:
+            response = self._call_groq(
+                client, rate_policy or CLASS_CONFIG[ticket.priority].rate_policy, ticket.deadline, create_kwargs
+            )
+        except Exception:
+            self._release(ticket, failed=True)
+            raise
+        self._release(ticket)
+        return response
+
+    @staticmethod
+    def _call_groq(client, rate_policy: str, deadline: float, create_kwargs: Dict):
+        """One completion paced by groq_governor, retrying 429s after the pause it imposes"""
+        client = client.with_options(max_retries=0)
+        messages = create_kwargs.get("messages", [])
+        requested_tokens = create_kwargs.get("max_tokens", DEFAULT_MAX_TOKENS)
+        attempt = 0
+        while True:
+            reservation = groq_governor.admit(
+                messages, requested_tokens, rate_policy, max_wait=max(deadline - time.monotonic(), 0)
+            )
+            try:
+                raw = resilience.groq.call(
+                    lambda timeout: client.chat.completions.with_raw_response.create(
+                        **{**create_kwargs, "max_tokens": reservation.max_tokens, "timeout": timeout}
+                    )
+                )
+            except RateLimitError as e:
+                groq_governor.release(reservation, e.response.headers)
+                groq_governor.throttled(e.response.headers)
+                attempt += 1
+                if rate_policy == FAIL_FAST or attempt > THROTTLED_RETRIES:
+                    raise
+                continue
+            except Exception:
+                groq_governor.release(reservation)
+                raise
+
+            response = raw.parse()
+            groq_governor.release(reservation, raw.headers, getattr(response, "usage", None))
+            return response
+
+    def _enqueue(self, priority: str, deadline_seconds: Optional[float], waiter=None) -> _Ticket:
+        config = CLASS_CONFIG[priority]
+        now = time.monotonic()
+        wait_budget = deadline_seconds if deadline_seconds is not None else config.deadline_seconds
+        request_left = resilience.remaining()
+        if request_left is not None:
+            wait_budget = min(wait_budget, request_left)
+        ticket = _Ticket(priority, current_account() or "system", now, now + wait_budget, waiter)
+
+        with self._lock:
+            stats = self._stats[priority]
+            if self._depth[priority] >= config.max_depth:
+                stats.rejected += 1
+                raise LLMQueueFull(f"LLM {priority} queue is full ({config.max_depth} waiting)")
+            stats.submitted += 1
+            self._queues[priority].setdefault(ticket.account, deque()).append(ticket)
+            self._depth[priority] += 1
+            self._dispatch(now)
+        return ticket
+
+    def _admitted(self, ticket: _Ticket) -> _Ticket:
+        """Drop a ticket still queued past its deadline, raise if expired, else record its wait (lock held)"""
+        if ticket.state == "queued":
+            self._drop(ticket)
+        if ticket.state == "expired":
+            raise LLMDeadlineExceeded(
+                f"LLM {ticket.priority} request waited more than {ticket.deadline - ticket.enqueued_at:.0f}s for a slot"
+            )
+        self._stats[ticket.priority].record_wait(time.monotonic() - ticket.enqueued_at)
+        return ticket
+
+    def _acquire(self, priority: str, deadline_seconds: Optional[float]) -> _Ticket:
+        ticket = self._enqueue(priority, deadline_seconds)
+        with self._lock:
+            while ticket.state == "queued":
+                remaining = ticket.deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            return self._admitted(ticket)
+
+    async def _aacquire(self, priority: str, deadline_seconds: Optional[float]) -> _Ticket:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        ticket = self._enqueue(priority, deadline_seconds, (loop, granted))
+        try:
+            await asyncio.wait_for(granted, max(ticket.deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Caller went away: leave the queue, or hand back a slot granted meanwhile
+            with self._lock:
+                running = ticket.state == "running"
+                if ticket.state == "queued":
+                    self._drop(ticket, expired=False)
+            if running:
+                self._release(ticket, failed=True)
+            raise
+        with self._lock:
+            return self._admitted(ticket)
+
+    def _release(self, ticket: _Ticket, failed: bool = False) -> None:
+        with self._lock:
+            self._active -= 1
+            self._running[ticket.priority] -= 1
+            stats = self._stats[ticket.priority]
+            if failed:
+                stats.errors += 1
+            else:
+                stats.completed += 1
+            self._dispatch(time.monotonic())
+
+    def _drop(self, ticket: _Ticket, expired: bool = True) -> None:
+        """Remove a queued ticket whose deadline passed or whose caller gave up (lock held)"""
+        account_queue = self._queues[ticket.priority].get(ticket.account)
+        if account_queue is not None and ticket in account_queue:
+            account_queue.remove(ticket)
+            if not account_queue:
+                del self._queues[ticket.priority][ticket.account]
+            self._depth[ticket.priority] -= 1
+        ticket.state = "expired"
+        if expired:
+            self._stats[ticket.priority].expired += 1
+
+    @staticmethod
+    def _wake(ticket: _Ticket) -> None:
+        """Resolve an async waiter once its ticket is granted or expired (lock held)"""
+        if ticket.waiter is None:
+            return
+        loop, future = ticket.waiter
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            pass  # Loop already closed; nobody is waiting
+
+    def _next_ticket(self, priority: str, now: float) -> Optional[_Ticket]:
+        """Pop the next live ticket of a class, rotating accounts (lock held)"""
+        accounts = self._queues[priority]
+        while accounts:
+            account, account_queue = next(iter(accounts.items()))
+            ticket = account_queue.popleft()
+            self._depth[priority] -= 1
+            if account_queue:
+                accounts.move_to_end(account)
+            else:
+                del accounts[account]
+            if ticket.deadline <= now:
+                ticket.state = "expired"
+                self._stats[priority].expired += 1
+                self._wake(ticket)
+                continue
+            return ticket
+        return None
+
+    def _dispatch(self, now: float) -> None:
+        """Grant free slots to waiting tickets (lock held)"""
+        granted = False
+        while self._active < self.max_concurrency:
+            shared_full = self._active >= self.max_concurrency - self.interactive_reserved
+            eligible = [
+                name for name in CLASS_CONFIG
+                if self._depth[name] and (name == INTERACTIVE or not shared_full)
+            ]
+            if not eligible:
+                break
+
+            # Smooth weighted round robin over the classes with waiting requests
+            total = 0
+            for name in eligible:
+                self._current_weight[name] += CLASS_CONFIG[name].weight
+                total += CLASS_CONFIG[name].weight
+            chosen = max(eligible, key=lambda name: self._current_weight[name])
+            self._current_weight[chosen] -= total
+
+            ticket = self._next_ticket(chosen, now)
+            granted = True  # Expired tickets need waking too
+            if ticket is None:
+                continue
+            ticket.state = "running"
+            self._active += 1
+            self._running[chosen] += 1
+            self._wake(ticket)
+        if granted:
+            self._lock.notify_all()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            classes = {}
+            for name, stats in self._stats.items():
+                waits = sorted(stats.waits)
+                classes[name] = {
+                    "queued": self._depth[name],
+                    "running": self._running[name],
+                    "submitted": stats.submitted,
+                    "completed": stats.completed,
+                    "errors": stats.errors,
+                    "rejected": stats.rejected,
+                    "expired": stats.expired,
+                    "queue_wait_seconds": {
+                        "mean": stats.wait_total / stats.wait_count if stats.wait_count else None,
+                        "p50": _percentile(waits, 0.5),
+                        "p95": _percentile(waits, 0.95),
+                        "max": stats.wait_max,
+                    },
+                }
+            return {
+                "max_concurrency": self.max_concurrency,
+                "interactive_reserved": self.interactive_reserved,
+                "active": self._active,
+                "classes": classes,
+                "groq": groq_governor.snapshot(),
+            }
+
+
+llm_dispatcher = LLMDispatcher()
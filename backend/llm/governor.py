@@ -0,0 +1,225 @@
+"""
+Client-side pacing for the Groq API.
+
+Groq reports its request and token allowances on every response
+(x-ratelimit-{limit,remaining,reset}-{requests,tokens}). GroqGovernor keeps the
+latest values, models each allowance as a bucket refilling linearly until its
+reset time, and subtracts the tokens reserved by calls still in flight. Before a
+call, admit() estimates its cost (prompt length + max_tokens) and, when the
+allowance is short, applies the caller's policy:
+
+- WAIT: sleep until the allowance covers the call (within max_wait)
+- DOWNGRADE: lower max_tokens to what is available now, else wait
+- FAIL_FAST: raise GroqRateLimited immediately
+
+A 429 from Groq pauses every caller until its Retry-After has passed, so one
+throttled call does not turn into a burst of retries.
+"""
+import math
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+WAIT = "wait"
+DOWNGRADE = "downgrade"
+FAIL_FAST = "fail_fast"
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separators per chat message
+MIN_DOWNGRADED_TOKENS = 64  # Below this a reply is not worth sending
+INITIAL_CHARS_PER_TOKEN = 4.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+class GroqRateLimited(RuntimeError):
+    """The Groq allowance cannot cover the call within the caller's wait budget"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Groq reset durations ("7.66s", "2m59.56s", "120ms") or plain seconds -> seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+class Reservation(NamedTuple):
+    prompt_chars: int
+    message_count: int
+    prompt_tokens: int  # Estimated
+    max_tokens: int  # Granted completion budget
+
+
+class _Allowance:
+    """One upstream limit as last reported, refilling linearly until its reset time"""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining = 0.0
+        self.observed_at = 0.0
+        self.refill_per_second = 0.0
+        self.reserved = 0.0  # Claimed by calls in flight
+
+    def observe(self, limit: Optional[int], remaining: Optional[int], reset_seconds: Optional[float], now: float) -> None:
+        if limit is None or remaining is None:
+            return
+        self.limit = limit
+        self.remaining = float(remaining)
+        self.observed_at = now
+        if reset_seconds and reset_seconds > 0:
+            self.refill_per_second = max(limit - remaining, 0) / reset_seconds
+        elif remaining >= limit:
+            self.refill_per_second = 0.0
+
+    def available(self, now: float) -> float:
+        if self.limit is None:
+            return math.inf  # No response seen yet
+        refilled = self.remaining + (now - self.observed_at) * self.refill_per_second
+        return min(float(self.limit), refilled) - self.reserved
+
+    def seconds_until(self, amount: float, now: float) -> float:
+        missing = amount - self.available(now)
+        if missing <= 0:
+            return 0.0
+        if self.refill_per_second <= 0:
+            return math.inf
+        return missing / self.refill_per_second
+
+
+class GroqGovernor:
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._requests = _Allowance()
+        self._tokens = _Allowance()
+        self._paused_until = 0.0
+        self._chars_per_token = INITIAL_CHARS_PER_TOKEN
+        self._counters = {"admitted": 0, "waited": 0, "downgraded": 0, "rejected": 0, "throttled": 0}
+        self._wait_seconds = 0.0
+
+    def admit(self, messages: List[Dict], max_tokens: int, policy: str = WAIT, max_wait: float = 30.0) -> Reservation:
+        """
+        Reserve allowance for one call. The returned reservation's max_tokens is what
+        to send (lower than requested only under DOWNGRADE); pass it to release().
+
+        Raises GroqRateLimited when the call cannot be admitted within max_wait.
+        """
+        prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+        deadline = time.monotonic() + max_wait
+        waited = False
+        with self._lock:
+            prompt_tokens = math.ceil(prompt_chars / self._chars_per_token) + MESSAGE_OVERHEAD_TOKENS * len(messages)
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.seconds_until(1, now),
+                    self._tokens.seconds_until(prompt_tokens + max_tokens, now),
+                )
+                if wait <= 0:
+                    break
+
+                if policy == DOWNGRADE and self._paused_until <= now and self._requests.seconds_until(1, now) <= 0:
+                    affordable = math.floor(self._tokens.available(now)) - prompt_tokens
+                    if affordable >= min(MIN_DOWNGRADED_TOKENS, max_tokens):
+                        max_tokens = min(affordable, max_tokens)
+                        self._counters["downgraded"] += 1
+                        break
+
+                if policy == FAIL_FAST or now + wait > deadline:
+                    self._counters["rejected"] += 1
+                    raise GroqRateLimited(f"Groq rate limit: retry in {wait:.1f}s", retry_after=wait)
+
+                waited = True
+                self._lock.wait(wait)
+                self._wait_seconds += time.monotonic() - now
+
+            self._requests.reserved += 1
+            self._tokens.reserved += prompt_tokens + max_tokens
+            self._counters["admitted"] += 1
+            if waited:
+                self._counters["waited"] += 1
+        return Reservation(prompt_chars, len(messages), prompt_tokens, max_tokens)
+
+    def release(self, reservation: Reservation, headers=None, usage=None) -> None:
+        """Return a call's reservation and adopt the allowance reported on its response"""
+        with self._lock:
+            self._requests.reserved = max(self._requests.reserved - 1, 0)
+            self._tokens.reserved = max(self._tokens.reserved - reservation.prompt_tokens - reservation.max_tokens, 0)
+            now = time.monotonic()
+            if headers is not None:
+                self._requests.observe(
+                    _header_int(headers, "x-ratelimit-limit-requests"),
+                    _header_int(headers, "x-ratelimit-remaining-requests"),
+                    parse_duration(headers.get("x-ratelimit-reset-requests")),
+                    now
+                )
+                self._tokens.observe(
+                    _header_int(headers, "x-ratelimit-limit-tokens"),
+                    _header_int(headers, "x-ratelimit-remaining-tokens"),
+                    parse_duration(headers.get("x-ratelimit-reset-tokens")),
+                    now
+                )
+            content_tokens = (getattr(usage, "prompt_tokens", None) or 0) - MESSAGE_OVERHEAD_TOKENS * reservation.message_count
+            if reservation.prompt_chars and content_tokens > 0:
+                # Calibrate the chars-per-token estimate against Groq's count
+                observed = reservation.prompt_chars / content_tokens
+                self._chars_per_token = min(max(0.8 * self._chars_per_token + 0.2 * observed, 1.0), 8.0)
+            self._lock.notify_all()
+
+    def throttled(self, headers) -> float:
+        """Record a 429: pause all callers until its Retry-After; returns the pause"""
+        retry_after = parse_duration(headers.get("retry-after")) if headers is not None else None
+        if retry_after is None and headers is not None:
+            retry_after = max(
+                parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0,
+                parse_duration(headers.get("x-ratelimit-reset-requests")) or 0,
+            ) or None
+        retry_after = retry_after if retry_after is not None else 1.0
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._counters["throttled"] += 1
+        return retry_after
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+
+            def describe(allowance: _Allowance) -> Dict:
+                available = allowance.available(now)
+                return {
+                    "limit": allowance.limit,
+                    "available": None if math.isinf(available) else math.floor(available),
+                    "reserved": allowance.reserved,
+                }
+
+            return {
+                "requests": describe(self._requests),
+                "tokens": describe(self._tokens),
+                "paused_for_seconds": max(self._paused_until - now, 0),
+                "chars_per_token": round(self._chars_per_token, 2),
+                "wait_seconds_total": round(self._wait_seconds, 3),
+                **self._counters,
+            }
+
+
+groq_governor = GroqGovernor()
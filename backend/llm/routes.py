@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+
+from llm.dispatch import llm_dispatcher
+from subscriptions.routes import require_ops_token
+
+router = APIRouter(prefix="/llm", tags=["llm"])
+
+
+@router.get("/metrics", dependencies=[Depends(require_ops_token)])
+def get_llm_metrics():
+    """LLM dispatch queue depth, in-flight calls and queue wait per priority class"""
+    return llm_dispatcher.metrics()
@@ -1,5 +1,7 @@
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from db import init_db
 from auth.routes import router as auth_router
@@ -13,11 +15,22 @@ from hydration.routes import router as hydration_router
 from fitness.routes import router as fitness_router
 from mind.routes import router as mind_router
 from subscriptions.routes import router as subscriptions_router
+from rollups.routes import router as rollups_router
+from batch.routes import router as batch_router
+from sync.routes import router as sync_router
+from calendar_feed.routes import router as calendar_router
+from llm.routes import router as llm_router
+from rag.routes import router as rag_router
+from compression import CompressionMiddleware
+from resilience import DeadlineMiddleware, dependency_status, OPEN
+from reminder.scheduler import reminder_scheduler, SCHEDULER_ENABLED
+from subscriptions.sweeper import subscription_sweeper, SWEEPER_ENABLED
+from subscriptions.webhooks import webhook_worker, WORKER_ENABLED as WEBHOOK_WORKER_ENABLED
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="VitaLedger API", version="1.0.0")
+app = FastAPI(title="VitaLedger API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS configuration
 app.add_middleware(
@@ -28,15 +41,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (plans, histories) with brotli/gzip
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+)
+
+# End-to-end deadline for outbound calls made while handling a request
+app.add_middleware(DeadlineMiddleware)
+
 # Initialize database
 @app.on_event("startup")
 def startup_event():
     init_db()
 
+# Fire due reminders in the background (disable on all but one worker when scaling out)
+@app.on_event("startup")
+async def start_reminder_scheduler():
+    if SCHEDULER_ENABLED:
+        await reminder_scheduler.start()
+
+# Expire lapsed trials and subscriptions in batches so plan checks stay read-only
+@app.on_event("startup")
+async def start_subscription_sweeper():
+    if SWEEPER_ENABLED:
+        await subscription_sweeper.start()
+
+# Apply payment webhooks from the inbox in order
+@app.on_event("startup")
+async def start_webhook_worker():
+    if WEBHOOK_WORKER_ENABLED:
+        await webhook_worker.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await reminder_scheduler.stop()
+    await subscription_sweeper.stop()
+    await webhook_worker.stop()
+
 # Health check
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "VitaLedger API"}
+    dependencies = dependency_status()
+    degraded = any(dependency["state"] == OPEN for dependency in dependencies.values())
+    return {
+        "status": "degraded" if degraded else "healthy",
+        "service": "VitaLedger API",
+        "dependencies": dependencies
+    }
 
 # Include routers
 app.include_router(auth_router)
@@ -50,6 +102,12 @@ app.include_router(hydration_router)
 app.include_router(fitness_router)
 app.include_router(mind_router)
 app.include_router(subscriptions_router)
+app.include_router(rollups_router)
+app.include_router(batch_router)
+app.include_router(sync_router)
+app.include_router(calendar_router)
+app.include_router(llm_router)
+app.include_router(rag_router)
 
 if __name__ == "__main__":
     import uvicorn
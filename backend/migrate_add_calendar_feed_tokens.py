@@ -0,0 +1,26 @@
+"""Migration script to add calendar_feed_tokens (read-only .ics subscription tokens)"""
+import sqlite3
+
+def migrate():
+    conn = sqlite3.connect('vitaledger.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS calendar_feed_tokens (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            token_hash TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            revoked_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_calendar_feed_tokens_user_id ON calendar_feed_tokens(user_id)')
+    print("✅ calendar_feed_tokens table ready")
+    
+    conn.commit()
+    conn.close()
+    
+    print("✅ Calendar feed token migration completed")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,60 @@
+"""
+Migration script to add the user_daily_stats rollup table and the
+(user, day) indexes its write-path hooks query on the raw tracking tables.
+Run rebuild_rollups.py afterwards to backfill existing data.
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "vitaledger.db"
+
+INDEXES = [
+    ("idx_meals_user_date", "meals", "user_id, meal_date"),
+    ("idx_sleep_logs_user_date", "sleep_logs", "user_id, date"),
+    ("idx_hydration_logs_user_date", "hydration_logs", "user_id, date"),
+    ("idx_mood_logs_user_created", "mood_logs", "user_id, created_at"),
+    ("idx_workout_logs_user_completion", "workout_logs", "user_id, completion_date"),
+]
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_daily_stats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                date DATE NOT NULL,
+                meals_logged INTEGER DEFAULT 0,
+                calories REAL,
+                protein REAL,
+                carbs REAL,
+                fats REAL,
+                water_ml REAL,
+                sleep_hours REAL,
+                sleep_quality REAL,
+                mood_count INTEGER DEFAULT 0,
+                mood_avg REAL,
+                workouts_completed INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                CONSTRAINT uq_user_daily_stats_user_date UNIQUE (user_id, date)
+            )
+        """)
+        print("✅ user_daily_stats table ready")
+        
+        for index_name, table, columns in INDEXES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({columns})")
+            print(f"✅ {index_name} ready")
+        
+        conn.commit()
+        print("\n✅ Migration completed - run rebuild_rollups.py to backfill")
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,29 @@
+"""Migration script to add idempotency_keys (stored results of applied batch operations)"""
+import sqlite3
+
+def migrate():
+    conn = sqlite3.connect('vitaledger.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            key VARCHAR NOT NULL,
+            op VARCHAR NOT NULL,
+            status_code INTEGER NOT NULL,
+            response_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT uq_idempotency_keys_user_key UNIQUE (user_id, key)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_idempotency_keys_id ON idempotency_keys(id)')
+    print("✅ idempotency_keys table ready")
+    
+    conn.commit()
+    conn.close()
+    
+    print("✅ Idempotency keys migration completed")
+
+if __name__ == "__main__":
+    migrate()
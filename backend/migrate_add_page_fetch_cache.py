@@ -0,0 +1,32 @@
+"""Migration script to add the URL-keyed page fetch cache for RAG page ingestion"""
+import sqlite3
+
+def migrate():
+    conn = sqlite3.connect('vitaledger.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS page_fetch_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT,
+            url TEXT,
+            hash TEXT UNIQUE,
+            status TEXT,
+            title TEXT,
+            content_bytes INTEGER DEFAULT 0,
+            chunk_count INTEGER DEFAULT 0,
+            error TEXT,
+            fetched_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_page_fetch_cache_scope ON page_fetch_cache(scope)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_page_fetch_cache_fetched_at ON page_fetch_cache(fetched_at)')
+    print("✅ page_fetch_cache table ready")
+    
+    conn.commit()
+    conn.close()
+    
+    print("✅ Page fetch cache migration completed")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,33 @@
+"""Migration script to add the LLM rate limit bucket and daily usage tables"""
+import sqlite3
+
+def migrate():
+    conn = sqlite3.connect('vitaledger.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens FLOAT NOT NULL,
+            updated_at FLOAT NOT NULL
+        )
+    ''')
+    print("✅ rate_limit_buckets table ready")
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            key TEXT NOT NULL,
+            day DATE NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (key, day)
+        )
+    ''')
+    print("✅ llm_usage table ready")
+    
+    conn.commit()
+    conn.close()
+    print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,37 @@
+"""
+Migration script to add last_fired_at column to reminders table
+
+The reminder scheduler uses it to detect occurrences missed while the server was down.
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "vitaledger.db"
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("PRAGMA table_info(reminders)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'last_fired_at' not in columns:
+            print("Adding last_fired_at column to reminders table...")
+            cursor.execute("""
+                ALTER TABLE reminders 
+                ADD COLUMN last_fired_at TIMESTAMP
+            """)
+            conn.commit()
+            print("✅ Migration successful: last_fired_at column added")
+        else:
+            print("✅ Column last_fired_at already exists")
+            
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,20 @@
+"""Migration script to add the indexes used by the subscription expiry sweeper"""
+import sqlite3
+
+def migrate():
+    conn = sqlite3.connect('vitaledger.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscriptions_status_trial_ends ON subscriptions(status, trial_ends_at)')
+    print("✅ Added idx_subscriptions_status_trial_ends index")
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_subscriptions_status_ends ON subscriptions(status, ends_at)')
+    print("✅ Added idx_subscriptions_status_ends index")
+    
+    conn.commit()
+    conn.close()
+    
+    print("✅ Subscription expiry index migration completed")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,67 @@
+"""
+Migration script to add the sync_changes change feed and seed it with every
+existing synced record, so a client's first GET /sync?since=0 is a full snapshot.
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "vitaledger.db"
+
+SYNC_TABLES = [
+    "meals",
+    "hydration_logs",
+    "sleep_logs",
+    "mood_logs",
+    "reminders",
+    "appointments",
+    "caretakers",
+    "fitness_plans",
+    "meal_plans",
+]
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                entity VARCHAR NOT NULL,
+                entity_id INTEGER NOT NULL,
+                op VARCHAR NOT NULL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                CONSTRAINT uq_sync_changes_entity UNIQUE (entity, entity_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sync_changes_user_cursor
+            ON sync_changes (user_id, id)
+        """)
+        print("✅ sync_changes table ready")
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        existing_tables = {row[0] for row in cursor.fetchall()}
+        
+        for table in SYNC_TABLES:
+            if table not in existing_tables:
+                print(f"⚠️  {table} does not exist, skipping")
+                continue
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO sync_changes (user_id, entity, entity_id, op, changed_at)
+                SELECT user_id, '{table}', id, 'upsert', CURRENT_TIMESTAMP FROM {table}
+            """)
+            print(f"✅ Seeded {cursor.rowcount} {table} changes")
+        
+        conn.commit()
+        print("\n✅ Migration completed successfully")
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,88 @@
+"""
+Migration script to move lab report uploads into the content-addressed blob store
+
+Creates the upload_blobs table and lab_reports.content_hash, then hashes every
+existing upload, moves it to uploads/lab_reports/blobs/<xx>/<sha256>.pdf (identical
+files collapse into one blob) and records the per-blob reference counts.
+Reports whose file is missing are left untouched.
+"""
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+DB_PATH = BASE_DIR / "vitaledger.db"
+BLOB_DIR = Path("uploads/lab_reports/blobs")  # Stored relative to the backend directory, like file_path
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS upload_blobs (
+                sha256 VARCHAR(64) PRIMARY KEY,
+                path VARCHAR NOT NULL,
+                size INTEGER NOT NULL,
+                ref_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("PRAGMA table_info(lab_reports)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'content_hash' not in columns:
+            print("Adding content_hash column to lab_reports table...")
+            cursor.execute("ALTER TABLE lab_reports ADD COLUMN content_hash VARCHAR(64) REFERENCES upload_blobs(sha256)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_lab_reports_user_hash ON lab_reports (user_id, content_hash)")
+        conn.commit()
+
+        cursor.execute("SELECT id, file_path FROM lab_reports WHERE content_hash IS NULL")
+        moved = missing = 0
+        for report_id, file_path in cursor.fetchall():
+            source = BASE_DIR / file_path
+            if not source.exists():
+                missing += 1
+                continue
+
+            sha256 = file_sha256(source)
+            blob = BLOB_DIR / sha256[:2] / f"{sha256}.pdf"
+            target = BASE_DIR / blob
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists():
+                source.unlink()
+            else:
+                os.replace(source, target)
+
+            cursor.execute("""
+                INSERT INTO upload_blobs (sha256, path, size, ref_count) VALUES (?, ?, ?, 1)
+                ON CONFLICT(sha256) DO UPDATE SET ref_count = ref_count + 1
+            """, (sha256, str(blob), target.stat().st_size))
+            cursor.execute(
+                "UPDATE lab_reports SET content_hash = ?, file_path = ? WHERE id = ?",
+                (sha256, str(blob), report_id)
+            )
+            # Commit per file so the database always matches what has been moved
+            conn.commit()
+            moved += 1
+
+        print(f"✅ Migration successful: {moved} upload(s) moved to the blob store")
+        if missing:
+            print(f"⚠️  {missing} lab report(s) reference a missing file and were skipped")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,54 @@
+"""Migration script to add the payment webhook inbox (with claimed_at) and subscriptions.last_event_at"""
+import sqlite3
+
+def migrate():
+    conn = sqlite3.connect('vitaledger.db')
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            provider TEXT NOT NULL,
+            event_id TEXT NOT NULL,
+            event_type TEXT,
+            provider_ref TEXT,
+            user_reference TEXT,
+            occurred_at TIMESTAMP NOT NULL,
+            data JSON,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            claimed_at TIMESTAMP,
+            processed_at TIMESTAMP,
+            CONSTRAINT uq_webhook_events_provider_event UNIQUE (provider, event_id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_webhook_events_status_order ON webhook_events(status, occurred_at, id)')
+    print("✅ webhook_events table ready")
+    
+    try:
+        cursor.execute('ALTER TABLE webhook_events ADD COLUMN claimed_at TIMESTAMP')
+        print("✅ Added claimed_at column")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" in str(e).lower():
+            print("⚠️  claimed_at column already exists")
+        else:
+            raise
+    
+    try:
+        cursor.execute('ALTER TABLE subscriptions ADD COLUMN last_event_at TIMESTAMP')
+        print("✅ Added last_event_at column")
+    except sqlite3.OperationalError as e:
+        if "duplicate column" in str(e).lower():
+            print("⚠️  last_event_at column already exists")
+        else:
+            raise
+    
+    conn.commit()
+    conn.close()
+    
+    print("✅ Webhook inbox migration completed")
+
+if __name__ == "__main__":
+    migrate()
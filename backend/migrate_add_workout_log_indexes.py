@@ -0,0 +1,27 @@
+"""
+Migration script to add the (plan_id, day_number, completed) index to workout_logs
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "vitaledger.db"
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_workout_logs_plan_day
+            ON workout_logs (plan_id, day_number, completed)
+        """)
+        conn.commit()
+        print("✅ Migration successful: idx_workout_logs_plan_day created")
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,72 @@
+"""
+Migration script to rebuild lab_results with AUTOINCREMENT ids.
+
+Without it SQLite may reuse the ids of deleted rows, and the current-abnormalities
+cache (keyed on count and max id per user) could miss a change. Existing rows keep
+their ids.
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "vitaledger.db"
+
+COLUMNS = (
+    "id, user_id, report_id, code, parameter, value, value_text, unit, ref_low, ref_high, "
+    "normal_range, status, reason, next_test_days, sample_date, created_at"
+)
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    row = cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='lab_results'").fetchone()
+    if row is None:
+        print("⚠️  lab_results table does not exist (created on next startup)")
+        conn.close()
+        return
+    if "AUTOINCREMENT" in row[0].upper():
+        print("⚠️  lab_results already uses AUTOINCREMENT")
+        conn.close()
+        return
+    
+    try:
+        cursor.execute("ALTER TABLE lab_results RENAME TO lab_results_old")
+        cursor.execute("DROP INDEX IF EXISTS idx_lab_results_user_code_date")
+        cursor.execute("DROP INDEX IF EXISTS idx_lab_results_report")
+        cursor.execute("DROP INDEX IF EXISTS ix_lab_results_id")
+        cursor.execute("""
+            CREATE TABLE lab_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                report_id INTEGER NOT NULL REFERENCES lab_reports(id),
+                code VARCHAR NOT NULL,
+                parameter VARCHAR NOT NULL,
+                value FLOAT,
+                value_text VARCHAR,
+                unit VARCHAR,
+                ref_low FLOAT,
+                ref_high FLOAT,
+                normal_range VARCHAR,
+                status VARCHAR NOT NULL,
+                reason TEXT,
+                next_test_days INTEGER,
+                sample_date DATETIME NOT NULL,
+                created_at DATETIME
+            )
+        """)
+        cursor.execute(f"INSERT INTO lab_results ({COLUMNS}) SELECT {COLUMNS} FROM lab_results_old")
+        cursor.execute("DROP TABLE lab_results_old")
+        cursor.execute("CREATE INDEX ix_lab_results_id ON lab_results (id)")
+        cursor.execute("CREATE INDEX idx_lab_results_user_code_date ON lab_results (user_id, code, sample_date)")
+        cursor.execute("CREATE INDEX idx_lab_results_report ON lab_results (report_id)")
+        conn.commit()
+        print("✅ lab_results rebuilt with AUTOINCREMENT ids")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,97 @@
+"""
+Migration script to convert meal_plans.plan_data, sources and lab_considerations
+from TEXT to JSON columns
+
+The stored values are already JSON text, so the table is rebuilt with the new
+column types and the rows are copied as-is. Values that are not valid JSON are
+wrapped as JSON strings (plan_data) or cleared (sources, lab_considerations).
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "vitaledger.db"
+
+JSON_COLUMNS = ("plan_data", "sources", "lab_considerations")
+
+def migrate():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(meal_plans)")
+        column_types = {row[1]: row[2].upper() for row in cursor.fetchall()}
+
+        if not column_types:
+            print("❌ meal_plans table not found. Run migrate_add_meal_plans.py first")
+            return
+
+        if all(column_types.get(column) == "JSON" for column in JSON_COLUMNS):
+            print("✓ meal_plans JSON columns already migrated")
+            return
+
+        cursor.execute("""
+            SELECT COUNT(*) FROM meal_plans
+            WHERE json_valid(plan_data) = 0
+               OR (sources IS NOT NULL AND json_valid(sources) = 0)
+               OR (lab_considerations IS NOT NULL AND json_valid(lab_considerations) = 0)
+        """)
+        invalid_rows = cursor.fetchone()[0]
+        if invalid_rows:
+            print(f"⚠️  {invalid_rows} meal plan(s) contain invalid JSON and will be normalized")
+
+        # Rebuild in one transaction so a failure leaves the original table intact
+        cursor.execute("BEGIN")
+        cursor.execute("""
+            CREATE TABLE meal_plans_new (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                expectations TEXT NOT NULL,
+                plan_data JSON NOT NULL,
+                modification_notes TEXT,
+                sources JSON,
+                user_age INTEGER,
+                user_weight REAL,
+                user_height REAL,
+                user_nationality VARCHAR,
+                user_allergies TEXT,
+                lab_considerations JSON,
+                is_active BOOLEAN DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
+
+        cursor.execute("""
+            INSERT INTO meal_plans_new (
+                id, user_id, expectations, plan_data, modification_notes, sources,
+                user_age, user_weight, user_height, user_nationality, user_allergies,
+                lab_considerations, is_active, created_at
+            )
+            SELECT
+                id, user_id, expectations,
+                CASE WHEN json_valid(plan_data) THEN plan_data ELSE json_quote(plan_data) END,
+                modification_notes,
+                CASE WHEN json_valid(sources) THEN sources ELSE NULL END,
+                user_age, user_weight, user_height, user_nationality, user_allergies,
+                CASE WHEN json_valid(lab_considerations) THEN lab_considerations ELSE NULL END,
+                is_active, created_at
+            FROM meal_plans
+        """)
+
+        cursor.execute("DROP TABLE meal_plans")
+        cursor.execute("ALTER TABLE meal_plans_new RENAME TO meal_plans")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_meal_plans_id ON meal_plans (id)")
+
+        conn.commit()
+
+        cursor.execute("SELECT COUNT(*) FROM meal_plans")
+        print(f"✅ Migration successful: {cursor.fetchone()[0]} meal plan(s) now stored in JSON columns")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -16,3 +16,7 @@ class MoodLog(Base):
     
     # Relationship
     user = relationship("User", back_populates="mood_logs")
+
+    __table_args__ = (
+        Index('idx_mood_logs_user_created', 'user_id', 'created_at'),
+    )
@@ -8,6 +8,8 @@ from rag.pipeline import fetch_external_knowledge, assemble_prompt, format_respo
 import logging
 from groq import Groq
 import os
+from limits.admission import llm_admission
+from llm.dispatch import llm_dispatcher, INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,7 @@ def get_groq_client():
     return Groq(api_key=api_key)
 
 
-def naive_empathetic_reply(prompt_data: dict) -> str:
+async def naive_empathetic_reply(prompt_data: dict) -> str:
     """
     Generate empathetic reply using Groq with RAG context.
     Quotes retrieved sources in a compassionate way.
@@ -46,7 +48,9 @@ Do NOT say "I'm sorry" or be overly sympathetic. Be direct, supportive, and solu
     
     try:
         client = get_groq_client()
-        response = client.chat.completions.create(
+        response = await llm_dispatcher.acomplete(
+            client,
+            INTERACTIVE,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": full_prompt}
@@ -100,7 +104,7 @@ def register_mind_retriever_routes(router):
     @router.post("/advice")
     async def mind_advice(
         payload: dict,
-        current_user: User = Depends(get_current_user)
+        current_user: User = Depends(llm_admission())
     ):
         """
         Get AI mindfulness advice with web knowledge integration.
@@ -137,7 +141,7 @@ def register_mind_retriever_routes(router):
             prompt_data = assemble_prompt("mind", message, docs)
             
             # Generate response
-            reply = naive_empathetic_reply(prompt_data)
+            reply = await naive_empathetic_reply(prompt_data)
             
             # Format with sources
             result = format_response_with_sources(reply, docs)
@@ -152,7 +156,9 @@ def register_mind_retriever_routes(router):
                 from groq import Groq
                 import os
                 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-                response = client.chat.completions.create(
+                response = await llm_dispatcher.acomplete(
+                    client,
+                    INTERACTIVE,
                     messages=[
                         {"role": "system", "content": "You are a calm, empathetic AI mindfulness companion."},
                         {"role": "user", "content": message}
@@ -7,8 +7,11 @@ from auth.routes import get_current_user
 from auth.models import User
 from .models import MoodLog
 from .schemas import MoodCreate, MoodResponse
+from rollups.engine import refresh_day
 import os
 from groq import Groq
+from limits.admission import llm_admission
+from llm.dispatch import llm_dispatcher, INTERACTIVE
 
 router = APIRouter(prefix="/mind", tags=["Mindfulness"])
 
@@ -21,21 +24,29 @@ def get_groq_client():
     return Groq(api_key=api_key)
 
 
-@router.post("/log-mood", response_model=MoodResponse)
-async def log_mood(
-    mood_data: MoodCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Log a mood entry for the user"""
+def add_mood_log(db: Session, user_id: int, mood_data: MoodCreate) -> MoodLog:
+    """Stage a mood entry and its daily rollup (caller commits)"""
     mood_log = MoodLog(
-        user_id=current_user.id,
+        user_id=user_id,
         mood=mood_data.mood,
         intensity=mood_data.intensity,
         note=mood_data.note
     )
     
     db.add(mood_log)
+    db.flush()
+    refresh_day(db, user_id, mood_log.created_at)
+    return mood_log
+
+
+@router.post("/log-mood", response_model=MoodResponse)
+async def log_mood(
+    mood_data: MoodCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Log a mood entry for the user"""
+    mood_log = add_mood_log(db, current_user.id, mood_data)
     db.commit()
     db.refresh(mood_log)
     
@@ -59,7 +70,7 @@ async def get_mood_logs(
 @router.post("/chat")
 async def ai_therapy_chat(
     message: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(llm_admission())
 ):
     """
     AI therapist chat - empathetic, supportive responses
@@ -91,7 +102,9 @@ You are NOT:
 Keep responses concise (2-3 sentences), warm, and actionable. 
 If someone mentions severe distress, gently suggest professional help."""
 
-        response = client.chat.completions.create(
+        response = await llm_dispatcher.acomplete(
+            client,
+            INTERACTIVE,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_message}
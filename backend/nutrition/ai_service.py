@@ -1,12 +1,20 @@
 import os
 from groq import Groq
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Callable
 import json
 from dotenv import load_dotenv
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+import asyncio
+from nutrition.lab_parser import parse_lab_text, local_abnormalities, format_results_for_prompt, canonical_code
+from nutrition.pdf_extractor import PAGE_BREAK
+from llm.dispatch import llm_dispatcher, GENERATION
 
 load_dotenv()
 
+# Chunked (map-reduce) lab analysis
+LAB_CHUNK_CHARS = int(os.getenv("LAB_CHUNK_CHARS", "3500"))
+LAB_MAX_CHUNKS = int(os.getenv("LAB_MAX_CHUNKS", "12"))
+
 class AIService:
     """Service for AI-powered analysis using Groq (Fast & Free)"""
     
@@ -93,36 +101,151 @@ class AIService:
         
         return "\n".join(context_parts)
     
-    def analyze_lab_report(self, extracted_text: str, user=None) -> Dict:
+    def analyze_lab_report(self, extracted_text: str, user=None, parsed: Optional[Dict] = None) -> Dict:
         """
         Analyze lab report text using AI with user context and detailed abnormality detection
         
+        Known analytes are parsed and range-checked locally (nutrition.lab_parser), so the
+        LLM receives only those structured rows plus unparsed residue lines. Locally flagged
+        abnormalities are kept even when the LLM misses them or the call fails.
+        
         Args:
             extracted_text: Text extracted from the lab report PDF
             user: User object with profile information
+            parsed: Result of parse_lab_text(extracted_text), if already computed
             
         Returns:
-            Dictionary with analysis results including structured abnormalities
+            Dictionary with analysis results including structured abnormalities, parsed
+            lab_values and the computed next_test_date
         """
+        if parsed is None:
+            parsed = parse_lab_text(extracted_text)
+        
         if not self.client:
-            return {
-                "summary": "AI service not configured. Please add GROQ_API_KEY to .env file.",
-                "abnormalities": [],
-                "key_findings": [],
-                "recommendations": [],
-                "risk_factors": []
-            }
+            return self._finalize_lab_analysis(self._unconfigured_lab_result(), parsed)
         
-        try:
-            # Build user context
-            user_context = ""
-            if user:
-                user_context = f"\n\nPatient Profile:\n{self._get_user_context(user)}"
-            
-            prompt = f"""You are a medical AI assistant analyzing a lab report. Provide a detailed analysis with focus on abnormal findings.
-            
-Lab Report Text:
-{extracted_text[:3500]}
+        section = self._lab_report_sections(extracted_text, parsed, max_chars=None)[0]
+        prompt = self._lab_report_prompt(section, self._lab_user_context(user))
+        return self._finalize_lab_analysis(self._reduce_lab_results([self._call_lab_llm(prompt)]), parsed)
+    
+    async def analyze_lab_report_chunked(
+        self,
+        extracted_text: str,
+        user=None,
+        parsed: Optional[Dict] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict:
+        """
+        Map-reduce variant of analyze_lab_report for long reports.
+        
+        The report is split by page (or into groups of parsed rows) into sections of at
+        most LAB_CHUNK_CHARS, each section is analyzed concurrently (bounded by the LLM
+        concurrency limit), and the partial results are merged: abnormalities are
+        deduplicated by analyte and next_test_date is computed from the merged set.
+        Short reports use a single call.
+        
+        Sections whose LLM call failed (queue full, deadline passed, rate limited, API
+        error), and sections past LAB_MAX_CHUNKS, are left out of the merge; the result's
+        analysis_status is "partial" when some failed and "failed" when all did.
+        
+        Args:
+            on_progress: Called with (chunks_done, chunks_total) as chunks finish, in a
+                worker thread so it may block (e.g. on a database commit)
+        """
+        if parsed is None:
+            parsed = parse_lab_text(extracted_text)
+        
+        if not self.client:
+            return self._finalize_lab_analysis(self._unconfigured_lab_result(), parsed)
+        
+        user_context = self._lab_user_context(user)
+        sections = self._lab_report_sections(extracted_text, parsed, max_chars=LAB_CHUNK_CHARS)
+        skipped = len(sections) - LAB_MAX_CHUNKS
+        if skipped > 0:
+            # Sections past the cap count as failed, so the report is recorded as partial
+            print(f"⚠️ Lab report split into {len(sections)} chunks, analyzing the first {LAB_MAX_CHUNKS}")
+            sections = sections[:LAB_MAX_CHUNKS]
+        total = len(sections)
+        done = 0
+        progress_lock = asyncio.Lock()  # Keeps progress updates in order
+        
+        async def analyze_section(index: int, section: str) -> Dict:
+            nonlocal done
+            part = f"(Part {index + 1} of {total} of the report. Analyze only this part.)\n\n" if total > 1 else ""
+            prompt = self._lab_report_prompt(section, user_context, part)
+            result = await asyncio.to_thread(self._call_lab_llm, prompt)
+            done += 1
+            if on_progress:
+                async with progress_lock:
+                    await asyncio.to_thread(on_progress, done, total)
+            return result
+        
+        partials = await asyncio.gather(*[analyze_section(index, section) for index, section in enumerate(sections)])
+        partials.extend({"failed": True, "error": "Not analyzed: over LAB_MAX_CHUNKS"} for _ in range(max(skipped, 0)))
+        return self._finalize_lab_analysis(self._reduce_lab_results(partials), parsed)
+    
+    @staticmethod
+    def _unconfigured_lab_result() -> Dict:
+        return {
+            "summary": "AI service not configured. Please add GROQ_API_KEY to .env file.",
+            "abnormalities": [],
+            "key_findings": [],
+            "recommendations": "",
+            "risk_factors": ""
+        }
+    
+    def _lab_user_context(self, user) -> str:
+        return f"\n\nPatient Profile:\n{self._get_user_context(user)}" if user else ""
+    
+    @staticmethod
+    def _lab_report_sections(extracted_text: str, parsed: Dict, max_chars: Optional[int]) -> List[str]:
+        """
+        Split the LLM input into prompt sections of at most max_chars (None = one section).
+        Uses the parsed rows plus residue when the parser recognized values, else the raw
+        text split by page (truncated to 3500 chars in single-section mode).
+        """
+        if parsed["results"]:
+            header = "Structured Lab Values (parsed from the report, status checked against the reference range):"
+            segments = format_results_for_prompt(parsed["results"]).split("\n")
+            residue = parsed["residue"]
+            if max_chars is None:
+                return [f"{header}\n{chr(10).join(segments)}\n\nOther Report Lines (not parsed):\n{residue or 'None'}"]
+            if residue:
+                segments.append("Other Report Lines (not parsed):")
+                segments.extend(residue.split("\n"))
+        else:
+            # Unrecognized layout: fall back to the raw text
+            header = "Lab Report Text:"
+            if max_chars is None:
+                return [f"{header}\n{extracted_text[:3500]}"]
+            segments = [page.strip() for page in extracted_text.split(PAGE_BREAK) if page.strip()]
+        
+        chunks = []
+        current = []
+        size = 0
+        for segment in segments:
+            # Split oversized pages by line so no single segment exceeds a chunk
+            pieces = [segment] if len(segment) <= max_chars else [
+                line[start:start + max_chars]
+                for line in segment.split("\n")
+                for start in range(0, len(line), max_chars)
+            ]
+            for piece in pieces:
+                if current and size + len(piece) > max_chars:
+                    chunks.append(current)
+                    current, size = [], 0
+                current.append(piece)
+                size += len(piece) + 1
+        if current:
+            chunks.append(current)
+        
+        return [f"{header}\n" + "\n".join(chunk) for chunk in chunks] or [f"{header}\nNone"]
+    
+    @staticmethod
+    def _lab_report_prompt(report_section: str, user_context: str, part: str = "") -> str:
+        return f"""You are a medical AI assistant analyzing a lab report. Provide a detailed analysis with focus on abnormal findings.
+
+{part}{report_section}
 {user_context}
 
 Analyze this lab report and return ONLY valid JSON with this EXACT structure:
@@ -153,8 +276,13 @@ CRITICAL RULES:
 - Consider patient's nationality, diet, and lifestyle in reasons
 - Be specific and detailed in explanations
 - Return ONLY valid JSON, no additional text"""
-
-            response = self.client.chat.completions.create(
+    
+    def _call_lab_llm(self, prompt: str) -> Dict:
+        """Run one lab analysis prompt (through the LLM dispatcher) and parse its JSON"""
+        try:
+            response = llm_dispatcher.complete(
+                self.client,
+                GENERATION,
                 model="llama-3.1-8b-instant",  # Fast and high rate limit
                 messages=[
                     {"role": "system", "content": "You are a helpful medical AI assistant specializing in personalized lab report analysis. Consider the patient's demographic, lifestyle, and cultural background in your recommendations. Return ONLY valid JSON without markdown code blocks."},
@@ -174,8 +302,7 @@ CRITICAL RULES:
             
             # Try to parse JSON response
             try:
-                result = json.loads(result_text)
-                return result
+                return json.loads(result_text)
             except json.JSONDecodeError:
                 # If not valid JSON, return structured fallback
                 return {
@@ -187,23 +314,114 @@ CRITICAL RULES:
                 }
                 
         except Exception as e:
-            print(f"Error in AI analysis: {e}")
+            # LLMQueueFull, LLMDeadlineExceeded, GroqRateLimited or an API error: no analysis
+            # for this prompt, and nothing about the error may reach the user-visible fields
+            print(f"Error in AI analysis: {type(e).__name__}: {e}")
+            return {"failed": True, "error": f"{type(e).__name__}: {e}"}
+    
+    @staticmethod
+    def _reduce_lab_results(partials: List[Dict]) -> Dict:
+        """
+        Merge per-chunk analyses. Failed chunks are dropped and reflected in analysis_status
+        (completed, partial or failed); a partial result's summary says so.
+        """
+        succeeded = [partial for partial in partials if not partial.get("failed")]
+        if not succeeded:
             return {
-                "summary": f"Analysis error: {str(e)}",
+                "summary": "",
                 "abnormalities": [],
                 "key_findings": [],
                 "recommendations": "Please consult your healthcare provider",
-                "risk_factors": ""
+                "risk_factors": "",
+                "analysis_status": "failed",
+                "failed_chunks": len(partials)
             }
+        total = len(partials)
+        failed_chunks = total - len(succeeded)
+        result = dict(succeeded[0]) if len(succeeded) == 1 else AIService._merge_lab_results(succeeded)
+        result["analysis_status"] = "partial" if failed_chunks else "completed"
+        result["failed_chunks"] = failed_chunks
+        if failed_chunks:
+            note = (
+                f"Note: {failed_chunks} of {total} parts of this report could not be analyzed, so findings "
+                "from those parts may be missing. Values checked against their reference ranges are still listed."
+            )
+            result["summary"] = f"{result.get('summary') or ''}\n\n{note}".strip()
+        return result
+    
+    @staticmethod
+    def _merge_lab_results(partials: List[Dict]) -> Dict:
+        """Concatenate text fields, union findings and keep every abnormality of several analyses"""
+        
+        def join_unique(values) -> str:
+            seen = []
+            for value in values:
+                text = value if isinstance(value, str) else "; ".join(map(str, value or []))
+                text = text.strip()
+                if text and text not in seen:
+                    seen.append(text)
+            return "\n\n".join(seen)
+        
+        key_findings = []
+        for partial in partials:
+            for finding in partial.get("key_findings") or []:
+                if finding not in key_findings:
+                    key_findings.append(finding)
+        
+        return {
+            "summary": join_unique(partial.get("summary", "") for partial in partials),
+            "abnormalities": [abn for partial in partials for abn in partial.get("abnormalities") or []],
+            "key_findings": key_findings,
+            "recommendations": join_unique(partial.get("recommendations", "") for partial in partials),
+            "risk_factors": join_unique(partial.get("risk_factors", "") for partial in partials)
+        }
     
-    def generate_meal_recommendations(self, user, lab_report=None, recent_meals=None) -> str:
+    def _finalize_lab_analysis(self, result: Dict, parsed: Dict) -> Dict:
+        """Merge in local findings, dedupe abnormalities, attach lab_values and next_test_date"""
+        lab_values = parsed["results"]
+        result["abnormalities"] = self._merge_abnormalities(result.get("abnormalities") or [], local_abnormalities(lab_values))
+        result["lab_values"] = lab_values
+        
+        test_days = [abn["next_test_days"] for abn in result["abnormalities"] if abn.get("next_test_days")]
+        result["next_test_date"] = datetime.now() + timedelta(days=min(test_days)) if test_days else None
+        return result
+    
+    @staticmethod
+    def _merge_abnormalities(llm_findings: list, local_findings: list) -> list:
+        """
+        Deduplicate LLM abnormalities by analyte (keeping the most detailed entry and the
+        earliest retest) and add locally flagged ones the LLM did not report
+        """
+        merged = {}
+        for abnormality in llm_findings:
+            code = canonical_code(abnormality.get("parameter", ""))
+            if code:
+                abnormality["code"] = code
+            key = code or (abnormality.get("parameter") or "").strip().lower()
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = abnormality
+                continue
+            
+            test_days = [d for d in (existing.get("next_test_days"), abnormality.get("next_test_days")) if d]
+            if len(abnormality.get("reason") or "") > len(existing.get("reason") or ""):
+                merged[key] = existing = abnormality
+            if test_days:
+                existing["next_test_days"] = min(test_days)
+        
+        for finding in local_findings:
+            merged.setdefault(finding["code"], finding)
+        return list(merged.values())
+    
+    def generate_meal_recommendations(self, user, lab_report=None, recent_meals=None, abnormalities=None) -> str:
         """
         Generate personalized meal recommendations based on comprehensive user profile and lab abnormalities
         
         Args:
             user: User object with complete profile
-            lab_report: Optional latest lab report with abnormality findings
+            lab_report: Optional latest lab report (summary and, as a fallback, its abnormality findings)
             recent_meals: Optional list of recent meals
+            abnormalities: Optional current abnormal lab values (nutrition.lab_results view)
             
         Returns:
             AI-generated personalized meal plan addressing deficiencies
@@ -217,22 +435,22 @@ CRITICAL RULES:
             
             # Add lab findings and abnormalities if available
             lab_context = ""
-            if lab_report:
-                if lab_report.ai_summary:
-                    lab_context = f"\n\nLatest Lab Results Summary:\n{lab_report.ai_summary}"
-                
-                # Include detailed abnormalities for targeted nutrition
-                if lab_report.abnormalities:
-                    try:
-                        abnormalities = json.loads(lab_report.abnormalities) if isinstance(lab_report.abnormalities, str) else lab_report.abnormalities
-                        if abnormalities:
-                            lab_context += "\n\nABNORMAL LAB FINDINGS (MUST ADDRESS IN MEAL PLAN):"
-                            for abn in abnormalities:
-                                lab_context += f"\n- {abn.get('parameter')}: {abn.get('status').upper()} ({abn.get('value')})"
-                                lab_context += f"\n  Reason: {abn.get('reason', 'Unknown')}"
-                                lab_context += f"\n  Needs: Foods to correct this deficiency/excess"
-                    except:
-                        pass
+            if lab_report and lab_report.ai_summary:
+                lab_context = f"\n\nLatest Lab Results Summary:\n{lab_report.ai_summary}"
+            
+            if abnormalities is None and lab_report and lab_report.abnormalities:
+                try:
+                    abnormalities = json.loads(lab_report.abnormalities) if isinstance(lab_report.abnormalities, str) else lab_report.abnormalities
+                except:
+                    abnormalities = None
+            
+            # Include detailed abnormalities for targeted nutrition
+            if abnormalities:
+                lab_context += "\n\nABNORMAL LAB FINDINGS (MUST ADDRESS IN MEAL PLAN):"
+                for abn in abnormalities:
+                    lab_context += f"\n- {abn.get('parameter')}: {abn.get('status').upper()} ({abn.get('value')})"
+                    lab_context += f"\n  Reason: {abn.get('reason', 'Unknown')}"
+                    lab_context += f"\n  Needs: Foods to correct this deficiency/excess"
             
             # Add recent meals context
             meals_context = ""
@@ -281,7 +499,9 @@ REQUIREMENTS:
 4. Make it practical and delicious
 5. No asterisks or markdown - plain text only"""
 
-            response = self.client.chat.completions.create(
+            response = llm_dispatcher.complete(
+                self.client,
+                GENERATION,
                 model="llama-3.1-8b-instant",
                 messages=[
                     {"role": "system", "content": "You are an expert clinical nutritionist. Create structured, therapeutic meal plans that address lab abnormalities. Use plain text formatting with clear sections (BREAKFAST:, LUNCH:, etc.). No markdown symbols like **, ***, ##, or __."},
@@ -0,0 +1,314 @@
+"""
+Rule-based lab value extraction.
+
+Parses "parameter  value  unit  reference-range" rows from the text PyPDF2
+extracts from lab report tables, covering the common CBC, lipid, metabolic,
+thyroid and vitamin panels. Values outside the reported reference range (or
+the default adult one, for values in its unit) are flagged locally, so the LLM
+only needs the structured rows plus whatever lines could not be parsed.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+# code: (display name, panel, aliases, default unit, default low, default high, retest days)
+ANALYTES = {
+    # Complete blood count
+    "HGB": ("Hemoglobin", "cbc", ["hemoglobin", "haemoglobin", "hgb", "hb"], "g/dL", 12.0, 17.5, 60),
+    "HCT": ("Hematocrit", "cbc", ["hematocrit", "haematocrit", "hct", "pcv", "packed cell volume"], "%", 36.0, 50.0, 60),
+    "RBC": ("Red Blood Cell Count", "cbc", ["red blood cell count", "red blood cells", "rbc count", "rbc"], "10^6/uL", 4.2, 5.9, 60),
+    "WBC": ("White Blood Cell Count", "cbc", ["white blood cell count", "white blood cells", "total leucocyte count", "total leukocyte count", "wbc count", "wbc", "tlc"], "10^3/uL", 4.0, 11.0, 30),
+    "PLT": ("Platelet Count", "cbc", ["platelet count", "platelets", "plt"], "10^3/uL", 150.0, 450.0, 30),
+    "MCV": ("MCV", "cbc", ["mean corpuscular volume", "mcv"], "fL", 80.0, 100.0, 60),
+    "MCH": ("MCH", "cbc", ["mean corpuscular hemoglobin", "mch"], "pg", 27.0, 33.0, 60),
+    "MCHC": ("MCHC", "cbc", ["mean corpuscular hemoglobin concentration", "mchc"], "g/dL", 32.0, 36.0, 60),
+    "RDW": ("RDW", "cbc", ["red cell distribution width", "rdw-cv", "rdw"], "%", 11.5, 14.5, 60),
+    # Lipid panel
+    "CHOL": ("Total Cholesterol", "lipid", ["total cholesterol", "cholesterol total", "cholesterol, total", "serum cholesterol", "cholesterol"], "mg/dL", None, 200.0, 90),
+    "LDL": ("LDL Cholesterol", "lipid", ["ldl cholesterol", "ldl-cholesterol", "ldl-c", "ldl"], "mg/dL", None, 100.0, 90),
+    "HDL": ("HDL Cholesterol", "lipid", ["hdl cholesterol", "hdl-cholesterol", "hdl-c", "hdl"], "mg/dL", 40.0, None, 90),
+    "VLDL": ("VLDL Cholesterol", "lipid", ["vldl cholesterol", "vldl-c", "vldl"], "mg/dL", 5.0, 40.0, 90),
+    "TRIG": ("Triglycerides", "lipid", ["triglycerides", "triglyceride", "tg"], "mg/dL", None, 150.0, 90),
+    # Metabolic panel
+    "HBA1C": ("HbA1c", "metabolic", ["hba1c", "hb a1c", "hemoglobin a1c", "haemoglobin a1c", "glycated hemoglobin", "glycosylated hemoglobin", "a1c"], "%", 4.0, 5.6, 90),
+    "GLU": ("Fasting Glucose", "metabolic", ["fasting blood glucose", "fasting blood sugar", "fasting glucose", "glucose fasting", "glucose, fasting", "fbs", "glucose"], "mg/dL", 70.0, 99.0, 90),
+    "BUN": ("Blood Urea Nitrogen", "metabolic", ["blood urea nitrogen", "urea nitrogen", "bun"], "mg/dL", 7.0, 20.0, 90),
+    "CREAT": ("Creatinine", "metabolic", ["serum creatinine", "creatinine"], "mg/dL", 0.6, 1.3, 90),
+    "NA": ("Sodium", "metabolic", ["sodium", "na+"], "mmol/L", 135.0, 145.0, 60),
+    "K": ("Potassium", "metabolic", ["potassium", "k+"], "mmol/L", 3.5, 5.1, 60),
+    "CL": ("Chloride", "metabolic", ["chloride", "cl-"], "mmol/L", 98.0, 107.0, 60),
+    "CO2": ("Bicarbonate", "metabolic", ["bicarbonate", "co2", "total co2"], "mmol/L", 22.0, 29.0, 60),
+    "CA": ("Calcium", "metabolic", ["total calcium", "serum calcium", "calcium"], "mg/dL", 8.5, 10.5, 90),
+    "ALT": ("ALT (SGPT)", "metabolic", ["alanine aminotransferase", "alt (sgpt)", "sgpt", "alt"], "U/L", 7.0, 56.0, 60),
+    "AST": ("AST (SGOT)", "metabolic", ["aspartate aminotransferase", "ast (sgot)", "sgot", "ast"], "U/L", 10.0, 40.0, 60),
+    "ALP": ("Alkaline Phosphatase", "metabolic", ["alkaline phosphatase", "alp"], "U/L", 44.0, 147.0, 90),
+    "TBIL": ("Total Bilirubin", "metabolic", ["total bilirubin", "bilirubin total", "bilirubin, total", "bilirubin"], "mg/dL", 0.1, 1.2, 60),
+    "ALB": ("Albumin", "metabolic", ["serum albumin", "albumin"], "g/dL", 3.5, 5.0, 90),
+    "URIC": ("Uric Acid", "metabolic", ["serum uric acid", "uric acid"], "mg/dL", 3.5, 7.2, 90),
+    # Thyroid panel
+    "TSH": ("TSH", "thyroid", ["thyroid stimulating hormone", "tsh"], "mIU/L", 0.4, 4.0, 45),
+    "FT4": ("Free T4", "thyroid", ["free thyroxine", "free t4", "ft4"], "ng/dL", 0.8, 1.8, 45),
+    "FT3": ("Free T3", "thyroid", ["free triiodothyronine", "free t3", "ft3"], "pg/mL", 2.3, 4.2, 45),
+    "T4": ("Total T4", "thyroid", ["total thyroxine", "total t4", "thyroxine", "t4"], "ug/dL", 5.0, 12.0, 45),
+    "T3": ("Total T3", "thyroid", ["total triiodothyronine", "total t3", "triiodothyronine", "t3"], "ng/dL", 80.0, 200.0, 45),
+    # Vitamins and minerals
+    "VITD": ("Vitamin D", "vitamins", ["25-hydroxy vitamin d", "25-oh vitamin d", "25(oh) vitamin d", "vitamin d3", "vitamin d total", "vitamin d", "vit d"], "ng/mL", 30.0, 100.0, 90),
+    "B12": ("Vitamin B12", "vitamins", ["vitamin b12", "vitamin b-12", "vit b12", "cobalamin", "b12"], "pg/mL", 200.0, 900.0, 90),
+    "FOLATE": ("Folate", "vitamins", ["serum folate", "folic acid", "folate"], "ng/mL", 2.7, 17.0, 90),
+    "FERRITIN": ("Ferritin", "vitamins", ["serum ferritin", "ferritin"], "ng/mL", 30.0, 400.0, 90),
+    "IRON": ("Serum Iron", "vitamins", ["serum iron", "iron"], "ug/dL", 60.0, 170.0, 90),
+}
+
+# Longest aliases first so "hemoglobin a1c" wins over "hemoglobin" and "ldl cholesterol" over "cholesterol"
+_ALIASES: List[Tuple[str, str]] = sorted(
+    ((alias, code) for code, spec in ANALYTES.items() for alias in spec[2]),
+    key=lambda item: len(item[0]),
+    reverse=True
+)
+_ALIAS_PATTERN = re.compile(
+    r"^[\s\-\*•\d\.\)]{0,4}(" + "|".join(re.escape(alias) for alias, _ in _ALIASES) + r")(?![a-z0-9])",
+    re.IGNORECASE
+)
+_ALIAS_LOOKUP = {alias: code for alias, code in _ALIASES}
+
+# Thousands separators ("250,000", Indian "2,50,000") or a plain decimal
+_NUMBER = r"\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_VALUE_PATTERN = re.compile(
+    r"(?P<value>" + _NUMBER + r")\s*(?P<flag>\b(?:H|L|HIGH|LOW|High|Low)\b|\*)?\s*"
+    r"(?P<unit>(?:x\s?)?10\^?\d+/[a-zA-Zµμ]+|[a-zA-Zµμ%/][^\s]*)?",
+)
+_RANGE_PATTERN = re.compile(r"(?P<low>" + _NUMBER + r")\s*(?:-|–|to)\s*(?P<high>" + _NUMBER + r")")
+_UPPER_BOUND_PATTERN = re.compile(r"(?:<|≤|<=|less than|upto|up to)\s*(?P<high>" + _NUMBER + r")", re.IGNORECASE)
+_LOWER_BOUND_PATTERN = re.compile(r"(?:>|≥|>=|greater than|more than)\s*(?P<low>" + _NUMBER + r")", re.IGNORECASE)
+
+# What may sit between the name and the value: separators, bracketed qualifiers
+# ("Vitamin D (25-OH)", "[Serum]") and a unit ("Glucose mg/dL 92"). Any other word
+# means the line names a different test ("Glucose, Post Prandial", "Iron binding
+# capacity", "LDL/HDL Ratio") and is left for the LLM.
+_SEPARATORS = r"[\s:=,\-–]*"
+_LEAD_PATTERN = re.compile(
+    r"^" + _SEPARATORS
+    + r"(?:(?:\([^)]*\)|\[[^\]]*\])" + _SEPARATORS + r")*"
+    + r"(?:(?:(?:x\s?)?10\^?\d+|[a-zA-Zµμ]+)/[a-zA-Zµμ]+\s+|%\s*)?"
+)
+_QUALIFIERS_ONLY_PATTERN = re.compile(r"^(?:\s*(?:\([^)]*\)|\[[^\]]*\]))*\s*$")
+_FLAG_WORDS = {"h", "l", "high", "low"}
+# Lines that are letterhead/boilerplate rather than results
+_BOILERPLATE_PATTERN = re.compile(
+    r"\b(address|phone|tel|fax|e-?mail|www\.|http|page \d|printed|registered|lab no|accession|"
+    r"barcode|disclaimer|interpretation|signature|pathologist|nabl|cap accredited)\b",
+    re.IGNORECASE
+)
+
+# Other spellings of the default units (lowercase, after _unit_key's normalization)
+_UNIT_SYNONYMS = {
+    "iu/l": "u/l",
+    "uiu/ml": "miu/l",
+    "ug/l": "ng/ml",
+    "k/ul": "10^3/ul",
+    "thou/ul": "10^3/ul",
+    "10^9/l": "10^3/ul",
+    "m/ul": "10^6/ul",
+    "mill/ul": "10^6/ul",
+    "10^12/l": "10^6/ul",
+    "/cumm": "/ul",
+    "cells/cumm": "/ul",
+    "/mm3": "/ul",
+    "cells/ul": "/ul",
+}
+
+RESIDUE_MAX_CHARS = 1500
+
+
+def _to_float(value: str) -> float:
+    return float(value.replace(",", ""))
+
+
+def _unit_key(unit: str) -> str:
+    key = unit.lower().replace(" ", "").replace("µ", "u").replace("μ", "u").replace("mcg", "ug")
+    key = key.replace("*", "^").replace("³", "^3").replace("⁶", "^6").replace("⁹", "^9")
+    if key.startswith("x10"):
+        key = key[1:]
+    return _UNIT_SYNONYMS.get(key, key)
+
+
+def _format_range(low: Optional[float], high: Optional[float]) -> str:
+    if low is not None and high is not None:
+        return f"{low:g}-{high:g}"
+    if high is not None:
+        return f"<{high:g}"
+    if low is not None:
+        return f">{low:g}"
+    return ""
+
+
+def _parse_range(text: str) -> Tuple[Optional[float], Optional[float]]:
+    match = _RANGE_PATTERN.search(text)
+    if match:
+        return _to_float(match.group("low")), _to_float(match.group("high"))
+    match = _UPPER_BOUND_PATTERN.search(text)
+    if match:
+        return None, _to_float(match.group("high"))
+    match = _LOWER_BOUND_PATTERN.search(text)
+    if match:
+        return _to_float(match.group("low")), None
+    return None, None
+
+
+def parse_line(line: str) -> Optional[Dict]:
+    """Parse one results-table line into a lab value dict, or None if it isn't one"""
+    alias_match = _ALIAS_PATTERN.match(line)
+    if not alias_match:
+        return None
+
+    code = _ALIAS_LOOKUP[alias_match.group(1).lower()]
+    name, panel, _, default_unit, default_low, default_high, retest_days = ANALYTES[code]
+
+    # The value must follow the name directly (after optional qualifiers or a unit)
+    rest = line[alias_match.end():]
+    lead = _LEAD_PATTERN.match(rest)
+    rest = rest[lead.end():]
+    value_match = _VALUE_PATTERN.match(rest)
+    if not value_match:
+        return None
+
+    value = _to_float(value_match.group("value"))
+    flag = (value_match.group("flag") or "").lower()
+    unit = value_match.group("unit")
+    if unit and unit.lower() in _FLAG_WORDS:
+        unit = None
+
+    # The reference range, when printed, follows the value
+    low, high = _parse_range(rest[value_match.end():])
+    range_printed = low is not None or high is not None
+    if not range_printed:
+        # The default ranges are in default_unit. Counts reported per cumm (e.g. 250000)
+        # convert to 10^3/uL; a value in any other unit (glucose in mmol/L, hemoglobin
+        # in g/L) cannot be judged against them and is left for the LLM.
+        if code in ("WBC", "PLT") and value >= 1000 and (not unit or _unit_key(unit) == "/ul"):
+            value = value / 1000
+            unit = default_unit
+        elif unit and _unit_key(unit) != _unit_key(default_unit):
+            return None
+        low, high = default_low, default_high
+
+    if flag in ("h", "high") or (high is not None and value > high):
+        status = "high"
+    elif flag in ("l", "low") or (low is not None and value < low):
+        status = "low"
+    else:
+        status = "normal"
+
+    unit = unit or default_unit
+    return {
+        "code": code,
+        "parameter": name,
+        "panel": panel,
+        "value": value,
+        "unit": unit,
+        "ref_low": low,
+        "ref_high": high,
+        "normal_range": f"{_format_range(low, high)} {unit}".strip(),
+        "range_printed": range_printed,
+        "status": status,
+        "next_test_days": retest_days,
+        "raw": line.strip()
+    }
+
+
+def _is_residue(line: str) -> bool:
+    """Unparsed lines worth showing the LLM: short, contain a number, not letterhead"""
+    return (
+        len(line) <= 160
+        and any(ch.isdigit() for ch in line)
+        and any(ch.isalpha() for ch in line)
+        and not _BOILERPLATE_PATTERN.search(line)
+    )
+
+
+def parse_lab_text(text: str) -> Dict:
+    """
+    Extract structured lab values from report text.
+
+    Returns:
+        {"results": [lab value dicts, one per analyte],
+         "residue": unparsed candidate lines (capped at RESIDUE_MAX_CHARS)}
+
+    An analyte matched by several lines with different values is ambiguous: none
+    of them becomes a result and all go to the residue. Repeats of the same value
+    keep the first line as the result and send the rest to the residue.
+    """
+    by_code: Dict[str, List[Dict]] = {}
+    candidates = []
+
+    for raw_line in (text or "").splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        parsed = parse_line(line)
+        if parsed:
+            by_code.setdefault(parsed["code"], []).append(parsed)
+        elif _is_residue(line):
+            candidates.append(line)
+
+    results = []
+    contested = []
+    for rows in by_code.values():
+        if len({row["value"] for row in rows}) == 1:
+            results.append(rows[0])
+            contested.extend(row["raw"] for row in rows[1:])
+        else:
+            contested.extend(row["raw"] for row in rows)
+
+    # Lines the parser could not settle come first, the LLM has to resolve them
+    residue_lines = []
+    residue_size = 0
+    for line in contested + candidates:
+        if residue_size + len(line) >= RESIDUE_MAX_CHARS:
+            break
+        residue_lines.append(line)
+        residue_size += len(line) + 1
+
+    return {"results": results, "residue": "\n".join(residue_lines)}
+
+
+def local_abnormalities(results: List[Dict]) -> List[Dict]:
+    """Abnormality entries (same shape the LLM returns) for out-of-range parsed values"""
+    return [
+        {
+            "parameter": result["parameter"],
+            "value": f"{result['value']:g} {result['unit']}",
+            "normal_range": result["normal_range"],
+            "status": result["status"],
+            "reason": (
+                "Outside the reference range printed on the report" if result.get("range_printed")
+                else "Outside the typical adult reference range"
+            ),
+            "importance": "",
+            "risks": "",
+            "next_test_days": result["next_test_days"],
+            "code": result["code"]
+        }
+        for result in results
+        if result["status"] != "normal"
+    ]
+
+
+def format_results_for_prompt(results: List[Dict]) -> str:
+    """Compact one-line-per-analyte table for the LLM prompt"""
+    return "\n".join(
+        f"{r['parameter']}: {r['value']:g} {r['unit']} (ref {r['normal_range'] or 'n/a'}) {r['status'].upper()}"
+        for r in results
+    )
+
+
+def canonical_code(parameter: str) -> Optional[str]:
+    """
+    Map a free-text parameter name (e.g. from the LLM) to an analyte code. The
+    whole name must be an alias, optionally followed by bracketed qualifiers.
+    """
+    parameter = (parameter or "").strip()
+    match = _ALIAS_PATTERN.match(parameter)
+    if not match or not _QUALIFIERS_ONLY_PATTERN.match(parameter[match.end():]):
+        return None
+    return _ALIAS_LOOKUP[match.group(1).lower()]
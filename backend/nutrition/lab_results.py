@@ -0,0 +1,180 @@
+"""
+Normalized lab results.
+
+Every analyzed report writes one lab_results row per measured parameter, keyed by
+the canonical analyte code from nutrition.lab_parser, so per-parameter history is
+a single indexed range scan instead of decoding every report's JSON.
+
+get_current_abnormalities() is the "latest value per parameter that is out of
+range" view. It is cached per user and revalidated against a cheap (count, max id)
+fingerprint; lab_results ids are AUTOINCREMENT, so they are never reused and any
+insert or delete of the user's lab results invalidates it. The meal plan,
+recommendation and fitness generators read it through get_lab_abnormalities(),
+which falls back to the latest report's stored findings when the view is empty.
+"""
+import json
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from db import bulk_insert
+from nutrition.lab_parser import canonical_code
+from nutrition.models import LabReport, LabResult
+
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+_abnormality_cache: Dict[int, Tuple[Tuple[int, Optional[int]], List[Dict]]] = {}
+_cache_lock = threading.Lock()
+
+
+def result_code(parameter: str) -> str:
+    """Canonical code for a parameter name; unknown names get an upper-case slug"""
+    return canonical_code(parameter) or re.sub(r"[^A-Z0-9]+", "_", (parameter or "UNKNOWN").upper()).strip("_")
+
+
+def _first_number(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_PATTERN.search(str(value or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def record_lab_results(db: Session, lab_report, analysis: Dict) -> int:
+    """
+    Stage lab_results rows for an analyzed report (caller commits).
+
+    Uses the locally parsed values (analysis["lab_values"]) for every parameter,
+    enriched with the LLM's reason for abnormal ones, plus LLM-only abnormalities
+    that the parser did not recognize. Replaces any rows from a previous analysis.
+    """
+    sample_date = lab_report.report_date or lab_report.uploaded_at or datetime.utcnow()
+    abnormalities = {
+        abnormality.get("code") or result_code(abnormality.get("parameter", "")): abnormality
+        for abnormality in analysis.get("abnormalities") or []
+    }
+
+    rows = []
+    for value in analysis.get("lab_values") or []:
+        abnormality = abnormalities.pop(value["code"], {})
+        rows.append({
+            "user_id": lab_report.user_id,
+            "report_id": lab_report.id,
+            "code": value["code"],
+            "parameter": value["parameter"],
+            "value": value["value"],
+            "value_text": f"{value['value']:g} {value['unit']}".strip(),
+            "unit": value["unit"],
+            "ref_low": value["ref_low"],
+            "ref_high": value["ref_high"],
+            "normal_range": value["normal_range"],
+            "status": value["status"],
+            "reason": abnormality.get("reason"),
+            "next_test_days": abnormality.get("next_test_days") or (value["next_test_days"] if value["status"] != "normal" else None),
+            "sample_date": sample_date
+        })
+
+    for code, abnormality in abnormalities.items():
+        rows.append({
+            "user_id": lab_report.user_id,
+            "report_id": lab_report.id,
+            "code": code,
+            "parameter": abnormality.get("parameter") or code,
+            "value": _first_number(abnormality.get("value")),
+            "value_text": str(abnormality.get("value", "")),
+            "unit": None,
+            "ref_low": None,
+            "ref_high": None,
+            "normal_range": abnormality.get("normal_range"),
+            "status": (abnormality.get("status") or "abnormal").lower(),
+            "reason": abnormality.get("reason"),
+            "next_test_days": abnormality.get("next_test_days"),
+            "sample_date": sample_date
+        })
+
+    db.query(LabResult).filter(LabResult.report_id == lab_report.id).delete(synchronize_session=False)
+    bulk_insert(db, LabResult, rows)
+    return len(rows)
+
+
+def _fingerprint(db: Session, user_id: int) -> Tuple[int, Optional[int]]:
+    return db.query(func.count(LabResult.id), func.max(LabResult.id)).filter(
+        LabResult.user_id == user_id
+    ).one()
+
+
+def get_current_abnormalities(db: Session, user_id: int) -> List[Dict]:
+    """
+    Latest result per parameter that is out of range, newest sample first.
+
+    Returns abnormality dicts in the same shape the lab analysis produces
+    (parameter, value, normal_range, status, reason, next_test_days) plus code and sample_date.
+    """
+    fingerprint = tuple(_fingerprint(db, user_id))
+    with _cache_lock:
+        cached = _abnormality_cache.get(user_id)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    latest = db.query(
+        LabResult.id,
+        func.row_number().over(
+            partition_by=LabResult.code,
+            order_by=(LabResult.sample_date.desc(), LabResult.id.desc())
+        ).label("rank")
+    ).filter(LabResult.user_id == user_id).subquery()
+
+    results = db.query(LabResult).join(latest, LabResult.id == latest.c.id).filter(
+        latest.c.rank == 1,
+        LabResult.status != "normal"
+    ).order_by(LabResult.sample_date.desc(), LabResult.parameter).all()
+
+    abnormalities = [
+        {
+            "code": result.code,
+            "parameter": result.parameter,
+            "value": result.value_text,
+            "normal_range": result.normal_range,
+            "status": result.status,
+            "reason": result.reason or "Outside the reference range",
+            "next_test_days": result.next_test_days,
+            "sample_date": result.sample_date.isoformat()
+        }
+        for result in results
+    ]
+
+    with _cache_lock:
+        _abnormality_cache[user_id] = (fingerprint, abnormalities)
+    return abnormalities
+
+
+def get_lab_abnormalities(db: Session, user_id: int) -> List[Dict]:
+    """
+    Current abnormalities for prompts: the get_current_abnormalities() view, or when it
+    is empty, the abnormalities stored on the latest analyzed report (reports analyzed
+    before lab_results existed have no rows until rebuild_lab_results.py runs)
+    """
+    abnormalities = get_current_abnormalities(db, user_id)
+    if abnormalities:
+        return abnormalities
+
+    stored = db.query(LabReport.abnormalities).filter(
+        LabReport.user_id == user_id,
+        LabReport.analysis_status.in_(("completed", "partial"))
+    ).order_by(LabReport.created_at.desc()).limit(1).scalar()
+    try:
+        abnormalities = json.loads(stored) if stored else []
+    except ValueError:
+        return []
+    return abnormalities if isinstance(abnormalities, list) else []
+
+
+def format_abnormalities(abnormalities: List[Dict]) -> str:
+    """One line per abnormal parameter for prompts"""
+    return "\n".join(
+        f"- {abnormality['parameter']}: {abnormality['status'].upper()} ({abnormality['value']}, normal {abnormality.get('normal_range') or 'N/A'})"
+        for abnormality in abnormalities
+    )
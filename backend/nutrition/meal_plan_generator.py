@@ -4,14 +4,20 @@ Generates evidence-based meal plans using real web data
 """
 import os
 import json
+import time
 from typing import Dict, List, Optional
 from groq import Groq
 from dotenv import load_dotenv
 from datetime import datetime, date
-from rag.brightdata_unlocker import BrightDataClient
+from rag.search_router import search_router
+from resilience import deadline
+from llm.dispatch import llm_dispatcher, GENERATION
 
 load_dotenv()
 
+# Budget for all recipe/guideline searches of one plan
+RAG_SEARCH_SECONDS = float(os.getenv("MEAL_PLAN_SEARCH_SECONDS", "20"))
+
 class MealPlanGenerator:
     """Generate personalized meal plans with RAG-verified recipes and nutrition data"""
     
@@ -84,19 +90,15 @@ class MealPlanGenerator:
         return queries[:5]  # Limit to 5 most relevant queries
     
     def _search_recipes_and_guidelines(self, queries: List[str]) -> Dict[str, List[Dict]]:
-        """Use Bright Data RAG to search for real recipes and dietary guidelines"""
+        """Use web search RAG to find real recipes and dietary guidelines"""
         all_sources = []
         
-        try:
-            client = BrightDataClient()
-        except Exception as e:
-            print(f"Failed to initialize Bright Data client: {e}")
-            return {'sources': [], 'total_sources': 0}
-        
+        started = time.monotonic()
         for query in queries:
             try:
                 print(f"RAG Search: {query}")
-                results = client.search(query)
+                with deadline(RAG_SEARCH_SECONDS - (time.monotonic() - started)):
+                    results = search_router.search(query)
                 
                 for result in results[:3]:  # Top 3 per query
                     all_sources.append({
@@ -243,7 +245,9 @@ Return ONLY valid JSON with this EXACT structure (no markdown, no extra text):
 Generate the full 7-day plan now:"""
 
             # Call AI with RAG context
-            response = self.client.chat.completions.create(
+            response = llm_dispatcher.complete(
+                self.client,
+                GENERATION,
                 model="llama-3.1-8b-instant",
                 messages=[
                     {
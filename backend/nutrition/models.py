@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index, JSON
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from db import Base
 
@@ -20,6 +20,10 @@ class Meal(Base):
     
     user = relationship("User", back_populates="meals")
 
+    __table_args__ = (
+        Index('idx_meals_user_date', 'user_id', 'meal_date'),
+    )
+
 class LabReport(Base):
     __tablename__ = "lab_reports"
 
@@ -27,20 +31,22 @@ class LabReport(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     report_name = Column(String, nullable=False)
     file_path = Column(String, nullable=False)  # Path to uploaded PDF
+    content_hash = Column(String(64), ForeignKey("upload_blobs.sha256"), nullable=True)  # SHA-256 of the PDF (content-addressed blob)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     report_date = Column(DateTime, nullable=True)
     next_test_date = Column(DateTime, nullable=True)  # Calculated next test date
     
     # AI Analysis Results
-    analysis_status = Column(String, default="pending")  # pending, analyzing, completed, failed
-    extracted_text = Column(Text, nullable=True)
-    ai_summary = Column(Text, nullable=True)
+    analysis_status = Column(String, default="pending")  # pending, analyzing, completed, partial, failed
+    # Large text columns are deferred; each group loads in one query when first accessed
+    extracted_text = deferred(Column(Text, nullable=True), group="extracted_text")
+    ai_summary = deferred(Column(Text, nullable=True), group="analysis")
     
     # Detailed abnormality analysis (JSON string)
-    abnormalities = Column(Text, nullable=True)  # List of abnormal findings with details
-    key_findings = Column(Text, nullable=True)  # JSON string
-    recommendations = Column(Text, nullable=True)
-    risk_factors = Column(Text, nullable=True)
+    abnormalities = deferred(Column(Text, nullable=True), group="analysis")  # List of abnormal findings with details
+    key_findings = deferred(Column(Text, nullable=True), group="analysis")  # JSON string
+    recommendations = deferred(Column(Text, nullable=True), group="analysis")
+    risk_factors = deferred(Column(Text, nullable=True), group="analysis")
     
     # Reminder for next test
     reminder_created = Column(Boolean, default=False)
@@ -50,6 +56,47 @@ class LabReport(Base):
     
     user = relationship("User", back_populates="lab_reports")
 
+    __table_args__ = (
+        Index('idx_lab_reports_user_hash', 'user_id', 'content_hash'),
+    )
+
+class UploadBlob(Base):
+    """Content-addressed uploaded file, shared by every lab report with the same bytes"""
+    __tablename__ = "upload_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Lab reports referencing this blob
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class LabResult(Base):
+    """One measured parameter from an analyzed lab report (time series per user and parameter)"""
+    __tablename__ = "lab_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    report_id = Column(Integer, ForeignKey("lab_reports.id"), nullable=False)
+    code = Column(String, nullable=False)  # Canonical parameter code (HGB, LDL, VITD, ...)
+    parameter = Column(String, nullable=False)  # Display name
+    value = Column(Float, nullable=True)
+    value_text = Column(String, nullable=True)  # Value as reported, e.g. "11.2 g/dL"
+    unit = Column(String, nullable=True)
+    ref_low = Column(Float, nullable=True)
+    ref_high = Column(Float, nullable=True)
+    normal_range = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="normal")  # normal, high, low
+    reason = Column(Text, nullable=True)  # AI explanation for abnormal values
+    next_test_days = Column(Integer, nullable=True)
+    sample_date = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_lab_results_user_code_date', 'user_id', 'code', 'sample_date'),
+        Index('idx_lab_results_report', 'report_id'),
+        {'sqlite_autoincrement': True},  # Ids never reused: (count, max id) is the abnormality cache key
+    )
+
 class NutritionRecommendation(Base):
     __tablename__ = "nutrition_recommendations"
 
@@ -69,9 +116,9 @@ class MealPlan(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     expectations = Column(Text, nullable=False)  # User's goals/preferences
-    plan_data = Column(Text, nullable=False)  # JSON string: 7-day meal plan with recipes, macros
+    plan_data = deferred(Column(JSON, nullable=False), group="plan")  # 7-day meal plan with recipes, macros, grocery list
     modification_notes = Column(Text, nullable=True)  # Explanation of lab-based modifications
-    sources = Column(Text, nullable=True)  # JSON string: RAG source URLs for verification
+    sources = deferred(Column(JSON, nullable=True), group="plan")  # RAG source URLs for verification
     
     # User profile snapshot at generation time
     user_age = Column(Integer, nullable=True)
@@ -81,7 +128,7 @@ class MealPlan(Base):
     user_allergies = Column(Text, nullable=True)
     
     # Lab abnormalities considered
-    lab_considerations = Column(Text, nullable=True)  # JSON string of lab abnormalities
+    lab_considerations = deferred(Column(JSON, nullable=True), group="plan")  # Lab abnormalities considered
     
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,36 +1,151 @@
 import PyPDF2
-from typing import Optional
+from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import asyncio
 import io
+import os
+
+try:
+    import fitz  # PyMuPDF, optional faster backend
+except ImportError:
+    fitz = None
+
+# Extraction settings (overridable via environment)
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")  # auto, pymupdf, pypdf2
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+PDF_EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", "30"))
+PDF_MAX_JOBS = int(os.getenv("PDF_MAX_JOBS", "2"))
+
+# Separates pages in extracted text so later steps can split by page
+PAGE_BREAK = "\f"
+
+
+def _resolve_backend() -> str:
+    if PDF_BACKEND == "pymupdf" and fitz is None:
+        print("⚠️ PDF_BACKEND=pymupdf but PyMuPDF is not installed, using PyPDF2")
+        return "pypdf2"
+    if PDF_BACKEND == "auto":
+        return "pymupdf" if fitz is not None else "pypdf2"
+    return PDF_BACKEND
+
+
+# ---- Worker functions (run inside the process pool) ----
+
+def _count_pages(path: str, backend: str) -> int:
+    if backend == "pymupdf":
+        with fitz.open(path) as doc:
+            return doc.page_count
+    with open(path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _extract_pages(path: str, backend: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF file"""
+    texts = []
+    if backend == "pymupdf":
+        with fitz.open(path) as doc:
+            for page_number in range(start, end):
+                texts.append(doc.load_page(page_number).get_text())
+        return texts
+
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for page_number in range(start, end):
+            texts.append(reader.pages[page_number].extract_text() or "")
+    return texts
+
 
 class PDFExtractor:
     """Service for extracting text from PDF files"""
-    
+
+    # Uploads extracting at once; each job runs in its own pool of up to PDF_WORKERS processes
+    _job_slots = asyncio.Semaphore(PDF_MAX_JOBS)
+
+    @staticmethod
+    def _kill_pool(pool: ProcessPoolExecutor):
+        """Terminate one job's workers (e.g. stuck on a pathological PDF); other uploads are unaffected"""
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _join_pages(page_texts: List[str]) -> Optional[str]:
+        text = PAGE_BREAK.join(page_text.strip() for page_text in page_texts if page_text and page_text.strip())
+        return text.strip() or None
+
     @staticmethod
     def extract_text(pdf_file: bytes) -> Optional[str]:
         """
         Extract text content from a PDF file
-        
+
         Args:
             pdf_file: PDF file content as bytes
-            
+
         Returns:
             Extracted text as string, or None if extraction fails
         """
         try:
             pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file))
-            text = ""
-            
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-            
-            return text.strip() if text else None
-            
+            return PDFExtractor._join_pages([page.extract_text() for page in pdf_reader.pages])
+
         except Exception as e:
             print(f"Error extracting PDF text: {e}")
             return None
-    
+
+    async def extract_text_from_path(self, file_path: Path) -> Optional[str]:
+        """
+        Extract text from a PDF on disk without blocking the event loop.
+
+        Each upload gets its own process pool (at most PDF_MAX_JOBS at once);
+        reports with at least PDF_PARALLEL_MIN_PAGES pages are split into page
+        ranges extracted in parallel. Extraction that exceeds PDF_EXTRACT_TIMEOUT
+        seconds is abandoned and only that upload's workers are killed.
+
+        Returns:
+            Extracted text as string, or None if extraction fails or times out
+        """
+        async with self._job_slots:
+            pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+            try:
+                text = await asyncio.wait_for(self._extract_parallel(pool, str(file_path)), PDF_EXTRACT_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"PDF extraction timed out after {PDF_EXTRACT_TIMEOUT}s: {file_path}")
+                await asyncio.to_thread(self._kill_pool, pool)
+                return None
+            except BrokenProcessPool as e:
+                print(f"PDF worker crashed: {e}")
+                await asyncio.to_thread(self._kill_pool, pool)
+                return None
+            except Exception as e:
+                print(f"Error extracting PDF text: {e}")
+                await asyncio.to_thread(self._kill_pool, pool)
+                return None
+            await asyncio.to_thread(pool.shutdown, True)
+            return text
+
+    async def _extract_parallel(self, pool: ProcessPoolExecutor, path: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        backend = _resolve_backend()
+
+        page_count = await loop.run_in_executor(pool, _count_pages, path, backend)
+        if page_count == 0:
+            return None
+
+        if page_count < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+            ranges = [(0, page_count)]
+        else:
+            step = -(-page_count // PDF_WORKERS)  # ceil division
+            ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(pool, _extract_pages, path, backend, start, end)
+            for start, end in ranges
+        ])
+        return self._join_pages([page_text for chunk in chunks for page_text in chunk])
+
     @staticmethod
     def get_page_count(pdf_file: bytes) -> int:
         """Get the number of pages in a PDF"""
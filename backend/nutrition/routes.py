@@ -1,26 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy import func, type_coerce, Text, case
 from typing import List, Optional
 from datetime import datetime, timedelta
 import os
-import shutil
 from pathlib import Path
 
-from db import get_db
+from db import get_db, bulk_insert, json_array_item, SessionLocal
 from auth.routes import get_current_user
 from auth.models import User
-from nutrition.models import Meal, LabReport, NutritionRecommendation, MealPlan
+from nutrition.models import Meal, LabReport, LabResult, NutritionRecommendation, MealPlan
 from reminder.models import Reminder
+from reminder.scheduler import reminder_scheduler
 from appointment.models import Appointment
+from rollups.engine import refresh_day
+from sync.tracker import record_changes
 from nutrition.pdf_extractor import PDFExtractor
+from nutrition.upload_storage import store_pdf_blob, place_blob, blob_path, acquire_blob, release_blob, remove_unreferenced_blob
 from nutrition.ai_service import AIService
+from nutrition.lab_parser import parse_lab_text, local_abnormalities
+from nutrition.lab_results import record_lab_results, get_current_abnormalities, get_lab_abnormalities, result_code
 from nutrition.meal_plan_generator import MealPlanGenerator
+from responses import RawJSON, raw_json_response
+from file_responses import file_download
+from projection import projected_query, projected_response
 from schemas import (
     MealCreate, MealResponse, 
-    LabReportResponse, LabReportAnalysis,
+    LabReportResponse, LabReportSummary, LabReportAnalysis, MealPlanHistoryItem,
+    LabTrendResponse,
     NutritionRecommendationResponse
 )
 import json
+from limits.admission import llm_admission
 
 router = APIRouter(prefix="/nutrition", tags=["nutrition"])
 pdf_extractor = PDFExtractor()
@@ -45,6 +57,17 @@ def get_meals(
     ).order_by(Meal.meal_date.desc()).limit(limit).all()
     return meals
 
+def add_meal(db: Session, user_id: int, meal_data: MealCreate) -> Meal:
+    """Stage a new meal and its daily rollup (caller commits)"""
+    new_meal = Meal(
+        user_id=user_id,
+        **meal_data.dict()
+    )
+    db.add(new_meal)
+    db.flush()
+    refresh_day(db, user_id, new_meal.meal_date)
+    return new_meal
+
 @router.post("/meals", response_model=MealResponse, status_code=status.HTTP_201_CREATED)
 def create_meal(
     meal_data: MealCreate,
@@ -52,11 +75,7 @@ def create_meal(
     db: Session = Depends(get_db)
 ):
     """Log a new meal"""
-    new_meal = Meal(
-        user_id=current_user.id,
-        **meal_data.dict()
-    )
-    db.add(new_meal)
+    new_meal = add_meal(db, current_user.id, meal_data)
     db.commit()
     db.refresh(new_meal)
     return new_meal
@@ -80,21 +99,23 @@ def delete_meal(
         )
     
     db.delete(meal)
+    refresh_day(db, current_user.id, meal.meal_date)
     db.commit()
     return {"message": "Meal deleted successfully"}
 
 # ===== LAB REPORT ROUTES =====
 
-@router.get("/lab-reports", response_model=List[LabReportResponse])
+@router.get("/lab-reports", response_model=List[LabReportSummary])
 def get_lab_reports(
+    fields: Optional[str] = Query(None, description="Comma-separated subset of response fields"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get user's lab reports"""
-    reports = db.query(LabReport).filter(
+    """Get user's lab reports (list columns only; full analysis via /lab-reports/{id})"""
+    reports = projected_query(db, LabReport, LabReportSummary, fields).filter(
         LabReport.user_id == current_user.id
     ).order_by(LabReport.created_at.desc()).all()
-    return reports
+    return projected_response(reports, fields)
 
 @router.get("/lab-reports/{report_id}")
 def get_lab_report(
@@ -127,6 +148,20 @@ def get_lab_report(
         "reminder_created": report.reminder_created
     }
 
+def set_analysis_status(report_id: int, analysis_status: str):
+    """Update a report's analysis_status in its own session (the request session holds pending changes)"""
+    db = SessionLocal()
+    try:
+        db.query(LabReport).filter(LabReport.id == report_id).update(
+            {"analysis_status": analysis_status}, synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        print(f"Could not update analysis status: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
 @router.post("/lab-reports/upload", response_model=LabReportResponse)
 async def upload_lab_report(
     file: UploadFile = File(...),
@@ -147,43 +182,70 @@ async def upload_lab_report(
             detail="Only PDF files are allowed"
         )
     
-    # Create unique filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{current_user.id}_{timestamp}_{file.filename}"
-    file_path = UPLOAD_DIR / filename
+    # Stream file into the upload area (size-capped, hashed while writing)
+    file_hash, file_size, incoming_path = await store_pdf_blob(file)
+    print(f"📄 Received {file.filename} ({file_size} bytes, sha256 {file_hash[:12]})")
     
-    # Save file
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save file: {str(e)}"
+        # Same bytes already analyzed for this user: return that report instead of re-analyzing
+        existing = db.query(LabReport).filter(
+            LabReport.user_id == current_user.id,
+            LabReport.content_hash == file_hash,
+            LabReport.analysis_status.in_(("completed", "partial"))
+        ).order_by(LabReport.id.desc()).first()
+        if existing:
+            print(f"♻️ Duplicate upload of lab report {existing.id}, skipping analysis")
+            return existing
+        
+        # Reuse the extraction of any earlier upload of the same bytes
+        previous_text = db.query(LabReport.extracted_text).filter(
+            LabReport.content_hash == file_hash,
+            LabReport.extracted_text.isnot(None)
+        ).limit(1).scalar()
+        
+        if previous_text is not None:
+            extracted_text = previous_text
+        else:
+            # Extract text in the PDF worker pool so the event loop stays free
+            extracted_text = await pdf_extractor.extract_text_from_path(incoming_path)
+        
+        # Parse known analytes locally so range-flagged abnormalities are stored before the LLM runs
+        parsed = parse_lab_text(extracted_text) if extracted_text else {"results": [], "residue": ""}
+        preliminary_abnormalities = local_abnormalities(parsed["results"])
+        
+        # Create lab report record
+        lab_report = LabReport(
+            user_id=current_user.id,
+            report_name=report_name,
+            file_path=str(blob_path(file_hash)),
+            content_hash=file_hash,
+            extracted_text=extracted_text,
+            abnormalities=json.dumps(preliminary_abnormalities) if preliminary_abnormalities else None,
+            analysis_status="analyzing"
         )
-    
-    # Extract text from PDF
-    with open(file_path, "rb") as pdf_file:
-        pdf_content = pdf_file.read()
-        extracted_text = pdf_extractor.extract_text(pdf_content)
-    
-    # Create lab report record
-    lab_report = LabReport(
-        user_id=current_user.id,
-        report_name=report_name,
-        file_path=str(file_path),
-        extracted_text=extracted_text,
-        analysis_status="analyzing"
-    )
-    
-    db.add(lab_report)
-    db.commit()
-    db.refresh(lab_report)
+        
+        db.add(lab_report)
+        acquire_blob(db, file_hash, file_size)
+        db.commit()
+        db.refresh(lab_report)
+        
+        # Referenced now: move the upload into the blob store (or drop it, if the blob exists)
+        place_blob(file_hash, incoming_path)
+    finally:
+        incoming_path.unlink(missing_ok=True)
     
     # Start AI analysis
     if extracted_text:
         try:
-            analysis = ai_service.analyze_lab_report(extracted_text, user=current_user)
+            # Long reports are analyzed in concurrent chunks; progress is visible via analysis_status
+            # (called in a worker thread, so the commit does not block the event loop)
+            def report_progress(done: int, total: int):
+                if total > 1:
+                    set_analysis_status(lab_report.id, f"analyzing ({done}/{total})")
+            
+            analysis = await ai_service.analyze_lab_report_chunked(
+                extracted_text, user=current_user, parsed=parsed, on_progress=report_progress
+            )
             
             # Save analysis results
             lab_report.ai_summary = analysis.get("summary", "")
@@ -193,56 +255,60 @@ async def upload_lab_report(
             
             # Save abnormalities as JSON
             abnormalities = analysis.get("abnormalities", [])
+            reminder_ids, reminder_rows = [], []
             if abnormalities:
                 lab_report.abnormalities = json.dumps(abnormalities)
                 
-                # Calculate earliest next test date
-                earliest_days = None
-                for abnormality in abnormalities:
-                    if 'next_test_days' in abnormality and abnormality['next_test_days']:
-                        if earliest_days is None or abnormality['next_test_days'] < earliest_days:
-                            earliest_days = abnormality['next_test_days']
-                
-                # Set next test date based on earliest abnormality
-                if earliest_days:
-                    lab_report.next_test_date = datetime.now() + timedelta(days=earliest_days)
+                # Next test date is based on the earliest retest across all abnormalities
+                if analysis.get("next_test_date"):
+                    lab_report.next_test_date = analysis["next_test_date"]
                 
                 # Create automatic reminders and appointments for each abnormality
+                reminder_rows = []
+                appointment_rows = []
                 for abnormality in abnormalities:
                     if 'next_test_days' in abnormality and abnormality['next_test_days']:
                         retest_date = datetime.now() + timedelta(days=abnormality['next_test_days'])
                         
                         reminder_text = f"Retest {abnormality['parameter']} - Previous result was {abnormality['status'].upper()}: {abnormality['value']}"
                         
-                        # Create reminder
-                        reminder = Reminder(
-                            user_id=current_user.id,
-                            title=f"Retest: {abnormality['parameter']}",
-                            description=reminder_text,
-                            reminder_datetime=retest_date,
-                            reminder_type="lab_test",
-                            is_completed=False
-                        )
-                        db.add(reminder)
-                        print(f"✅ Created reminder for {abnormality['parameter']} at {retest_date}")
+                        reminder_rows.append({
+                            'user_id': current_user.id,
+                            'title': f"Retest: {abnormality['parameter']}",
+                            'description': reminder_text,
+                            'reminder_datetime': retest_date,
+                            'reminder_type': "lab_test",
+                            'is_completed': False
+                        })
                         
-                        # Create appointment
-                        appointment = Appointment(
-                            user_id=current_user.id,
-                            title=f"Lab Test: {abnormality['parameter']} Retest",
-                            appointment_type="lab_test",
-                            appointment_datetime=retest_date,
-                            notes=f"Follow-up test for {abnormality['parameter']}. Previous value: {abnormality['value']} ({abnormality['status']})",
-                            is_completed=False
-                        )
-                        db.add(appointment)
-                        print(f"✅ Created appointment for {abnormality['parameter']} at {retest_date}")
-                        
-                        lab_report.reminder_created = True
+                        appointment_rows.append({
+                            'user_id': current_user.id,
+                            'title': f"Lab Test: {abnormality['parameter']} Retest",
+                            'appointment_type': "lab_test",
+                            'appointment_datetime': retest_date,
+                            'notes': f"Follow-up test for {abnormality['parameter']}. Previous value: {abnormality['value']} ({abnormality['status']})",
+                            'is_completed': False
+                        })
+                
+                # Insert all retest reminders and appointments in one statement each
+                reminder_ids = bulk_insert(db, Reminder, reminder_rows)
+                appointment_ids = bulk_insert(db, Appointment, appointment_rows)
+                record_changes(db, Reminder, current_user.id, reminder_ids)
+                record_changes(db, Appointment, current_user.id, appointment_ids)
+                if reminder_rows:
+                    lab_report.reminder_created = True
+                    print(f"✅ Created {len(reminder_rows)} retest reminders and appointments")
+            
+            # Normalized per-parameter rows for trends and the current-abnormalities view
+            record_lab_results(db, lab_report, analysis)
             
-            lab_report.analysis_status = "completed"
+            # "partial" when some chunks failed, "failed" when none produced an analysis
+            lab_report.analysis_status = analysis.get("analysis_status", "completed")
             db.commit()
             db.refresh(lab_report)
+            reminder_scheduler.schedule_many(
+                {**row, "id": reminder_id} for reminder_id, row in zip(reminder_ids, reminder_rows)
+            )
         except Exception as e:
             print(f"AI analysis failed: {e}")
             lab_report.analysis_status = "failed"
@@ -278,6 +344,41 @@ def get_lab_report_analysis(
         "risk_factors": json.loads(report.risk_factors) if report.risk_factors else []
     }
 
+@router.get("/lab-reports/{report_id}/file")
+def download_lab_report_file(
+    report_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download the original lab report PDF (supports Range requests and ETag revalidation)"""
+    report = db.query(LabReport.report_name, LabReport.file_path, LabReport.content_hash).filter(
+        LabReport.id == report_id,
+        LabReport.user_id == current_user.id
+    ).first()
+    
+    if not report or not os.path.isfile(report.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lab report not found"
+        )
+    
+    if report.content_hash:
+        etag = f'"{report.content_hash}"'
+    else:
+        # Legacy upload stored before content hashing
+        stat_result = os.stat(report.file_path)
+        etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    
+    # Report ids can be reused after a delete, so clients revalidate instead of caching blindly
+    return file_download(
+        request,
+        report.file_path,
+        etag=etag,
+        media_type="application/pdf",
+        filename=f"{report.report_name}.pdf"
+    )
+
 @router.delete("/lab-reports/{report_id}")
 def delete_lab_report(
     report_id: int,
@@ -296,19 +397,60 @@ def delete_lab_report(
             detail="Lab report not found"
         )
     
-    # Delete the physical file
-    try:
-        file_path = Path(report.file_path)
-        if file_path.exists():
-            file_path.unlink()
-    except Exception as e:
-        print(f"Failed to delete file: {e}")
+    # Legacy uploads (stored before the blob store) own their file directly
+    if not report.content_hash:
+        try:
+            file_path = Path(report.file_path)
+            if file_path.exists():
+                file_path.unlink()
+        except Exception as e:
+            print(f"Failed to delete file: {e}")
     
-    # Delete from database
+    # Delete from database, dropping this report's reference to its blob
+    content_hash = report.content_hash
+    db.query(LabResult).filter(LabResult.report_id == report.id).delete(synchronize_session=False)
     db.delete(report)
+    db.flush()
+    last_reference = release_blob(db, content_hash)
     db.commit()
+    
+    if last_reference:
+        remove_unreferenced_blob(db, content_hash)
     return {"message": "Lab report deleted successfully"}
 
+# ===== LAB RESULT TRENDS =====
+
+@router.get("/lab-results/trends", response_model=LabTrendResponse)
+def get_lab_result_trend(
+    parameter: str = Query(..., description="Parameter name or code, e.g. 'Vitamin D' or 'VITD'"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the history of one lab parameter across all of the user's reports"""
+    code = result_code(parameter.strip())
+    
+    points = db.query(LabResult).filter(
+        LabResult.user_id == current_user.id,
+        LabResult.code == code
+    ).order_by(LabResult.sample_date.desc(), LabResult.id.desc()).limit(limit).all()
+    points.reverse()
+    
+    return {
+        "code": code,
+        "parameter": points[-1].parameter if points else parameter,
+        "unit": points[-1].unit if points else None,
+        "points": points
+    }
+
+@router.get("/lab-results/current-abnormalities")
+def get_lab_current_abnormalities(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the latest out-of-range value for each lab parameter"""
+    return get_current_abnormalities(db, current_user.id)
+
 # ===== AI RECOMMENDATIONS =====
 
 @router.post("/recommendations/generate")
@@ -323,23 +465,25 @@ async def generate_recommendations(
         Meal.user_id == current_user.id
     ).order_by(Meal.meal_date.desc()).limit(7).all()
     
-    # Get latest completed lab report with abnormalities
+    # Get latest analyzed lab report (for its summary) and current abnormal lab values
     latest_lab_report = db.query(LabReport).filter(
         LabReport.user_id == current_user.id,
-        LabReport.analysis_status == "completed",
-        LabReport.abnormalities.isnot(None)
+        LabReport.analysis_status.in_(("completed", "partial"))
     ).order_by(LabReport.created_at.desc()).first()
+    lab_abnormalities = get_lab_abnormalities(db, current_user.id)
     
     # Generate personalized recommendations using full user profile and lab findings
-    recommendations_text = ai_service.generate_meal_recommendations(
+    recommendations_text = await run_in_threadpool(
+        ai_service.generate_meal_recommendations,
         user=current_user,
         lab_report=latest_lab_report,
-        recent_meals=recent_meals
+        recent_meals=recent_meals,
+        abnormalities=lab_abnormalities
     )
     
     # Save recommendation
     based_on = "user_profile"
-    if latest_lab_report:
+    if latest_lab_report or lab_abnormalities:
         based_on = "user_profile_lab_results_and_abnormalities"
     
     recommendation = NutritionRecommendation(
@@ -373,7 +517,7 @@ def get_recommendations(
 @router.post("/meal-plan/generate")
 async def generate_meal_plan(
     expectations: str = Form(...),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(llm_admission(cost=3)),
     db: Session = Depends(get_db)
 ):
     """
@@ -393,24 +537,13 @@ async def generate_meal_plan(
             detail="Please complete your profile (age, weight, height) before generating a meal plan"
         )
     
-    # Get latest lab report with abnormalities
-    latest_lab_report = db.query(LabReport).filter(
-        LabReport.user_id == current_user.id,
-        LabReport.analysis_status == "completed",
-        LabReport.abnormalities.isnot(None)
-    ).order_by(LabReport.created_at.desc()).first()
-    
-    # Parse abnormalities
-    lab_abnormalities = []
-    if latest_lab_report and latest_lab_report.abnormalities:
-        try:
-            lab_abnormalities = json.loads(latest_lab_report.abnormalities)
-        except:
-            lab_abnormalities = []
+    # Current abnormal lab values (latest result per parameter across reports)
+    lab_abnormalities = get_lab_abnormalities(db, current_user.id)
     
     # Generate meal plan with RAG
     try:
-        result = meal_plan_generator.generate_meal_plan(
+        result = await run_in_threadpool(
+            meal_plan_generator.generate_meal_plan,
             user=current_user,
             expectations=expectations,
             lab_abnormalities=lab_abnormalities
@@ -426,22 +559,25 @@ async def generate_meal_plan(
         meal_plan = MealPlan(
             user_id=current_user.id,
             expectations=expectations,
-            plan_data=json.dumps(result['plan_data']),
+            plan_data=result['plan_data'],
             modification_notes=result.get('modification_notes', ''),
-            sources=json.dumps(result.get('sources', [])),
+            sources=result.get('sources', []),
             user_age=result['user_snapshot']['age'],
             user_weight=result['user_snapshot']['weight'],
             user_height=result['user_snapshot']['height'],
             user_nationality=result['user_snapshot']['nationality'],
             user_allergies=result['user_snapshot']['allergies'],
-            lab_considerations=json.dumps(result.get('lab_considerations', []))
+            lab_considerations=result.get('lab_considerations', [])
         )
         
         # Deactivate previous plans
-        db.query(MealPlan).filter(
+        active_plans = db.query(MealPlan).filter(
             MealPlan.user_id == current_user.id,
             MealPlan.is_active == True
-        ).update({'is_active': False})
+        )
+        deactivated_ids = [row.id for row in active_plans.with_entities(MealPlan.id)]
+        active_plans.update({'is_active': False})
+        record_changes(db, MealPlan, current_user.id, deactivated_ids)
         
         db.add(meal_plan)
         db.commit()
@@ -469,7 +605,15 @@ def get_active_meal_plan(
     db: Session = Depends(get_db)
 ):
     """Get user's active meal plan"""
-    meal_plan = db.query(MealPlan).filter(
+    # Select the JSON columns as stored text so they are passed through without re-encoding
+    meal_plan = db.query(
+        MealPlan.id,
+        MealPlan.expectations,
+        type_coerce(MealPlan.plan_data, Text).label("plan_data"),
+        MealPlan.modification_notes,
+        type_coerce(MealPlan.sources, Text).label("sources"),
+        MealPlan.created_at
+    ).filter(
         MealPlan.user_id == current_user.id,
         MealPlan.is_active == True
     ).order_by(MealPlan.created_at.desc()).first()
@@ -480,32 +624,77 @@ def get_active_meal_plan(
             detail="No active meal plan found"
         )
     
-    return {
+    return raw_json_response({
         "id": meal_plan.id,
         "expectations": meal_plan.expectations,
-        "plan_data": json.loads(meal_plan.plan_data),
+        "plan_data": RawJSON(meal_plan.plan_data),
         "modification_notes": meal_plan.modification_notes,
-        "sources": json.loads(meal_plan.sources) if meal_plan.sources else [],
+        "sources": RawJSON(meal_plan.sources if meal_plan.sources not in (None, "null") else "[]"),
         "created_at": meal_plan.created_at
-    }
+    })
+
+def get_active_meal_plan_id(db: Session, user_id: int) -> int:
+    """Id of the user's newest active meal plan, or 404"""
+    plan_id = db.query(MealPlan.id).filter(
+        MealPlan.user_id == user_id,
+        MealPlan.is_active == True
+    ).order_by(MealPlan.created_at.desc()).limit(1).scalar()
+    
+    if not plan_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No active meal plan found"
+        )
+    return plan_id
+
+@router.get("/meal-plan/active/days/{day_number}")
+def get_active_meal_plan_day(
+    day_number: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get a single day of the active meal plan without loading the whole week"""
+    plan_id = get_active_meal_plan_id(db, current_user.id)
+    day = json_array_item(db, MealPlan, MealPlan.plan_data, "$.days", "day", day_number, MealPlan.id == plan_id)
+    
+    if day is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Day {day_number} not found in active meal plan"
+        )
+    
+    return raw_json_response({"plan_id": plan_id, "day": RawJSON(day)})
 
-@router.get("/meal-plan/history")
+@router.get("/meal-plan/active/grocery-list")
+def get_active_meal_plan_grocery_list(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the grocery list of the active meal plan"""
+    plan_id = get_active_meal_plan_id(db, current_user.id)
+    grocery_list = db.query(
+        func.coalesce(func.json_extract(MealPlan.plan_data, "$.grocery_list"), "[]")
+    ).filter(MealPlan.id == plan_id).scalar()
+    
+    return raw_json_response({"plan_id": plan_id, "grocery_list": RawJSON(grocery_list)})
+
+@router.get("/meal-plan/history", response_model=List[MealPlanHistoryItem])
 def get_meal_plan_history(
+    fields: Optional[str] = Query(None, description="Comma-separated subset of response fields"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get user's meal plan history"""
-    meal_plans = db.query(MealPlan).filter(
+    # Truncate notes in SQL so neither the full notes nor the plan blobs are loaded
+    truncated_notes = case(
+        (func.length(MealPlan.modification_notes) > 100, func.substr(MealPlan.modification_notes, 1, 100, type_=Text) + "..."),
+        else_=MealPlan.modification_notes
+    )
+    meal_plans = projected_query(
+        db, MealPlan, MealPlanHistoryItem, fields,
+        expressions={"modification_notes": truncated_notes}
+    ).filter(
         MealPlan.user_id == current_user.id
     ).order_by(MealPlan.created_at.desc()).limit(10).all()
     
-    return [
-        {
-            "id": plan.id,
-            "expectations": plan.expectations,
-            "is_active": plan.is_active,
-            "created_at": plan.created_at,
-            "modification_notes": plan.modification_notes[:100] + "..." if plan.modification_notes and len(plan.modification_notes) > 100 else plan.modification_notes
-        }
-        for plan in meal_plans
-    ]
+    return projected_response(meal_plans, fields)
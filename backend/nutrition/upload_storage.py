@@ -0,0 +1,174 @@
+"""
+Lab report upload storage.
+
+Uploads are streamed to disk and stored content-addressed by SHA-256 under
+BLOB_DIR, so identical PDFs share one file. upload_blobs.ref_count tracks how
+many lab reports point at each blob; the file is removed when the last
+reference is released.
+
+An upload keeps its own copy in INCOMING_DIR until its reference is committed
+(acquire_blob), and only then moves it into place if the blob file is missing.
+remove_unreferenced_blob checks for references and unlinks the file while
+holding the database write lock, so the two cannot interleave: either the
+delete sees the new reference, or the upload finds the file gone and restores it.
+"""
+from fastapi import HTTPException, UploadFile, status
+from pathlib import Path
+from typing import Optional, Tuple
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+import hashlib
+import os
+import uuid
+
+from nutrition.models import UploadBlob
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+PDF_MAGIC = b"%PDF-"
+
+BLOB_DIR = Path("uploads/lab_reports/blobs")
+INCOMING_DIR = BLOB_DIR / "incoming"
+
+
+async def save_pdf_upload(upload: UploadFile, destination: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[int, str]:
+    """
+    Stream an uploaded PDF to disk in chunks, hashing as it goes.
+
+    The file is written to a temporary path and moved into place only once it is
+    complete, so an oversized or invalid upload never leaves a partial file behind.
+
+    Returns:
+        (size in bytes, SHA-256 hex digest)
+    """
+    temp_path = destination.with_name(destination.name + ".part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if size == 0 and not chunk.startswith(PDF_MAGIC):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="File is not a valid PDF"
+                    )
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit"
+                    )
+                digest.update(chunk)
+                buffer.write(chunk)
+
+        if size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is empty"
+            )
+
+        os.replace(temp_path, destination)
+    except HTTPException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    except Exception as e:
+        temp_path.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
+        )
+
+    return size, digest.hexdigest()
+
+
+def blob_path(sha256: str) -> Path:
+    """Storage path of a blob (fanned out by the first two hex digits)"""
+    return BLOB_DIR / sha256[:2] / f"{sha256}.pdf"
+
+
+async def store_pdf_blob(upload: UploadFile) -> Tuple[str, int, Path]:
+    """
+    Stream an uploaded PDF into INCOMING_DIR, hashing as it goes.
+
+    The caller registers the reference with acquire_blob(), commits, and then calls
+    place_blob() to move the copy to its content address; on any failure before that
+    it deletes the incoming file.
+
+    Returns:
+        (SHA-256 hex digest, size in bytes, incoming path)
+    """
+    INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    incoming = INCOMING_DIR / f"{uuid.uuid4().hex}.pdf"
+    size, sha256 = await save_pdf_upload(upload, incoming)
+    return sha256, size, incoming
+
+
+def place_blob(sha256: str, incoming: Path) -> Path:
+    """
+    After the reference is committed: move the incoming copy to the blob path if no
+    file is there (first upload, or a concurrent delete removed it), else drop it.
+    """
+    path = blob_path(sha256)
+    if path.exists():
+        incoming.unlink(missing_ok=True)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(incoming, path)
+    return path
+
+
+def acquire_blob(db: Session, sha256: str, size: int) -> None:
+    """Add one reference to a blob, registering it on first use (caller commits)"""
+    statement = insert(UploadBlob).values(sha256=sha256, path=str(blob_path(sha256)), size=size, ref_count=1)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[UploadBlob.sha256],
+        set_={"ref_count": UploadBlob.ref_count + 1}
+    ))
+
+
+def release_blob(db: Session, sha256: Optional[str]) -> bool:
+    """
+    Drop one reference to a blob (caller commits). The row is deleted with its last
+    reference; returns True if so, and the caller then calls remove_unreferenced_blob()
+    after committing.
+    """
+    if not sha256:
+        return False
+    remaining = db.execute(
+        update(UploadBlob)
+        .where(UploadBlob.sha256 == sha256)
+        .values(ref_count=UploadBlob.ref_count - 1)
+        .returning(UploadBlob.ref_count)
+    ).scalar()
+    if remaining is not None and remaining <= 0:
+        db.execute(delete(UploadBlob).where(UploadBlob.sha256 == sha256))
+        return True
+    return False
+
+
+def remove_unreferenced_blob(db: Session, sha256: str) -> None:
+    """
+    Delete a blob's file unless a reference was (re)registered in the meantime.
+
+    The check is a no-op UPDATE, which takes the database write lock, and the file is
+    unlinked before committing; an upload's acquire_blob() waits for that commit and
+    its place_blob() then restores the file.
+    """
+    try:
+        referenced = db.execute(
+            update(UploadBlob)
+            .where(UploadBlob.sha256 == sha256)
+            .values(ref_count=UploadBlob.ref_count)
+            .returning(UploadBlob.sha256)
+        ).scalar()
+        if referenced is None:
+            blob_path(sha256).unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Failed to delete blob {sha256[:12]}: {e}")
+    finally:
+        db.commit()
@@ -0,0 +1,58 @@
+"""
+Column projection for list endpoints.
+
+List routes select only the columns their (slim) response schema needs, and
+accept an optional `?fields=a,b,c` sparse fieldset validated against that
+schema. Large Text/JSON columns are additionally `deferred()` on the models so
+full-row queries elsewhere don't load them unless they are touched.
+"""
+from typing import Dict, List, Optional, Type
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def sparse_fields(fields: Optional[str], schema: Type[BaseModel]) -> List[str]:
+    """
+    Resolve a comma-separated `fields` parameter against a response schema.
+    Returns every schema field when not given; `id` is always included.
+    """
+    allowed = list(schema.model_fields)
+    if not fields:
+        return allowed
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return [name for name in allowed if name in requested or name == "id"]
+
+
+def projected_query(db, model, schema: Type[BaseModel], fields: Optional[str] = None, expressions: Optional[Dict] = None):
+    """
+    Query only the columns backing the selected schema fields.
+    `expressions` maps a field name to a SQL expression used instead of the model column.
+    """
+    expressions = expressions or {}
+    columns = [
+        expressions[name].label(name) if name in expressions else getattr(model, name)
+        for name in sparse_fields(fields, schema)
+    ]
+    return db.query(*columns)
+
+
+def projected_response(rows, fields: Optional[str] = None):
+    """
+    Turn projected rows into response data. Full rows go back to the route's
+    response_model; a sparse fieldset skips model validation, which would
+    reject the missing required fields.
+    """
+    data = [row._asdict() for row in rows]
+    if fields:
+        return ORJSONResponse(jsonable_encoder(data))
+    return data
@@ -1,5 +1,5 @@
 """
-SerpAPI client for web search with RAG integration.
+Bright Data proxy client: Google search fetched through Bright Data's proxy network.
 Includes retry logic, timeouts, and response normalization.
 """
 import os
@@ -8,43 +8,52 @@ import os
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
 import httpx
-import backoff
 import logging
 import json
+import urllib.parse
 from typing import List, Dict
 from dotenv import load_dotenv
 
+import resilience
+from rag.serp_parser import capture, parse_google_results
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 class BrightDataClient:
-    """SerpAPI client for Google search results."""
+    """Bright Data proxy client for Google search results."""
     
     def __init__(self):
-        self.api_key = os.getenv("SERPAPI_KEY")
+        # Proxy credentials: brd-customer-{customer_id}-zone-{zone}:{password}
+        self.api_key = os.getenv("BRIGHTDATA_PROXY_AUTH")
         self.engine = os.getenv("SERPAPI_ENGINE", "google")
-        self.timeout_ms = int(os.getenv("SERPAPI_TIMEOUT_MS", "30000"))
-        self.mode = "serpapi"  # For compatibility
+        self.mode = "web_scraper"
         
         if not self.api_key:
-            logger.warning("SERPAPI_KEY not set - will use fallback data")
+            logger.warning("BRIGHTDATA_PROXY_AUTH not set - will use fallback data")
+    
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+    
+    def _proxy_url(self) -> str:
+        proxy_host = os.getenv("BRIGHTDATA_PROXY_HOST", "brd.superproxy.io")
+        proxy_port = os.getenv("BRIGHTDATA_PROXY_PORT", "22225")
+        return f"http://{self.api_key}@{proxy_host}:{proxy_port}"
+    
+    def _search_url(self, query: str) -> str:
+        return f"https://www.google.com/search?q={urllib.parse.quote_plus(query)}&num=10"
     
     def _get_headers(self) -> Dict[str, str]:
         """Get headers for SerpAPI requests."""
         return {
             "Content-Type": "application/json"
-        }    @backoff.on_exception(
-        backoff.expo,
-        (httpx.TimeoutException, httpx.HTTPStatusError),
-        max_tries=3,
-        giveup=lambda e: isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
-    )
+        }
+    
     def _make_request(self, url: str, method: str = "POST", json_data: Dict = None) -> Dict:
-        """Make HTTP request with retry logic."""
-        timeout = httpx.Timeout(self.timeout_ms / 1000.0)
-        
-        try:
+        """Make HTTP request through the SerpAPI circuit breaker."""
+        def send(timeout: float) -> Dict:
             with httpx.Client(timeout=timeout, follow_redirects=True) as client:
                 if method == "GET":
                     response = client.get(url, headers=self._get_headers())
@@ -53,6 +62,9 @@ class BrightDataClient:
                 
                 response.raise_for_status()
                 return response.json()
+        
+        try:
+            return resilience.serpapi.call(send)
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error {e.response.status_code}: {e.response.text}")
             raise
@@ -78,24 +90,23 @@ class BrightDataClient:
             # Use Google search via proxy
             search_url = f"https://www.google.com/search?q={query}&num=10"
             
-            timeout = httpx.Timeout(self.timeout_ms / 1000.0)
             proxies = {
                 "http://": proxy_url,
                 "https://": proxy_url
             }
             
-            with httpx.Client(timeout=timeout, proxies=proxies, follow_redirects=True) as client:
-                response = client.get(search_url, headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                })
-                
-                # Parse HTML response (simplified - in production use BeautifulSoup)
-                html = response.text
-                
-                # For now, return mock data since HTML parsing is complex
-                # In production, you'd use BeautifulSoup to extract search results
-                logger.warning("SERP via proxy returned HTML - needs parsing. Returning empty for now.")
-                return []
+            def fetch(timeout: float) -> str:
+                with httpx.Client(timeout=timeout, proxies=proxies, follow_redirects=True) as client:
+                    response = client.get(search_url, headers={
+                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                    })
+                    return response.text
+            
+            html = resilience.brightdata.call(fetch)
+            
+            results = parse_google_results(html)
+            capture(html, "brightdata_proxy", len(results))
+            return results
                 
         except Exception as e:
             logger.error(f"SERP proxy search failed: {e}")
@@ -106,74 +117,63 @@ class BrightDataClient:
         Search using Bright Data Web Scraper API with proxy.
         Uses Google search through Bright Data's proxy network.
         """
+        if not self.configured:
+            logger.warning("Bright Data proxy credentials not configured, using fallback")
+            return self.search_serp_fallback(query)
+        
         try:
-            proxy_host = os.getenv("BRIGHTDATA_PROXY_HOST", "brd.superproxy.io")
-            proxy_port = os.getenv("BRIGHTDATA_PROXY_PORT", "22225")
+            proxy_url = self._proxy_url()
+            search_url = self._search_url(query)
             
-            # Construct proxy URL with authentication
-            # Format: http://{api_key}@{host}:{port}
-            proxy_url = f"http://{self.api_key}@{proxy_host}:{proxy_port}"
+            logger.info(f"Calling Bright Data Web Scraper for: {query}")
             
-            # Use Google search via Bright Data proxy
-            search_url = f"https://www.google.com/search?q={query}&num=10"
+            def fetch(timeout: float) -> str:
+                # httpx uses 'proxy' not 'proxies' (singular)
+                with httpx.Client(timeout=timeout, proxy=proxy_url) as client:
+                    response = client.get(search_url, headers={
+                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                    })
+                    
+                    response.raise_for_status()
+                    return response.text
             
-            timeout = httpx.Timeout(self.timeout_ms / 1000.0)
+            html = resilience.brightdata.call(fetch)
             
-            logger.info(f"Calling Bright Data Web Scraper for: {query}")
+            # Parse Google search results from HTML
+            results = parse_google_results(html)
+            capture(html, "brightdata_proxy", len(results))
             
-            # httpx uses 'proxy' not 'proxies' (singular)
-            with httpx.Client(timeout=timeout, proxy=proxy_url) as client:
-                response = client.get(search_url, headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                })
-                
-                response.raise_for_status()
-                html = response.text
-                
-                # Parse Google search results from HTML
-                results = self._parse_google_html(html)
-                
-                if results:
-                    logger.info(f"Retrieved {len(results)} results from Bright Data Web Scraper")
-                    return results
-                else:
-                    logger.warning("No results parsed from HTML, using fallback")
-                    return self.search_serp_fallback(query)
+            if results:
+                logger.info(f"Retrieved {len(results)} results from Bright Data Web Scraper")
+                return results
+            else:
+                logger.warning("No results parsed from HTML, using fallback")
+                return self.search_serp_fallback(query)
                     
         except Exception as e:
             logger.error(f"Bright Data Web Scraper failed: {e}")
             return self.search_serp_fallback(query)
     
-    def _parse_google_html(self, html: str) -> List[Dict]:
+    async def fetch(self, query: str) -> List[Dict]:
         """
-        Parse Google search results from HTML.
-        Simple extraction - could be enhanced with BeautifulSoup.
+        Search through the Bright Data proxy without falling back to mock data
+        (for the search router). Raises on request failure.
         """
-        try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html, 'html.parser')
-            results = []
-            
-            # Find organic search results
-            for result in soup.select('div.g')[:5]:
-                title_elem = result.select_one('h3')
-                link_elem = result.select_one('a')
-                snippet_elem = result.select_one('div.VwiC3b')
-                
-                if title_elem and link_elem:
-                    results.append({
-                        'title': title_elem.get_text(),
-                        'url': link_elem.get('href', ''),
-                        'text': snippet_elem.get_text() if snippet_elem else ''
-                    })
-            
-            return results
-        except ImportError:
-            logger.warning("BeautifulSoup not installed, cannot parse HTML. Install with: pip install beautifulsoup4")
-            return []
-        except Exception as e:
-            logger.error(f"HTML parsing failed: {e}")
-            return []
+        proxy_url = self._proxy_url()
+        search_url = self._search_url(query)
+        
+        async def get(timeout: float) -> str:
+            async with httpx.AsyncClient(timeout=timeout, proxy=proxy_url) as client:
+                response = await client.get(search_url, headers={
+                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                })
+                response.raise_for_status()
+                return response.text
+        
+        html = await resilience.brightdata.acall(get)
+        results = parse_google_results(html)
+        capture(html, "brightdata_proxy", len(results))
+        return results
     
     def search_serp_fallback(self, query: str) -> List[Dict]:
         """
@@ -237,16 +237,16 @@ class BrightDataClient:
     
     def search(self, query: str) -> List[Dict]:
         """
-        Main search method using SerpAPI.
+        Main search method using the Bright Data Web Scraper.
         Returns normalized results: [{title, url, text}, ...]
         """
         if not query or not query.strip():
             return []
         
-        logger.info(f"Searching with SerpAPI, query={query}")
+        logger.info(f"Searching with Bright Data Web Scraper, query={query}")
         
-        # Try SerpAPI, fallback if it fails
-        results = self.search_serpapi(query)
+        # Try the Web Scraper, falls back automatically if it fails
+        results = self.search_web_scraper(query)
         
         # Deduplicate by URL
         seen_urls = set()
@@ -8,11 +8,14 @@ import os
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
 import httpx
-import backoff
 import logging
+import urllib.parse
 from typing import List, Dict
 from dotenv import load_dotenv
 
+import resilience
+from rag.serp_parser import capture, parse_google_results
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -24,48 +27,55 @@ class BrightDataClient:
         self.api_key = os.getenv("BRIGHTDATA_API_KEY")
         self.serp_url = os.getenv("BRIGHTDATA_SERP_URL", "https://api.brightdata.com/request")
         self.zone = os.getenv("BRIGHTDATA_SERP_ZONE", "serp_api1")
-        self.timeout_ms = int(os.getenv("BRIGHTDATA_TIMEOUT_MS", "30000"))
         self.mode = "serp_api"
         
-        if not self.api_key or self.api_key == "your_api_key_here":
+        if not self.configured:
             logger.warning("BRIGHTDATA_API_KEY not configured - will use fallback data")
     
-    @backoff.on_exception(
-        backoff.expo,
-        (httpx.TimeoutException, httpx.HTTPStatusError),
-        max_tries=3,
-        giveup=lambda e: isinstance(e, httpx.HTTPStatusError) and e.response.status_code in [401, 403]
-    )
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key) and self.api_key != "your_api_key_here"
+    
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _payload(self, search_url: str) -> Dict:
+        # Bright Data SERP request format
+        return {
+            "zone": self.zone,
+            "url": search_url,
+            "format": "raw"  # Returns raw HTML
+        }
+    
+    def _search_url(self, query: str) -> str:
+        """Google search URL with parameters"""
+        return f"https://www.google.com/search?q={urllib.parse.quote_plus(query)}&hl=en&gl=us&num=10"
+    
     def _make_request(self, search_url: str) -> str:
-        """Make HTTP request to Bright Data SERP API with retry logic."""
-        timeout = httpx.Timeout(self.timeout_ms / 1000.0)
-        
+        """Make HTTP request to Bright Data SERP API through its circuit breaker."""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            # Bright Data SERP request format
-            payload = {
-                "zone": self.zone,
-                "url": search_url,
-                "format": "raw"  # Returns raw HTML
-            }
+            headers = self._headers()
+            payload = self._payload(search_url)
             
             logger.info(f"SERP API payload: {payload}")
             
-            with httpx.Client(timeout=timeout) as client:
-                response = client.post(
-                    self.serp_url,
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                
-                logger.info(f"Response status: {response.status_code}, length: {len(response.text)}")
-                
-                return response.text
+            def post(timeout: float) -> str:
+                with httpx.Client(timeout=timeout) as client:
+                    response = client.post(
+                        self.serp_url,
+                        headers=headers,
+                        json=payload
+                    )
+                    response.raise_for_status()
+                    
+                    logger.info(f"Response status: {response.status_code}, length: {len(response.text)}")
+                    
+                    return response.text
+            
+            return resilience.brightdata.call(post)
                 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error {e.response.status_code}: {e.response.text}")
@@ -74,100 +84,45 @@ class BrightDataClient:
             logger.error(f"Request failed: {e}")
             raise
     
-    def _parse_google_results(self, html: str) -> List[Dict]:
-        """Parse Google search results from HTML."""
-        try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html, 'html.parser')
-            results = []
-            
-            # Find all h3 tags (these are the result titles)
-            h3_tags = soup.find_all('h3', limit=10)
-            logger.info(f"Found {len(h3_tags)} h3 result titles")
-            
-            for h3 in h3_tags:
-                # Get the parent link
-                link_elem = h3.find_parent('a')
-                if not link_elem:
-                    # Try to find nearby link
-                    parent = h3.find_parent('div')
-                    if parent:
-                        link_elem = parent.find('a', href=True)
-                
-                if link_elem:
-                    title = h3.get_text(strip=True)
-                    url = link_elem.get('href', '')
-                    
-                    # Clean up URL
-                    if url.startswith('/url?q='):
-                        url = url.split('/url?q=')[1].split('&')[0]
-                    
-                    # Try to find snippet text - look for sibling or parent divs with text
-                    text = ''
-                    parent_div = h3.find_parent('div')
-                    if parent_div:
-                        # Look for divs with substantial text after the h3
-                        for sibling in parent_div.find_all('div'):
-                            sibling_text = sibling.get_text(strip=True)
-                            if len(sibling_text) > 50 and sibling_text != title:
-                                text = sibling_text[:300]
-                                break
-                    
-                    # Only add valid HTTP(S) URLs
-                    if url and url.startswith('http'):
-                        results.append({
-                            'title': title,
-                            'url': url,
-                            'text': text
-                        })
-                        logger.info(f"✓ Parsed: {title[:60]}...")
-                        
-                        if len(results) >= 5:
-                            break
-            
-            return results
-            
-        except ImportError:
-            logger.error("BeautifulSoup not installed")
-            return []
-        except Exception as e:
-            logger.error(f"HTML parsing failed: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+    async def fetch(self, query: str) -> List[Dict]:
+        """
+        Search through the Web Unlocker without falling back to mock data (for the
+        search router). Raises on request failure.
+        """
+        headers = self._headers()
+        payload = self._payload(self._search_url(query))
+        
+        async def post(timeout: float) -> str:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.post(self.serp_url, headers=headers, json=payload)
+                response.raise_for_status()
+                return response.text
+        
+        html = await resilience.brightdata.acall(post)
+        results = parse_google_results(html)
+        capture(html, "brightdata_unlocker", len(results))
+        return results
     
     def search_brightdata(self, query: str) -> List[Dict]:
         """
         Search using Bright Data SERP API.
         Returns parsed Google search results.
         """
-        if not self.api_key or self.api_key == "your_api_key_here":
+        if not self.configured:
             logger.warning("Bright Data API key not configured, using fallback")
             return self.search_fallback(query)
         
         try:
-            # URL-encode the query
-            import urllib.parse
-            encoded_query = urllib.parse.quote_plus(query)
-            
-            # Google search URL with parameters
-            search_url = f"https://www.google.com/search?q={encoded_query}&hl=en&gl=us&num=10"
+            search_url = self._search_url(query)
             
             logger.info(f"Calling Bright Data SERP API for: {query}")
             
             # Fetch HTML through Bright Data
             html = self._make_request(search_url)
             
-            # Debug: Save HTML to file for inspection
-            try:
-                with open('debug_google_result.html', 'w', encoding='utf-8') as f:
-                    f.write(html)
-                logger.info("Saved HTML to debug_google_result.html")
-            except:
-                pass
-            
             # Parse results from HTML
-            results = self._parse_google_results(html)
+            results = parse_google_results(html)
+            capture(html, "brightdata_unlocker", len(results))
             
             if results:
                 logger.info(f"Retrieved {len(results)} results from Bright Data SERP API")
@@ -0,0 +1,354 @@
+"""
+Background ingestion of the full pages behind web search results.
+
+fetch_external_knowledge() hands the result URLs of every live search to
+page_ingestor.submit() and returns immediately. On its own event loop thread
+the ingestor:
+
+1. skips URLs in the page fetch cache (RAG_PAGE_TTL_HOURS after an indexed
+   fetch, RAG_PAGE_RETRY_HOURS after a failed or skipped one)
+2. fetches the rest concurrently (RAG_INGEST_CONCURRENCY overall,
+   RAG_INGEST_PER_HOST per host), streaming at most RAG_INGEST_MAX_BYTES of
+   HTML per page. Redirects are followed by hand and every hop must resolve
+   to public addresses only (no loopback, link-local, private or reserved
+   ranges) and be allowed by its own host's robots.txt
+3. extracts the main content (article/main block, boilerplate removed) and
+   splits it into overlapping chunks
+4. embeds every chunk of the batch at once and upserts it into the scope's
+   collection, then records each outcome in the fetch cache
+
+Indexed pages give later queries enough close vector hits to be answered
+without a live search.
+"""
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+import lxml.html
+from lxml import etree
+
+from rag.store import get_store
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("RAG_INGEST_CONCURRENCY", "4"))
+PER_HOST = int(os.getenv("RAG_INGEST_PER_HOST", "1"))
+MAX_PAGE_BYTES = int(os.getenv("RAG_INGEST_MAX_BYTES", str(2 * 1024 * 1024)))
+FETCH_TIMEOUT_SECONDS = float(os.getenv("RAG_INGEST_TIMEOUT_SECONDS", "10"))
+MAX_PENDING = int(os.getenv("RAG_INGEST_MAX_PENDING", "200"))  # URLs queued or in flight
+PAGE_TTL_HOURS = int(os.getenv("RAG_PAGE_TTL_HOURS", "168"))
+RETRY_HOURS = int(os.getenv("RAG_PAGE_RETRY_HOURS", "6"))
+USER_AGENT = os.getenv("RAG_INGEST_USER_AGENT", "VitaLedgerBot/1.0")
+
+MAX_REDIRECTS = 5
+ROBOTS_TTL_SECONDS = 24 * 3600
+ROBOTS_MAX_BYTES = 512 * 1024
+
+CHUNK_CHARS = int(os.getenv("RAG_CHUNK_CHARS", "1000"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("RAG_CHUNK_OVERLAP_CHARS", "200"))
+MAX_CHUNKS_PER_PAGE = 40
+MIN_BLOCK_CHARS = 40  # Shorter paragraphs/list items are usually navigation or captions
+MIN_PAGE_CHARS = 300
+
+_BLOCK_TAGS = ("p", "li", "h1", "h2", "h3", "h4", "blockquote", "pre", "td")
+_HEADING_TAGS = ("h1", "h2", "h3", "h4")
+
+_BOILERPLATE = etree.XPath(
+    "//script | //style | //noscript | //template | //svg | //iframe | //form"
+    " | //nav | //header | //footer | //aside | //*[@role='navigation'] | //*[@aria-hidden='true']"
+)
+_MAIN_CANDIDATES = etree.XPath("//article | //main | //*[@role='main']")
+_BODY = etree.XPath("//body")
+_TITLE = etree.XPath("(//title)[1]")
+_BLOCKS = etree.XPath(" | ".join(f".//{tag}" for tag in _BLOCK_TAGS))
+
+
+async def _resolves_public(host: str, port: int) -> bool:
+    """True when every address the host resolves to is globally routable"""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        return False
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            return False
+    return bool(infos)
+
+
+def _text(element) -> str:
+    return " ".join(element.text_content().split())
+
+
+def extract_main_content(html: bytes) -> Tuple[str, str]:
+    """
+    Page HTML -> (title, text). The text is the page's main block (the largest
+    article/main element, else the body) without navigation, headers, footers
+    and scripts, one paragraph per line.
+    """
+    try:
+        document = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return "", ""
+
+    title_elem = _TITLE(document)
+    title = _text(title_elem[0]) if title_elem else ""
+
+    for element in _BOILERPLATE(document):
+        element.drop_tree()
+
+    candidates = _MAIN_CANDIDATES(document)
+    if candidates:
+        root = max(candidates, key=lambda element: len(element.text_content()))
+    else:
+        body = _BODY(document)
+        root = body[0] if body else document
+
+    paragraphs = []
+    taken = set()
+    for block in _BLOCKS(root):
+        # Blocks come in document order, so an enclosing block is always seen first
+        if any(ancestor in taken for ancestor in block.iterancestors()):
+            continue
+        text = _text(block)
+        if len(text) >= MIN_BLOCK_CHARS or (block.tag in _HEADING_TAGS and text):
+            paragraphs.append(text)
+            taken.add(block)
+
+    return title, "\n".join(paragraphs)
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP_CHARS) -> List[str]:
+    """
+    Split text into chunks of at most `size` characters along paragraph (then word)
+    boundaries; each chunk starts with up to the last `overlap` characters of the
+    previous one. Short lines (headings) are kept with the paragraph that follows.
+    """
+    paragraphs = []
+    heading = ""
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) < MIN_BLOCK_CHARS:
+            heading = f"{heading}\n{line}" if heading else line
+            continue
+        paragraphs.append(f"{heading}\n{line}" if heading else line)
+        heading = ""
+    if heading:
+        paragraphs.append(heading)
+
+    units = []
+    for paragraph in paragraphs:
+        while len(paragraph) > size:
+            cut = paragraph.rfind(" ", 0, size)
+            cut = cut if cut > size // 2 else size
+            units.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            units.append(paragraph)
+
+    chunks = []
+    current = ""
+    for unit in units:
+        if current and len(current) + 1 + len(unit) > size:
+            chunks.append(current)
+            # Only as much overlap as still fits in front of the unit
+            room = min(overlap, size - 1 - len(unit))
+            tail = current[-room:] if room > 0 else ""
+            space = tail.find(" ")
+            current = tail[space + 1:] if space >= 0 else tail
+        current = f"{current}\n{unit}" if current else unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class PageIngestor:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._pending = set()  # (scope, url) queued or in flight
+        self._pending_lock = threading.Lock()
+        # Created and used on the ingest loop only
+        self._fetch_slots: Optional[asyncio.Semaphore] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(PER_HOST))
+        self._robots: Dict[str, Tuple[RobotFileParser, float]] = {}
+        self.counters = defaultdict(int)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="rag-ingest", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, scope: str, docs: List[Dict]) -> int:
+        """Queue the pages behind search results for indexing; returns how many were queued"""
+        urls = []
+        with self._pending_lock:
+            for doc in docs:
+                url = (doc.get("url") or "").strip()
+                if not url.startswith(("http://", "https://")) or (scope, url) in self._pending or url in urls:
+                    continue
+                if len(self._pending) >= MAX_PENDING:
+                    self.counters["dropped"] += 1
+                    continue
+                self._pending.add((scope, url))
+                urls.append(url)
+        if urls:
+            asyncio.run_coroutine_threadsafe(self._ingest(scope, urls), self._get_loop())
+        return len(urls)
+
+    async def _ingest(self, scope: str, urls: List[str]) -> None:
+        try:
+            store = await asyncio.to_thread(get_store)
+            fresh = await asyncio.to_thread(store.fetched_page_urls, scope, urls, PAGE_TTL_HOURS, RETRY_HOURS)
+            self.counters["cache_hits"] += len(fresh)
+            todo = [url for url in urls if url not in fresh]
+            if not todo:
+                return
+
+            async with httpx.AsyncClient(
+                timeout=FETCH_TIMEOUT_SECONDS,
+                follow_redirects=False,  # _fetch_page checks every hop
+                headers={"User-Agent": USER_AGENT}
+            ) as client:
+                fetches = await asyncio.gather(*(self._fetch_page(client, url) for url in todo))
+
+            pages = []
+            for fetch in fetches:
+                self.counters[fetch["status"]] += 1
+                if fetch["status"] == "ok":
+                    fetch["chunks"] = chunk_text(fetch.pop("text"))[:MAX_CHUNKS_PER_PAGE]
+                    fetch["chunk_count"] = len(fetch["chunks"])
+                    pages.append(fetch)
+
+            # CPU-bound embedding runs off the loop so fetches for other batches continue
+            indexed = await asyncio.to_thread(store.index_pages, scope, pages)
+            self.counters["chunks_indexed"] += indexed
+            if pages and not indexed:
+                for page in pages:
+                    page.update(status="error", chunk_count=0, error="indexing failed")
+            await asyncio.to_thread(store.record_page_fetches, scope, fetches)
+        except Exception as e:
+            logger.error(f"Page ingestion failed for {scope}: {e}")
+            self.counters["batch_errors"] += 1
+        finally:
+            with self._pending_lock:
+                self._pending.difference_update((scope, url) for url in urls)
+
+    async def _fetch_page(self, client: httpx.AsyncClient, url: str) -> Dict:
+        """Fetch one page (following redirects hop by hop) and extract its text; the returned status says what happened"""
+        fetch = {"url": url, "status": "error", "title": "", "content_bytes": 0}
+        if self._fetch_slots is None:
+            self._fetch_slots = asyncio.Semaphore(CONCURRENCY)
+
+        async with self._fetch_slots:
+            try:
+                for _ in range(MAX_REDIRECTS + 1):
+                    refusal = await self._refusal(client, url)
+                    if refusal:
+                        fetch["status"] = refusal
+                        return fetch
+                    body, location = await self._get(client, url, fetch)
+                    if location is None:
+                        break
+                    url = location
+                else:
+                    fetch["error"] = "too many redirects"
+                    return fetch
+            except httpx.HTTPError as e:
+                fetch["error"] = f"{type(e).__name__}: {e}"[:500]
+                return fetch
+        if body is None:
+            return fetch
+
+        fetch["content_bytes"] = len(body)
+        title, text = await asyncio.to_thread(extract_main_content, bytes(body))
+        fetch["title"] = title
+        if len(text) < MIN_PAGE_CHARS:
+            fetch["status"] = "empty"
+            return fetch
+        fetch["status"] = "ok"
+        fetch["text"] = text
+        return fetch
+
+    async def _refusal(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """Why a URL must not be fetched ("blocked" or "disallowed"), or None"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return "blocked"
+        if not await _resolves_public(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80)):
+            return "blocked"
+        if not await self._allowed(client, url):
+            return "disallowed"
+        return None
+
+    async def _get(self, client: httpx.AsyncClient, url: str, fetch: Dict) -> Tuple[Optional[bytearray], Optional[str]]:
+        """
+        One request under the host's slot -> (body, None), (None, redirect target), or
+        (None, None) with fetch's status/error set
+        """
+        async with self._host_slots[urlsplit(url).netloc.lower()]:
+            async with client.stream("GET", url) as response:
+                if response.is_redirect:
+                    return None, urljoin(url, response.headers["location"])
+                if response.status_code >= 400:
+                    fetch["error"] = f"HTTP {response.status_code}"
+                    return None, None
+                if "html" not in response.headers.get("content-type", ""):
+                    fetch["status"] = "not_html"
+                    return None, None
+                if int(response.headers.get("content-length") or 0) > MAX_PAGE_BYTES:
+                    fetch["status"] = "too_large"
+                    return None, None
+
+                body = bytearray()
+                async for data in response.aiter_bytes():
+                    body.extend(data)
+                    if len(body) > MAX_PAGE_BYTES:
+                        fetch["status"] = "too_large"
+                        return None, None
+                return body, None
+
+    async def _allowed(self, client: httpx.AsyncClient, url: str) -> bool:
+        """robots.txt check, cached per origin; unreachable robots.txt (5xx, network) disallows"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        cached = self._robots.get(origin)
+        if cached is None or time.monotonic() - cached[1] > ROBOTS_TTL_SECONDS:
+            parser = RobotFileParser()
+            try:
+                response = await client.get(f"{origin}/robots.txt")
+                if response.status_code >= 500:
+                    parser.disallow_all = True
+                elif response.status_code >= 400 or response.is_redirect:
+                    parser.allow_all = True
+                else:
+                    parser.parse(response.text[:ROBOTS_MAX_BYTES].splitlines())
+            except httpx.HTTPError:
+                parser.disallow_all = True
+            cached = (parser, time.monotonic())
+            self._robots[origin] = cached
+        return cached[0].can_fetch(USER_AGENT, url)
+
+    def metrics(self) -> Dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {"pending": pending, **self.counters}
+
+
+page_ingestor = PageIngestor()
@@ -4,11 +4,23 @@ RAG pipeline orchestration: fetching, caching, and prompt assembly.
 import os
 import logging
 from typing import List, Dict, Literal
-from rag.brightdata_unlocker import BrightDataClient
+from rag.ingest import page_ingestor
+from rag.search_router import search_router
 from rag.store import get_store
+from resilience import deadline
 
 logger = logging.getLogger(__name__)
 
+# Longest a web search may take (within the request deadline)
+WEB_SEARCH_SECONDS = float(os.getenv("RAG_WEB_SEARCH_SECONDS", "10"))
+
+# Enough indexed chunks this close (cosine distance) answer a query without a web search
+VECTOR_MAX_DISTANCE = float(os.getenv("RAG_VECTOR_MAX_DISTANCE", "0.45"))
+VECTOR_MIN_HITS = int(os.getenv("RAG_VECTOR_MIN_HITS", "3"))
+
+# How queries were answered since startup
+answer_sources = {"cache": 0, "vector": 0, "web": 0, "vector_fallback": 0}
+
 def fetch_external_knowledge(
     scope: Literal["mind", "fitness"], 
     query: str,
@@ -20,9 +32,10 @@ def fetch_external_knowledge(
     Flow:
     1. Check cache (24h TTL)
     2. If fresh cache exists, return it
-    3. Otherwise, fetch from Bright Data
-    4. Cache and index new results
-    5. Return docs
+    3. If enough indexed chunks are close matches, return them
+    4. Otherwise, fetch from the web search providers (hedged)
+    5. Cache and index new results; queue their pages for full-page indexing
+    6. Return docs
     
     Args:
         scope: 'mind' or 'fitness'
@@ -46,25 +59,34 @@ def fetch_external_knowledge(
         cached_docs = store.get_cached_results(scope, query, ttl_hours=24)
         if cached_docs:
             logger.info(f"Using cached results for {scope}:{query}")
+            answer_sources["cache"] += 1
             return cached_docs
     except Exception as e:
         logger.warning(f"Cache retrieval failed: {e}")
     
     # Try semantic retrieval from previously indexed docs
     try:
-        vector_docs = store.retrieve(scope, query, top_k=int(os.getenv("RAG_TOP_K", "4")))
+        hits = store.search_index(scope, query, top_k=int(os.getenv("RAG_TOP_K", "4")))
     except Exception as e:
         logger.warning(f"Vector retrieval failed: {e}")
-        vector_docs = []
+        hits = []
+    vector_docs = [doc for doc, _ in hits]
     
     if not use_web:
         logger.info(f"Web disabled, returning {len(vector_docs)} vector results")
+        answer_sources["vector"] += 1
         return vector_docs
     
-    # Fetch fresh data from Bright Data
+    close_docs = [doc for doc, distance in hits if distance <= VECTOR_MAX_DISTANCE]
+    if len(close_docs) >= VECTOR_MIN_HITS:
+        logger.info(f"Answered {scope}:{query} from {len(close_docs)} indexed chunks, skipping web search")
+        answer_sources["vector"] += 1
+        return close_docs
+    
+    # Fetch fresh data from the web
     try:
-        client = BrightDataClient()
-        fresh_docs = client.search(query)
+        with deadline(WEB_SEARCH_SECONDS):
+            fresh_docs = search_router.search(query)
         
         if fresh_docs:
             # Cache and index
@@ -73,19 +95,24 @@ def fetch_external_knowledge(
                 logger.info(f"Fetched and cached {len(fresh_docs)} fresh docs")
             except Exception as cache_error:
                 logger.warning(f"Failed to cache results: {cache_error}")
+            page_ingestor.submit(scope, fresh_docs)
+            answer_sources["web"] += 1
             return fresh_docs
         else:
-            logger.warning(f"No results from Bright Data for {scope}:{query}")
+            logger.warning(f"No web results for {scope}:{query}")
             # Fallback to vector search
+            answer_sources["vector_fallback"] += 1
             return vector_docs
             
     except ValueError as ve:
         # API key missing or configuration error
-        logger.error(f"Bright Data configuration error: {ve}")
+        logger.error(f"Web search configuration error: {ve}")
+        answer_sources["vector_fallback"] += 1
         return vector_docs
     except Exception as e:
-        logger.error(f"Bright Data fetch failed: {e}")
+        logger.error(f"Web search failed: {e}")
         # Fallback to vector search
+        answer_sources["vector_fallback"] += 1
         return vector_docs
 
 
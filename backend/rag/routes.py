@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from rag.ingest import page_ingestor
+from rag.pipeline import answer_sources
+from rag.search_router import search_router
+from subscriptions.routes import require_ops_token
+
+router = APIRouter(prefix="/rag", tags=["rag"])
+
+
+@router.get("/search/metrics", dependencies=[Depends(require_ops_token)])
+def get_search_metrics():
+    """Per-provider latency, error rate, health score, wins and hedges for web search"""
+    return search_router.metrics()
+
+
+@router.get("/index/metrics", dependencies=[Depends(require_ops_token)])
+def get_index_metrics():
+    """Background page ingestion counters and how RAG queries were answered (cache, vector, web)"""
+    return {
+        "ingest": page_ingestor.metrics(),
+        "answers": answer_sources
+    }
@@ -0,0 +1,257 @@
+"""
+Hedged web search across the configured SERP providers.
+
+SerpAPI, the Bright Data Web Unlocker and the Bright Data proxy scraper are
+registered as interchangeable providers. Each one keeps a rolling window of its
+latencies and outcomes, and providers are tried in order of health score
+(median latency inflated by the recent error rate; providers whose circuit is
+open go last).
+
+A search starts on the best provider. If it has not answered within its own
+p95 latency, the same query is hedged to the next provider; the first non-empty
+answer wins and the other request is cancelled. A provider that fails or comes
+back empty fails over to the next one straight away.
+
+Providers run on a dedicated event loop thread, so sync callers (the RAG
+pipeline, the meal plan generator) get real cancellation of the losing HTTP
+request. The caller's request deadline bounds the whole search.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+import resilience
+from rag import brightdata_client, brightdata_unlocker, serpapi_client
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "10"))  # Without a request deadline
+HEDGE_DEFAULT_SECONDS = float(os.getenv("SEARCH_HEDGE_DEFAULT_MS", "2000")) / 1000.0
+HEDGE_MIN_SECONDS = float(os.getenv("SEARCH_HEDGE_MIN_MS", "250")) / 1000.0
+WINDOW = 50  # Calls remembered per provider
+MIN_SAMPLES = 5  # Below this, latency percentiles fall back to HEDGE_DEFAULT_SECONDS
+ERROR_PENALTY = 4.0  # A provider failing every call scores 5x its latency
+MAX_RESULTS = 5
+
+
+def normalize_results(results) -> List[Dict]:
+    """Provider output -> [{title, url, text}, ...] with http(s) URLs, deduplicated by URL"""
+    normalized = []
+    seen_urls = set()
+    for item in results or []:
+        url = str(item.get("url") or "").strip()
+        if not url.startswith("http") or url in seen_urls:
+            continue
+        seen_urls.add(url)
+        normalized.append({
+            "title": str(item.get("title") or "").strip(),
+            "url": url,
+            "text": str(item.get("text") or "").strip()
+        })
+        if len(normalized) >= MAX_RESULTS:
+            break
+    return normalized
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class SearchProvider:
+    def __init__(self, name: str, fetch: Callable[[str], Awaitable[List[Dict]]], dependency: resilience.Dependency):
+        self.name = name
+        self.fetch = fetch
+        self.dependency = dependency
+        self.latencies: Deque[float] = deque(maxlen=WINDOW)  # Seconds, good answers only
+        self.outcomes: Deque[bool] = deque(maxlen=WINDOW)
+        self.counters = {"calls": 0, "wins": 0, "errors": 0, "empty": 0, "cancelled": 0, "hedged_to": 0}
+
+    def latency(self, fraction: float) -> float:
+        if len(self.latencies) < MIN_SAMPLES:
+            return HEDGE_DEFAULT_SECONDS
+        return _percentile(list(self.latencies), fraction)
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+    def score(self) -> float:
+        """Lower is better"""
+        return self.latency(0.5) * (1.0 + ERROR_PENALTY * self.error_rate())
+
+    def hedge_delay(self) -> float:
+        return max(self.latency(0.95), HEDGE_MIN_SECONDS)
+
+    def status(self) -> Dict:
+        return {
+            "p50_ms": round(self.latency(0.5) * 1000),
+            "p95_ms": round(self.latency(0.95) * 1000),
+            "error_rate": round(self.error_rate(), 3),
+            "score": round(self.score(), 3),
+            "circuit": self.dependency.breaker.state,
+            **self.counters,
+        }
+
+
+class SearchRouter:
+    def __init__(self):
+        self.providers: List[SearchProvider] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def register(self, name: str, fetch: Callable[[str], Awaitable[List[Dict]]], dependency: resilience.Dependency) -> None:
+        self.providers.append(SearchProvider(name, fetch, dependency))
+
+    def ranked(self) -> List[SearchProvider]:
+        """Providers by health score; open circuits last, ties in registration order"""
+        order = {provider.name: index for index, provider in enumerate(self.providers)}
+        return sorted(
+            self.providers,
+            key=lambda provider: (
+                provider.dependency.breaker.state == resilience.OPEN,
+                provider.score(),
+                order[provider.name],
+            )
+        )
+
+    async def _call(self, provider: SearchProvider, query: str) -> List[Dict]:
+        """One provider attempt; records the outcome and returns [] on failure"""
+        provider.counters["calls"] += 1
+        started = time.monotonic()
+        try:
+            results = normalize_results(await provider.fetch(query))
+        except asyncio.CancelledError:
+            provider.counters["cancelled"] += 1
+            raise
+        except Exception as e:
+            logger.warning(f"Search provider {provider.name} failed: {e}")
+            provider.counters["errors"] += 1
+            provider.outcomes.append(False)
+            return []
+        if results:
+            provider.latencies.append(time.monotonic() - started)
+        else:
+            provider.counters["empty"] += 1
+        provider.outcomes.append(bool(results))
+        return results
+
+    async def search_async(self, query: str) -> List[Dict]:
+        """
+        Hedged search: returns the first non-empty answer, or [] when every
+        provider failed or came back empty.
+        """
+        candidates = iter(self.ranked())
+        pending: Dict[asyncio.Task, SearchProvider] = {}
+
+        def launch() -> Optional[SearchProvider]:
+            provider = next(candidates, None)
+            if provider is not None:
+                pending[asyncio.ensure_future(self._call(provider, query))] = provider
+            return provider
+
+        current = launch()
+        if current is None:
+            return []
+        hedge_at = time.monotonic() + current.hedge_delay()
+
+        try:
+            while pending:
+                timeout = None if hedge_at is None else max(hedge_at - time.monotonic(), 0)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Current provider is past its p95: hedge once to the next one
+                    hedge_at = None
+                    hedge = launch()
+                    if hedge is not None:
+                        hedge.counters["hedged_to"] += 1
+                        logger.info(f"Search hedged from {current.name} to {hedge.name}")
+                    continue
+
+                for task in done:
+                    provider = pending.pop(task)
+                    results = task.result()
+                    if results:
+                        provider.counters["wins"] += 1
+                        return results
+
+                if not pending:
+                    # Everything in flight failed: fail over, keeping the hedge timer
+                    current = launch()
+                    if current is None:
+                        break
+                    if hedge_at is not None:
+                        hedge_at = time.monotonic() + current.hedge_delay()
+            return []
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ========== SYNC ENTRY POINT ==========
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="search-router", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _search_within(self, query: str, seconds: float) -> List[Dict]:
+        with resilience.deadline(seconds):
+            try:
+                return await asyncio.wait_for(self.search_async(query), seconds)
+            except asyncio.TimeoutError:
+                logger.warning(f"Web search timed out after {seconds:.1f}s: {query}")
+                return []
+
+    def search(self, query: str) -> List[Dict]:
+        """
+        Blocking search for sync callers, bounded by the current request deadline.
+        Falls back to mock data only when no provider is configured (local dev).
+        """
+        if not query or not query.strip():
+            return []
+        if not self.providers:
+            logger.warning("No search provider configured, using fallback data")
+            return serpapi_client.BrightDataClient().search_fallback(query)
+
+        left = resilience.remaining()
+        seconds = SEARCH_TIMEOUT_SECONDS if left is None else min(left, SEARCH_TIMEOUT_SECONDS)
+        if seconds < resilience.MIN_ATTEMPT_SECONDS:
+            return []
+
+        future = asyncio.run_coroutine_threadsafe(self._search_within(query, seconds), self._get_loop())
+        try:
+            return future.result(seconds + 1.0)
+        except FutureTimeoutError:
+            future.cancel()
+            return []
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {provider.name: provider.status() for provider in self.providers}
+
+
+def build_router() -> SearchRouter:
+    """Register every provider whose credentials are configured, in preference order"""
+    router = SearchRouter()
+    unlocker = brightdata_unlocker.BrightDataClient()
+    if unlocker.configured:
+        router.register("brightdata_unlocker", unlocker.fetch, resilience.brightdata)
+    serpapi = serpapi_client.BrightDataClient()
+    if serpapi.configured:
+        router.register("serpapi", serpapi.fetch, resilience.serpapi)
+    proxy = brightdata_client.BrightDataClient()
+    if proxy.configured:
+        router.register("brightdata_proxy", proxy.fetch, resilience.brightdata)
+    return router
+
+
+search_router = build_router()
@@ -0,0 +1,150 @@
+"""
+Google SERP HTML parsing (lxml) and sampled debug capture of raw pages.
+
+Results are read with XPath expressions compiled once at import: every h3 is a
+result title, its link is the enclosing <a> (or the first link in its parent
+div on older layouts), and the snippet is the VwiC3b block of the result, with
+a bounded scan for the first long text block when Google renames it.
+
+Raw pages are only written to disk when SERP_DEBUG_SAMPLE_RATE > 0: that share
+of pages, plus every page that parsed to nothing, goes to SERP_DEBUG_DIR on a
+background thread, keeping the newest SERP_DEBUG_KEEP files. Saved pages double
+as the corpus for benchmark_serp_parser.py.
+"""
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+import lxml.html
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+MAX_RESULTS = 5
+MIN_SNIPPET_CHARS = 50
+MAX_SNIPPET_CHARS = 300
+FALLBACK_SNIPPET_DIVS = 20  # Divs scanned for a snippet when no VwiC3b block is found
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_TITLES = etree.XPath("//h3")
+_ENCLOSING_LINK = etree.XPath("ancestor::a[@href][1]")
+_PARENT_DIV = etree.XPath("ancestor::div[1]")
+_FIRST_LINK = etree.XPath("(.//a[@href])[1]")
+_RESULT_BLOCK = etree.XPath(f"ancestor::div[{_has_class('tF2Cxc')} or {_has_class('g')} or {_has_class('MjjYud')}][1]")
+_SNIPPET = etree.XPath(f"(.//*[{_has_class('VwiC3b')}])[1]")
+_DIVS = etree.XPath(".//div")
+
+
+def _text(element) -> str:
+    return " ".join(element.text_content().split())
+
+
+def _clean_url(href: str) -> str:
+    """Unwrap Google redirect links (/url?q=<target>&...)"""
+    if href.startswith("/url?"):
+        return parse_qs(urlsplit(href).query).get("q", [""])[0]
+    return href
+
+
+def _snippet(h3, title: str) -> str:
+    block = _RESULT_BLOCK(h3)
+    if block:
+        snippet = _SNIPPET(block[0])
+        if snippet:
+            return _text(snippet[0])[:MAX_SNIPPET_CHARS]
+
+    parent = _PARENT_DIV(h3)
+    if not parent:
+        return ""
+    for div in _DIVS(parent[0])[:FALLBACK_SNIPPET_DIVS]:
+        text = _text(div)
+        if len(text) > MIN_SNIPPET_CHARS and text != title:
+            return text[:MAX_SNIPPET_CHARS]
+    return ""
+
+
+def parse_google_results(html: str, limit: int = MAX_RESULTS) -> List[Dict]:
+    """Google results page -> [{title, url, text}, ...] (http(s) links only)"""
+    if not html or not html.strip():
+        return []
+    try:
+        document = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError) as e:
+        logger.error(f"HTML parsing failed: {e}")
+        return []
+
+    results = []
+    seen_urls = set()
+    for h3 in _TITLES(document):
+        link = _ENCLOSING_LINK(h3)
+        if not link:
+            parent = _PARENT_DIV(h3)
+            link = _FIRST_LINK(parent[0]) if parent else []
+        if not link:
+            continue
+
+        url = _clean_url(link[0].get("href", ""))
+        if not url.startswith("http") or url in seen_urls:
+            continue
+        seen_urls.add(url)
+
+        title = _text(h3)
+        results.append({
+            "title": title,
+            "url": url,
+            "text": _snippet(h3, title)
+        })
+        if len(results) >= limit:
+            break
+
+    return results
+
+
+# ========== DEBUG CAPTURE ==========
+
+DEBUG_SAMPLE_RATE = float(os.getenv("SERP_DEBUG_SAMPLE_RATE", "0"))
+DEBUG_DIR = os.getenv("SERP_DEBUG_DIR", "serp_debug")
+DEBUG_KEEP = int(os.getenv("SERP_DEBUG_KEEP", "100"))
+
+_capture_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="serp-capture")  # Starts on first submit
+_UNSAFE_NAME_CHARS = re.compile(r"[^a-z0-9]+")
+
+
+def _write_capture(html: str, filename: str) -> None:
+    try:
+        os.makedirs(DEBUG_DIR, exist_ok=True)
+        with open(os.path.join(DEBUG_DIR, filename), "w", encoding="utf-8") as f:
+            f.write(html)
+        captured = sorted(name for name in os.listdir(DEBUG_DIR) if name.endswith(".html"))
+        for name in captured[:max(len(captured) - DEBUG_KEEP, 0)]:
+            os.remove(os.path.join(DEBUG_DIR, name))
+    except OSError as e:
+        logger.warning(f"SERP debug capture failed: {e}")
+
+
+def capture(html: str, source: str, result_count: int) -> None:
+    """
+    Queue a raw SERP page for the debug directory when capture is enabled: a
+    SERP_DEBUG_SAMPLE_RATE share of pages, and every page that parsed to nothing.
+    Never blocks the caller on disk I/O.
+    """
+    if DEBUG_SAMPLE_RATE <= 0 or not html:
+        return
+    if result_count and random.random() >= DEBUG_SAMPLE_RATE:
+        return
+
+    # Sortable by time, so rotation drops the oldest pages
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+    filename = f"{stamp}-{_UNSAFE_NAME_CHARS.sub('_', source.lower())}-{result_count}-{uuid.uuid4().hex[:6]}.html"
+    _capture_executor.submit(_write_capture, html, filename)
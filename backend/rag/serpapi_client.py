@@ -8,42 +8,39 @@ import os
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 
 import httpx
-import backoff
 import logging
 from typing import List, Dict
 from dotenv import load_dotenv
 
+import resilience
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+SERPAPI_URL = "https://serpapi.com/search"
+
 class BrightDataClient:
     """SerpAPI client (keeping name for compatibility)."""
     
     def __init__(self):
         self.api_key = os.getenv("SERPAPI_KEY")
         self.engine = os.getenv("SERPAPI_ENGINE", "google")
-        self.timeout_ms = int(os.getenv("SERPAPI_TIMEOUT_MS", "30000"))
         self.mode = "serpapi"
         
-        if not self.api_key or self.api_key == "your_serpapi_key_here":
+        if not self.configured:
             logger.warning("SERPAPI_KEY not configured - will use fallback data")
     
-    @backoff.on_exception(
-        backoff.expo,
-        (httpx.TimeoutException, httpx.HTTPStatusError),
-        max_tries=3,
-        giveup=lambda e: isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401
-    )
     def _make_request(self, url: str, params: Dict = None) -> Dict:
-        """Make HTTP request with retry logic."""
-        timeout = httpx.Timeout(self.timeout_ms / 1000.0)
-        
-        try:
+        """Make HTTP request through the SerpAPI circuit breaker."""
+        def get(timeout: float) -> Dict:
             with httpx.Client(timeout=timeout) as client:
                 response = client.get(url, params=params)
                 response.raise_for_status()
                 return response.json()
+        
+        try:
+            return resilience.serpapi.call(get)
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error {e.response.status_code}: {e.response.text}")
             raise
@@ -51,40 +48,61 @@ class BrightDataClient:
             logger.error(f"Request failed: {e}")
             raise
     
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key) and self.api_key != "your_serpapi_key_here"
+    
+    def _params(self, query: str) -> Dict:
+        return {
+            "api_key": self.api_key,
+            "engine": self.engine,
+            "q": query,
+            "num": 5
+        }
+    
+    def _parse_results(self, response: Dict) -> List[Dict]:
+        """Normalize SerpAPI organic results to [{title, url, text}, ...]"""
+        results = []
+        organic_results = response.get("organic_results", [])
+        
+        for item in organic_results[:5]:
+            results.append({
+                "title": item.get("title", ""),
+                "url": item.get("link", ""),
+                "text": item.get("snippet", "")
+            })
+        
+        return results
+    
+    async def fetch(self, query: str) -> List[Dict]:
+        """
+        Search SerpAPI without falling back to mock data (for the search router).
+        Raises on request failure.
+        """
+        params = self._params(query)
+        
+        async def get(timeout: float) -> Dict:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.get(SERPAPI_URL, params=params)
+                response.raise_for_status()
+                return response.json()
+        
+        return self._parse_results(await resilience.serpapi.acall(get))
+    
     def search_serpapi(self, query: str) -> List[Dict]:
         """
         Search using SerpAPI Google Search.
         Returns normalized results.
         """
-        if not self.api_key or self.api_key == "your_serpapi_key_here":
+        if not self.configured:
             logger.warning("SerpAPI key not configured, using fallback")
             return self.search_fallback(query)
         
         try:
-            # SerpAPI endpoint
-            url = "https://serpapi.com/search"
-            
-            params = {
-                "api_key": self.api_key,
-                "engine": self.engine,
-                "q": query,
-                "num": 5
-            }
-            
             logger.info(f"Calling SerpAPI for: {query}")
             
-            response = self._make_request(url, params=params)
-            
-            # Parse SerpAPI response
-            results = []
-            organic_results = response.get("organic_results", [])
-            
-            for item in organic_results[:5]:
-                results.append({
-                    "title": item.get("title", ""),
-                    "url": item.get("link", ""),
-                    "text": item.get("snippet", "")
-                })
+            response = self._make_request(SERPAPI_URL, params=self._params(query))
+            results = self._parse_results(response)
             
             if results:
                 logger.info(f"Retrieved {len(results)} results from SerpAPI")
@@ -10,7 +10,7 @@ os.environ["ANONYMIZED_TELEMETRY"] = "False"
 import hashlib
 import json
 from datetime import datetime, timedelta
-from typing import List, Dict, Literal
+from typing import List, Dict, Literal, Set, Tuple
 from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
 from db import Base  # Use the shared Base
 from sqlalchemy.orm import sessionmaker
@@ -34,6 +34,22 @@ class WebCache(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class PageFetch(Base):
+    """URL-keyed cache of full-page fetches (one row per scope and URL)."""
+    __tablename__ = "page_fetch_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, index=True)
+    url = Column(String)
+    hash = Column(String, unique=True, index=True)
+    status = Column(String)  # ok, blocked, disallowed, too_large, not_html, empty, error
+    title = Column(String)
+    content_bytes = Column(Integer, default=0)
+    chunk_count = Column(Integer, default=0)
+    error = Column(Text)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 class RAGStore:
     """Handles embeddings, caching, and vector retrieval."""
     
@@ -201,17 +217,120 @@ class RAGStore:
         except Exception as e:
             logger.error(f"Chroma indexing failed: {e}")
     
-    def retrieve(self, scope: Literal["mind", "fitness"], query: str, top_k: int = 4) -> List[Dict]:
+    def fetched_page_urls(self, scope: str, urls: List[str], ttl_hours: int, retry_hours: int) -> Set[str]:
         """
-        Semantic retrieval from Chroma vector store.
+        URLs whose page was fetched recently enough to skip: within ttl_hours
+        when it was indexed, within retry_hours when the fetch failed or was skipped.
+        """
+        if not urls:
+            return set()
+        
+        now = datetime.utcnow()
+        db = self.SessionLocal()
+        try:
+            entries = db.query(PageFetch.url, PageFetch.status, PageFetch.fetched_at).filter(
+                PageFetch.hash.in_([self._compute_hash(scope, url) for url in urls])
+            ).all()
+            return {
+                url for url, status, fetched_at in entries
+                if now - fetched_at <= timedelta(hours=ttl_hours if status == "ok" else retry_hours)
+            }
+        except Exception as e:
+            logger.error(f"Page fetch cache lookup failed: {e}")
+            return set()
+        finally:
+            db.close()
+    
+    def record_page_fetches(self, scope: str, fetches: List[Dict]):
+        """Upsert fetch outcomes ({url, status, title, content_bytes, chunk_count, error})"""
+        if not fetches:
+            return
+        
+        db = self.SessionLocal()
+        try:
+            hashes = [self._compute_hash(scope, fetch["url"]) for fetch in fetches]
+            db.query(PageFetch).filter(PageFetch.hash.in_(hashes)).delete(synchronize_session=False)
+            db.add_all([
+                PageFetch(
+                    scope=scope,
+                    url=fetch["url"],
+                    hash=cache_hash,
+                    status=fetch["status"],
+                    title=(fetch.get("title") or "")[:200],
+                    content_bytes=fetch.get("content_bytes", 0),
+                    chunk_count=fetch.get("chunk_count", 0),
+                    error=fetch.get("error"),
+                    fetched_at=datetime.utcnow()
+                )
+                for fetch, cache_hash in zip(fetches, hashes)
+            ])
+            db.commit()
+        except Exception as e:
+            logger.error(f"Page fetch cache storage failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    def index_pages(self, scope: Literal["mind", "fitness"], pages: List[Dict]) -> int:
+        """
+        Embed the chunks of fetched pages in one batch and upsert them into the
+        scope collection, replacing each URL's previous page chunks.
         
         Args:
-            scope: 'mind' or 'fitness'
-            query: user query for semantic search
-            top_k: number of results to return
+            pages: list of {url, title, chunks} dicts
             
         Returns:
-            List of {title, url, text} dicts
+            Number of chunks indexed
+        """
+        pages = [page for page in pages if page.get("chunks")]
+        if not pages:
+            return 0
+        
+        try:
+            collection = self._get_collection(scope)
+            
+            texts = [chunk for page in pages for chunk in page["chunks"]]
+            embeddings = self.embed_texts(texts)
+            if not embeddings:
+                logger.warning("No embeddings generated, skipping page indexing")
+                return 0
+            
+            ids = []
+            metadatas = []
+            for page in pages:
+                url = page["url"][:500]
+                collection.delete(where={"$and": [{"url": url}, {"kind": "page"}]})
+                url_hash = hashlib.md5(page["url"].encode()).hexdigest()
+                for i in range(len(page["chunks"])):
+                    ids.append(f"{scope}_page_{url_hash}_{i}")
+                    metadatas.append({
+                        "title": (page.get("title") or "")[:200],
+                        "url": url,
+                        "scope": scope,
+                        "kind": "page",
+                        "chunk": i
+                    })
+            
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=metadatas,
+                documents=texts
+            )
+            
+            logger.info(f"Indexed {len(texts)} page chunks from {len(pages)} pages in Chroma for {scope}")
+            return len(texts)
+            
+        except Exception as e:
+            logger.error(f"Chroma page indexing failed: {e}")
+            return 0
+    
+    def search_index(self, scope: Literal["mind", "fitness"], query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
+        """
+        Semantic retrieval with cosine distances, best chunk per URL.
+        
+        Returns:
+            List of ({title, url, text}, distance) pairs, nearest first
         """
         try:
             collection = self._get_collection(scope)
@@ -221,30 +340,52 @@ class RAGStore:
             if not query_embedding:
                 return []
             
-            # Query Chroma
+            # Query Chroma (over-fetch: a page contributes several chunks)
             results = collection.query(
                 query_embeddings=query_embedding,
-                n_results=top_k,
+                n_results=top_k * 3,
                 where={"scope": scope}
             )
             
             # Parse results
-            docs = []
+            hits = []
+            seen_urls = set()
             if results and results.get("documents") and results["documents"][0]:
                 for i in range(len(results["documents"][0])):
                     metadata = results["metadatas"][0][i] if results.get("metadatas") else {}
-                    docs.append({
+                    url = metadata.get("url", "")
+                    if url and url in seen_urls:
+                        continue
+                    seen_urls.add(url)
+                    distance = results["distances"][0][i] if results.get("distances") else 1.0
+                    hits.append(({
                         "title": metadata.get("title", "Untitled"),
-                        "url": metadata.get("url", ""),
+                        "url": url,
                         "text": results["documents"][0][i]
-                    })
+                    }, distance))
+                    if len(hits) >= top_k:
+                        break
             
-            logger.info(f"Retrieved {len(docs)} docs from Chroma for {scope}:{query}")
-            return docs
+            logger.info(f"Retrieved {len(hits)} docs from Chroma for {scope}:{query}")
+            return hits
             
         except Exception as e:
             logger.error(f"Chroma retrieval failed: {e}")
             return []
+    
+    def retrieve(self, scope: Literal["mind", "fitness"], query: str, top_k: int = 4) -> List[Dict]:
+        """
+        Semantic retrieval from Chroma vector store.
+        
+        Args:
+            scope: 'mind' or 'fitness'
+            query: user query for semantic search
+            top_k: number of results to return
+            
+        Returns:
+            List of {title, url, text} dicts
+        """
+        return [doc for doc, _ in self.search_index(scope, query, top_k)]
 
 
 # Singleton instance
@@ -0,0 +1,59 @@
+"""
+Rebuild (backfill) the normalized lab_results table from analyzed lab reports.
+
+Re-parses each report's extracted text and merges its stored abnormalities, so
+reports analyzed before lab_results existed show up in trends.
+
+Usage:
+    python rebuild_lab_results.py            # all users
+    python rebuild_lab_results.py <user_id>  # one user
+"""
+import sys
+import json
+from db import SessionLocal, init_db
+from auth.models import User
+from nutrition.models import LabReport, LabResult, UploadBlob, Meal, NutritionRecommendation, MealPlan
+from reminder.models import Reminder
+from sleep.models import SleepSchedule, SleepLog
+from status.models import RecoveryStatus, Caretaker
+from appointment.models import Appointment
+from hydration.models import HydrationLog
+from fitness.models import FitnessGoal, FitnessPlan, WorkoutLog
+from mind.models import MoodLog
+from nutrition.lab_parser import parse_lab_text
+from nutrition.lab_results import record_lab_results
+from sqlalchemy.orm import undefer_group
+
+def run(user_id=None):
+    init_db()
+    db = SessionLocal()
+    try:
+        query = db.query(LabReport).options(
+            undefer_group("extracted_text"), undefer_group("analysis")
+        ).filter(LabReport.analysis_status.in_(("completed", "partial")))
+        if user_id is not None:
+            query = query.filter(LabReport.user_id == user_id)
+
+        reports = rows = 0
+        for report in query.all():
+            try:
+                abnormalities = json.loads(report.abnormalities) if report.abnormalities else []
+            except ValueError:
+                abnormalities = []
+            analysis = {
+                "lab_values": parse_lab_text(report.extracted_text)["results"] if report.extracted_text else [],
+                "abnormalities": abnormalities
+            }
+            rows += record_lab_results(db, report, analysis)
+            reports += 1
+
+        db.commit()
+        print(f"✅ Rebuilt {rows} lab results from {reports} reports")
+    except Exception as e:
+        print(f"❌ Lab results rebuild failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else None)
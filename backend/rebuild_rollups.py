@@ -0,0 +1,35 @@
+"""
+Rebuild (backfill) the user_daily_stats rollup table from raw tracking data.
+
+Usage:
+    python rebuild_rollups.py            # all users
+    python rebuild_rollups.py <user_id>  # one user
+"""
+import sys
+from db import SessionLocal, init_db
+from auth.models import User
+from nutrition.models import LabReport, Meal, NutritionRecommendation, MealPlan
+from reminder.models import Reminder
+from sleep.models import SleepSchedule, SleepLog
+from status.models import RecoveryStatus, Caretaker
+from appointment.models import Appointment
+from hydration.models import HydrationLog
+from fitness.models import FitnessGoal, FitnessPlan, WorkoutLog
+from mind.models import MoodLog
+from rollups.models import UserDailyStats
+from rollups.engine import rebuild
+
+def run(user_id=None):
+    init_db()
+    db = SessionLocal()
+    try:
+        count = rebuild(db, user_id=user_id)
+        print(f"✅ Rebuilt {count} daily rollup rows")
+    except Exception as e:
+        print(f"❌ Rollup rebuild failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -16,6 +16,7 @@ class Reminder(Base):
     enabled = Column(Boolean, default=True)
     is_completed = Column(Boolean, default=False)  # For one-time reminders
     description = Column(String, nullable=True)
+    last_fired_at = Column(DateTime, nullable=True)  # Occurrence most recently delivered by the scheduler
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="reminders")
@@ -0,0 +1,82 @@
+"""
+Reminder notification sinks.
+
+The scheduler hands due reminders to a Notifier in batches. Local development
+uses LogNotifier (stdout) or FileNotifier (JSON lines); a push/email sink can be
+plugged in with REMINDER_NOTIFIER="package.module:ClassName".
+"""
+import importlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+
+class ReminderFire:
+    """One delivery of a reminder"""
+    __slots__ = ("reminder_id", "user_id", "title", "reminder_type", "description", "scheduled_for", "missed")
+
+    def __init__(self, reminder_id: int, user_id: int, title: str, reminder_type: str,
+                 description: Optional[str], scheduled_for: datetime, missed: bool = False):
+        self.reminder_id = reminder_id
+        self.user_id = user_id
+        self.title = title
+        self.reminder_type = reminder_type
+        self.description = description
+        self.scheduled_for = scheduled_for
+        self.missed = missed  # Fire time passed while the server was down
+
+    def to_dict(self) -> dict:
+        return {
+            "reminder_id": self.reminder_id,
+            "user_id": self.user_id,
+            "title": self.title,
+            "reminder_type": self.reminder_type,
+            "description": self.description,
+            "scheduled_for": self.scheduled_for.isoformat(),
+            "missed": self.missed
+        }
+
+
+class Notifier:
+    """Delivers a batch of due reminders"""
+
+    def send(self, fires: List[ReminderFire]) -> None:
+        raise NotImplementedError
+
+
+class LogNotifier(Notifier):
+    def send(self, fires: List[ReminderFire]) -> None:
+        for fire in fires:
+            missed = " (missed)" if fire.missed else ""
+            print(f"🔔 Reminder for user {fire.user_id}: {fire.title} [{fire.reminder_type}] at {fire.scheduled_for:%Y-%m-%d %H:%M}{missed}")
+
+
+class FileNotifier(Notifier):
+    """Appends one JSON line per fire to a file"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("REMINDER_NOTIFY_FILE", "reminder_notifications.jsonl")
+        self._lock = threading.Lock()
+
+    def send(self, fires: List[ReminderFire]) -> None:
+        lines = "".join(json.dumps(fire.to_dict()) + "\n" for fire in fires)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def get_notifier() -> Notifier:
+    """Notifier selected by REMINDER_NOTIFIER: "log" (default), "file" or "module:Class\""""
+    name = os.getenv("REMINDER_NOTIFIER", "log")
+    if name == "log":
+        return LogNotifier()
+    if name == "file":
+        return FileNotifier()
+
+    module_name, _, class_name = name.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)()
+    except Exception as e:
+        print(f"⚠️ Could not load reminder notifier {name!r} ({e}), using log notifier")
+        return LogNotifier()
@@ -5,6 +5,7 @@ from typing import List
 from db import get_db
 from schemas import ReminderCreate, ReminderUpdate, ReminderResponse
 from reminder.models import Reminder
+from reminder.scheduler import reminder_scheduler
 from auth.models import User
 from auth.routes import get_current_user
 
@@ -34,13 +35,16 @@ async def create_reminder(
         reminder_type=reminder_data.reminder_type,
         time=reminder_data.time,
         days=reminder_data.days,
+        reminder_datetime=reminder_data.reminder_datetime,
         enabled=reminder_data.enabled,
+        is_completed=reminder_data.is_completed,
         description=reminder_data.description
     )
     
     db.add(reminder)
     db.commit()
     db.refresh(reminder)
+    reminder_scheduler.schedule(reminder)
     
     print(f"🔔 Reminder created: {reminder.title} at {reminder.time}")
     
@@ -72,6 +76,7 @@ async def update_reminder(
     
     db.commit()
     db.refresh(reminder)
+    reminder_scheduler.schedule(reminder)
     
     return reminder
 
@@ -95,6 +100,7 @@ async def delete_reminder(
     
     db.delete(reminder)
     db.commit()
+    reminder_scheduler.unschedule(reminder_id)
     
     return {"message": "Reminder deleted successfully"}
 
@@ -119,6 +125,7 @@ async def toggle_reminder(
     reminder.enabled = not reminder.enabled
     db.commit()
     db.refresh(reminder)
+    reminder_scheduler.schedule(reminder)
     
     status_text = "enabled" if reminder.enabled else "disabled"
     print(f"🔔 Reminder {status_text}: {reminder.title}")
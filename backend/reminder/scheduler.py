@@ -0,0 +1,390 @@
+"""
+Reminder firing engine.
+
+Enabled reminders live in a min-heap of (next fire time, sequence, reminder id).
+Route handlers call schedule()/unschedule() after committing, so the heap is
+updated incrementally (O(log n) per change) instead of rescanning the reminders
+table. Superseded heap entries are invalidated lazily: each reminder's current
+(fire time, sequence) is kept in a dict and stale entries are skipped when popped.
+
+The run loop sleeps until the earliest fire time (or until an earlier reminder
+is scheduled), pops every due entry, hands them to the notifier in batches,
+re-pushes recurring reminders at their next occurrence and records
+last_fired_at with one bulk UPDATE per batch.
+
+Writes made by other worker processes are picked up by polling the sync_changes
+feed (every write to reminders lands there) every REMINDER_POLL_SECONDS, so one
+worker can run the scheduler (REMINDER_SCHEDULER_ENABLED=false on the others)
+while reminders are created and edited on any of them.
+
+On startup, occurrences missed while the server was down are fired once (several
+missed occurrences of a recurring reminder are coalesced) if they are at most
+REMINDER_MISSED_GRACE_MINUTES old; older ones are skipped.
+
+Fire times are server-local naive datetimes, matching how reminder_datetime is
+written; created_at (UTC) is converted to local time before comparing.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+from datetime import datetime, time, timedelta, timezone
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, update
+
+from db import SessionLocal
+from reminder.models import Reminder
+from sync.models import SyncChange
+from reminder.notifier import Notifier, ReminderFire, get_notifier
+
+SCHEDULER_ENABLED = os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() == "true"
+BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+MISSED_GRACE = timedelta(minutes=int(os.getenv("REMINDER_MISSED_GRACE_MINUTES", "360")))
+POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", "30"))
+MAX_SLEEP_SECONDS = 60  # Re-check periodically so wall-clock jumps are picked up
+
+DAY_CODES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def parse_time(value: Optional[str]) -> Optional[time]:
+    """"HH:MM" -> time, or None if missing/invalid"""
+    try:
+        hour, minute = value.strip().split(":")[:2]
+        return time(int(hour), int(minute))
+    except (AttributeError, ValueError):
+        return None
+
+
+def utc_to_local(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC (datetime.utcnow columns) -> naive server-local time"""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def parse_days(value: Optional[str]) -> Optional[FrozenSet[int]]:
+    """"mon,tue" (or a JSON list of day names) -> weekday numbers; None means every day"""
+    if not value:
+        return None
+    names = [name.strip(" \"'[]").lower()[:3] for name in value.split(",")]
+    days = frozenset(DAY_CODES.index(name) for name in names if name in DAY_CODES)
+    return days or None
+
+
+class ReminderSpec:
+    """The fields of a reminder the scheduler needs to compute and deliver fires"""
+    __slots__ = ("id", "user_id", "title", "reminder_type", "description", "at", "days", "reminder_datetime")
+
+    def __init__(self, row):
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name, None)
+        self.id = get("id")
+        self.user_id = get("user_id")
+        self.title = get("title")
+        self.reminder_type = get("reminder_type")
+        self.description = get("description")
+        self.at = parse_time(get("time"))
+        self.days = parse_days(get("days"))
+        self.reminder_datetime = get("reminder_datetime")
+
+    @property
+    def recurring(self) -> bool:
+        return self.at is not None
+
+    def next_fire(self, after: datetime) -> Optional[datetime]:
+        """First occurrence strictly after `after`"""
+        if not self.recurring:
+            if self.reminder_datetime and self.reminder_datetime > after:
+                return self.reminder_datetime
+            return None
+        for offset in range(8):
+            day = after.date() + timedelta(days=offset)
+            if self.days is None or day.weekday() in self.days:
+                candidate = datetime.combine(day, self.at)
+                if candidate > after:
+                    return candidate
+        return None
+
+    def previous_fire(self, at: datetime) -> Optional[datetime]:
+        """Latest occurrence at or before `at`"""
+        if not self.recurring:
+            if self.reminder_datetime and self.reminder_datetime <= at:
+                return self.reminder_datetime
+            return None
+        for offset in range(8):
+            day = at.date() - timedelta(days=offset)
+            if self.days is None or day.weekday() in self.days:
+                candidate = datetime.combine(day, self.at)
+                if candidate <= at:
+                    return candidate
+        return None
+
+    def fire(self, scheduled_for: datetime, missed: bool = False) -> ReminderFire:
+        return ReminderFire(self.id, self.user_id, self.title, self.reminder_type,
+                            self.description, scheduled_for, missed)
+
+
+class ReminderScheduler:
+    def __init__(self, notifier: Optional[Notifier] = None, batch_size: int = BATCH_SIZE):
+        self.notifier = notifier or get_notifier()
+        self.batch_size = batch_size
+        self._heap: List[Tuple[datetime, int, int]] = []
+        self._current: Dict[int, Tuple[datetime, int]] = {}  # reminder id -> live (fire_at, seq)
+        self._specs: Dict[int, ReminderSpec] = {}
+        self._missed: Dict[int, bool] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._change_cursor = 0  # Last sync_changes id applied by poll_changes()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    # ----- heap maintenance (callers hold the lock) -----
+
+    def _push(self, spec: ReminderSpec, fire_at: datetime, missed: bool = False) -> None:
+        seq = next(self._seq)
+        self._current[spec.id] = (fire_at, seq)
+        self._specs[spec.id] = spec
+        if missed:
+            self._missed[spec.id] = True
+        heapq.heappush(self._heap, (fire_at, seq, spec.id))
+
+    def _drop(self, reminder_id: int) -> None:
+        self._current.pop(reminder_id, None)
+        self._specs.pop(reminder_id, None)
+        self._missed.pop(reminder_id, None)
+
+    def _compact(self) -> None:
+        """Rebuild the heap when stale entries dominate it (amortized O(1) per update)"""
+        if len(self._heap) > 2 * len(self._current) + 1024:
+            self._heap = [(fire_at, seq, reminder_id) for reminder_id, (fire_at, seq) in self._current.items()]
+            heapq.heapify(self._heap)
+
+    def _peek(self) -> Optional[datetime]:
+        while self._heap:
+            fire_at, seq, reminder_id = self._heap[0]
+            if self._current.get(reminder_id) == (fire_at, seq):
+                return fire_at
+            heapq.heappop(self._heap)
+        return None
+
+    # ----- incremental updates from write paths -----
+
+    def schedule(self, reminder) -> None:
+        """(Re)schedule a reminder after it was created or changed (ORM object or row dict)"""
+        self.schedule_many([reminder])
+
+    def schedule_many(self, reminders: Iterable) -> None:
+        now = datetime.now()
+        wake = False
+        with self._lock:
+            earliest = self._peek()
+            for reminder in reminders:
+                get = reminder.get if isinstance(reminder, dict) else lambda name: getattr(reminder, name, None)
+                spec = ReminderSpec(reminder)
+                fire_at = spec.next_fire(now)
+                if get("enabled") is False or get("is_completed") or fire_at is None:
+                    self._drop(spec.id)
+                    continue
+                self._missed.pop(spec.id, None)
+                self._push(spec, fire_at)
+                wake = wake or earliest is None or fire_at < earliest
+            self._compact()
+        if wake:
+            self._wake()
+
+    def unschedule(self, reminder_id: int) -> None:
+        with self._lock:
+            self._drop(reminder_id)
+            self._compact()
+
+    def _wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # ----- startup -----
+
+    def load(self, now: Optional[datetime] = None) -> None:
+        """Build the heap from all enabled reminders, queueing missed fires within the grace period"""
+        now = now or datetime.now()
+        heap = []
+        current = {}
+        specs = {}
+        missed = {}
+        skipped = 0
+
+        db = SessionLocal()
+        try:
+            # Read before the reminders, so changes made while loading are polled again
+            cursor = db.query(func.max(SyncChange.id)).scalar() or 0
+            rows = db.query(
+                Reminder.id, Reminder.user_id, Reminder.title, Reminder.reminder_type,
+                Reminder.description, Reminder.time, Reminder.days, Reminder.reminder_datetime,
+                Reminder.last_fired_at, Reminder.created_at
+            ).filter(
+                Reminder.enabled.is_(True),
+                (Reminder.is_completed.is_(False)) | (Reminder.is_completed.is_(None))
+            ).execution_options(yield_per=5000)
+
+            for row in rows:
+                spec = ReminderSpec(row)
+                previous = spec.previous_fire(now)
+                last_handled = row.last_fired_at or utc_to_local(row.created_at)
+                fire_at = None
+                if previous is not None and (last_handled is None or previous > last_handled):
+                    if now - previous <= MISSED_GRACE:
+                        fire_at = previous
+                        missed[spec.id] = True
+                    else:
+                        skipped += 1
+                if fire_at is None:
+                    fire_at = spec.next_fire(now)
+                if fire_at is None:
+                    continue
+                seq = next(self._seq)
+                heap.append((fire_at, seq, spec.id))
+                current[spec.id] = (fire_at, seq)
+                specs[spec.id] = spec
+        finally:
+            db.close()
+
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap, self._current, self._specs, self._missed = heap, current, specs, missed
+            self._change_cursor = cursor
+        print(f"⏰ Reminder scheduler loaded {len(current)} reminders ({len(missed)} missed fires queued, {skipped} too old to fire)")
+
+    def poll_changes(self) -> int:
+        """Apply reminder writes made by any worker since the last poll (blocking); returns how many"""
+        db = SessionLocal()
+        try:
+            changes = db.query(SyncChange.id, SyncChange.entity_id, SyncChange.op).filter(
+                SyncChange.entity == "reminders",
+                SyncChange.id > self._change_cursor
+            ).order_by(SyncChange.id).limit(self.batch_size).all()
+            if not changes:
+                return 0
+
+            changed_ids = {change.entity_id for change in changes if change.op != "delete"}
+            rows = db.query(
+                Reminder.id, Reminder.user_id, Reminder.title, Reminder.reminder_type,
+                Reminder.description, Reminder.time, Reminder.days, Reminder.reminder_datetime,
+                Reminder.enabled, Reminder.is_completed
+            ).filter(Reminder.id.in_(changed_ids)).all() if changed_ids else []
+        finally:
+            db.close()
+
+        found = {row.id for row in rows}
+        for change in changes:
+            if change.entity_id not in found:
+                self.unschedule(change.entity_id)
+        # Skip reminders this worker already holds unchanged, so a pending (e.g. missed) fire is kept
+        with self._lock:
+            stale = [row for row in rows if not self._same_spec(row)]
+        if stale:
+            self.schedule_many(stale)
+        self._change_cursor = changes[-1].id
+        return len(changes)
+
+    def _same_spec(self, row) -> bool:
+        spec = self._specs.get(row.id)
+        return (
+            spec is not None and row.enabled and not row.is_completed
+            and (spec.title, spec.description, spec.reminder_type, spec.reminder_datetime) ==
+            (row.title, row.description, row.reminder_type, row.reminder_datetime)
+            and (spec.at, spec.days) == (parse_time(row.time), parse_days(row.days))
+        )
+
+    # ----- firing -----
+
+    def pop_due(self, now: datetime) -> List[ReminderFire]:
+        """Pop up to batch_size due reminders, re-pushing recurring ones at their next occurrence"""
+        fires = []
+        with self._lock:
+            while len(fires) < self.batch_size:
+                fire_at = self._peek()
+                if fire_at is None or fire_at > now:
+                    break
+                _, _, reminder_id = heapq.heappop(self._heap)
+                spec = self._specs[reminder_id]
+                fires.append(spec.fire(fire_at, missed=self._missed.pop(reminder_id, False)))
+
+                next_fire = spec.next_fire(max(fire_at, now)) if spec.recurring else None
+                if next_fire is None:
+                    self._drop(reminder_id)
+                else:
+                    self._push(spec, next_fire)
+        return fires
+
+    def deliver(self, fires: List[ReminderFire]) -> None:
+        """Send a batch to the notifier and record last_fired_at (blocking)"""
+        try:
+            self.notifier.send(fires)
+        except Exception as e:
+            print(f"❌ Reminder notifier failed for {len(fires)} reminders: {e}")
+            return
+
+        db = SessionLocal()
+        try:
+            db.execute(update(Reminder), [
+                {"id": fire.reminder_id, "last_fired_at": fire.scheduled_for} for fire in fires
+            ])
+            db.commit()
+        except Exception as e:
+            print(f"❌ Failed to record reminder fires: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        next_poll = 0.0
+        while True:
+            if self._loop.time() >= next_poll:
+                try:
+                    while await asyncio.to_thread(self.poll_changes) >= self.batch_size:
+                        pass
+                except Exception as e:
+                    print(f"❌ Reminder change poll failed: {e}")
+                next_poll = self._loop.time() + POLL_SECONDS
+
+            now = datetime.now()
+            fires = self.pop_due(now)
+            if fires:
+                await asyncio.to_thread(self.deliver, fires)
+                continue
+
+            self._wakeup.clear()
+            with self._lock:
+                next_fire = self._peek()
+            delay = min(MAX_SLEEP_SECONDS, max(next_poll - self._loop.time(), 0))
+            if next_fire is not None:
+                delay = min(max((next_fire - datetime.now()).total_seconds(), 0), delay)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self.load)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+reminder_scheduler = ReminderScheduler()
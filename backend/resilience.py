@@ -0,0 +1,318 @@
+"""
+Failure isolation for calls to external services (Groq, SERP providers, Lava).
+
+Each dependency gets:
+
+- a circuit breaker: after `failure_threshold` consecutive failures the circuit
+  opens and calls fail immediately with DependencyUnavailable; after
+  `recovery_seconds` a few half-open trial calls decide whether it closes again
+- a bulkhead: at most `max_concurrent` calls in flight, extra calls fail fast
+  instead of piling up on a slow upstream and holding every worker
+- a per-attempt timeout and a retry budget, both capped by the request deadline
+
+The request deadline is a context variable set per request by DeadlineMiddleware
+(REQUEST_DEADLINE_SECONDS) and narrowed with `with deadline(seconds):`, so
+retries never outlive the request that triggered them.
+
+Only transport errors, timeouts, 5xx and 429 responses count as upstream
+failures; other 4xx errors are the caller's and are raised without retrying.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+MIN_ATTEMPT_SECONDS = 0.5  # Don't start an attempt with less time than this left
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DependencyUnavailable(RuntimeError):
+    """Raised without calling upstream: circuit open, bulkhead full or deadline spent"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(DependencyUnavailable):
+    """The request deadline leaves no time for (another) attempt"""
+
+
+# ========== DEADLINES ==========
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (None when there is none)"""
+    deadline_at = _deadline.get()
+    return None if deadline_at is None else deadline_at - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Narrow the current deadline to at most `seconds` from now for the block"""
+    deadline_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline_at if current is None else min(current, deadline_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class DeadlineMiddleware:
+    """Give every HTTP request an end-to-end deadline for its outbound calls"""
+
+    def __init__(self, app, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with deadline(self.seconds):
+            await self.app(scope, receive, send)
+
+
+# ========== BREAKER AND BULKHEAD ==========
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_seconds: float = 30.0, half_open_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise DependencyUnavailable unless a call may go through now"""
+        with self._lock:
+            if self.state == OPEN:
+                wait = self.opened_at + self.recovery_seconds - time.monotonic()
+                if wait > 0:
+                    raise DependencyUnavailable("circuit open", retry_after=wait)
+                self.state = HALF_OPEN
+                self._trials = 0
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    raise DependencyUnavailable("circuit half-open, trial call in progress", retry_after=1.0)
+                self._trials += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trials = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.trips += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """A half-open trial ended without a verdict (e.g. a 4xx); let another one through"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+
+class Bulkhead:
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                self.rejected += 1
+                raise DependencyUnavailable(f"too many concurrent calls ({self.max_concurrent})", retry_after=1.0)
+            self.in_flight += 1
+
+    def exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+# ========== DEPENDENCIES ==========
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Errors that say the upstream is unhealthy (retryable, count against the breaker)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    if isinstance(error, (httpx.TransportError, TimeoutError)):
+        return True
+    # Groq SDK errors carry the status code, or none for connection failures/timeouts
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class Dependency:
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        max_tries: int = 1,
+        max_concurrent: Optional[int] = None,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 30.0
+    ):
+        """
+        Args:
+            timeout: Per-attempt timeout in seconds (capped by the request deadline)
+            max_tries: Attempts for upstream failures, with jittered exponential backoff
+            max_concurrent: Bulkhead size (None: no limit here)
+        """
+        self.name = name
+        self.timeout = timeout
+        self.max_tries = max_tries
+        self.breaker = CircuitBreaker(failure_threshold, recovery_seconds)
+        self.bulkhead = Bulkhead(max_concurrent) if max_concurrent else None
+        self.calls = 0
+        self.failures = 0
+
+    def _attempt_timeout(self) -> float:
+        left = remaining()
+        if left is not None and left < MIN_ATTEMPT_SECONDS:
+            raise DeadlineExceeded(f"{self.name}: request deadline exceeded")
+        return self.timeout if left is None else min(self.timeout, left)
+
+    def _backoff(self, attempt: int) -> Optional[float]:
+        """Delay before the next attempt, or None when the deadline cannot fit one"""
+        delay = min(0.5 * 2 ** attempt, 8.0) * random.uniform(0.5, 1.0)
+        left = remaining()
+        if left is not None and left - delay < MIN_ATTEMPT_SECONDS:
+            return None
+        return delay
+
+    def _enter(self) -> None:
+        self.breaker.before_call()
+        if self.bulkhead is not None:
+            try:
+                self.bulkhead.enter()
+            except DependencyUnavailable:
+                self.breaker.release_trial()
+                raise
+
+    def _exit(self, error: Optional[Exception]) -> None:
+        if self.bulkhead is not None:
+            self.bulkhead.exit()
+        self.calls += 1
+        if error is None:
+            self.breaker.record_success()
+        elif is_upstream_failure(error):
+            self.failures += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+
+    def _should_retry(self, error: Exception, attempt: int) -> Optional[float]:
+        if attempt + 1 >= self.max_tries or not is_upstream_failure(error) or self.breaker.state == OPEN:
+            return None
+        return self._backoff(attempt)
+
+    def call(self, fn: Callable[[float], object]):
+        """
+        Call fn(timeout) through the breaker and bulkhead, retrying upstream failures.
+
+        Raises DependencyUnavailable without calling upstream when the circuit is
+        open, the bulkhead is full or the deadline is spent; otherwise raises the
+        last error.
+        """
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout()
+            self._enter()
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                self._exit(e)
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"{self.name} call failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._exit(None)
+            return result
+
+    async def acall(self, fn: Callable[[float], object]):
+        """call() for coroutine functions"""
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout()
+            self._enter()
+            try:
+                result = await fn(timeout)
+            except Exception as e:
+                self._exit(e)
+                delay = self._should_retry(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning(f"{self.name} call failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._exit(None)
+            return result
+
+    def status(self) -> Dict:
+        breaker = self.breaker
+        status = {
+            "state": breaker.state,
+            "consecutive_failures": breaker.failures,
+            "trips": breaker.trips,
+            "calls": self.calls,
+            "failures": self.failures,
+        }
+        if breaker.state == OPEN:
+            status["retry_in_seconds"] = round(max(breaker.opened_at + breaker.recovery_seconds - time.monotonic(), 0), 1)
+        if self.bulkhead is not None:
+            status["in_flight"] = self.bulkhead.in_flight
+            status["max_concurrent"] = self.bulkhead.max_concurrent
+            status["rejected"] = self.bulkhead.rejected
+        return status
+
+
+def _seconds(name: str, default: str) -> float:
+    return float(os.getenv(name, default)) / 1000.0
+
+
+# Groq concurrency is bounded by the LLM dispatcher; 429s are paced by llm.governor
+groq = Dependency("groq", timeout=float(os.getenv("GROQ_TIMEOUT_SECONDS", "60")))
+serpapi = Dependency("serpapi", timeout=_seconds("SERPAPI_TIMEOUT_MS", "8000"), max_tries=2, max_concurrent=8)
+brightdata = Dependency("brightdata", timeout=_seconds("BRIGHTDATA_TIMEOUT_MS", "8000"), max_tries=2, max_concurrent=8)
+lava = Dependency("lava", timeout=float(os.getenv("LAVA_TIMEOUT_SECONDS", "10")), max_tries=3, max_concurrent=16)
+
+DEPENDENCIES = {dependency.name: dependency for dependency in (groq, serpapi, brightdata, lava)}
+
+
+def dependency_status() -> Dict[str, Dict]:
+    return {name: dependency.status() for name, dependency in DEPENDENCIES.items()}
@@ -0,0 +1,54 @@
+"""
+JSON response helpers.
+
+API responses are rendered with orjson (see ORJSONResponse in main.py). Large
+stored JSON blobs (fitness/meal plan payloads) are spliced into the response
+body verbatim with `RawJSON` instead of being decoded and re-encoded per read.
+"""
+import uuid
+
+import orjson
+from fastapi.responses import Response
+
+
+class RawJSON:
+    """An already-encoded JSON document to embed verbatim in a response"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def encode(self) -> bytes:
+        if self.value is None or self.value == "":
+            return b"null"
+        if isinstance(self.value, bytes):
+            return self.value
+        return self.value.encode("utf-8")
+
+
+def raw_json_response(payload, status_code: int = 200) -> Response:
+    """
+    Serialize `payload` with orjson, embedding any RawJSON values as-is.
+
+    RawJSON values are swapped for unique placeholder strings, the envelope is
+    encoded, and each placeholder is then replaced with the stored bytes.
+    """
+    raw_parts = {}
+    nonce = uuid.uuid4().hex
+
+    def substitute(value):
+        if isinstance(value, RawJSON):
+            token = f"__raw_{nonce}_{len(raw_parts)}__"
+            raw_parts[token] = value.encode()
+            return token
+        if isinstance(value, dict):
+            return {key: substitute(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [substitute(item) for item in value]
+        return value
+
+    body = orjson.dumps(substitute(payload))
+    for token, raw in raw_parts.items():
+        body = body.replace(b'"' + token.encode() + b'"', raw, 1)
+
+    return Response(content=body, status_code=status_code, media_type="application/json")
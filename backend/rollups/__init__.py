@@ -0,0 +1 @@
+# Rollups module
@@ -0,0 +1,187 @@
+"""
+Incremental per-user daily rollups.
+
+Write paths in meals, hydration, sleep, mood and workouts call refresh_day() for the
+(user, day) they touched, inside the same transaction, so user_daily_stats always
+mirrors the raw tables. rebuild() backfills the whole table with grouped queries.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from db import bulk_insert
+from rollups.models import UserDailyStats
+
+SLEEP_QUALITY_SCORES = {
+    "poor": 1,
+    "fair": 2,
+    "good": 3,
+    "excellent": 4
+}
+
+EMPTY_DAY = {
+    "meals_logged": 0,
+    "calories": None,
+    "protein": None,
+    "carbs": None,
+    "fats": None,
+    "water_ml": None,
+    "sleep_hours": None,
+    "sleep_quality": None,
+    "mood_count": 0,
+    "mood_avg": None,
+    "workouts_completed": 0
+}
+
+DayKey = Tuple[int, date]
+
+
+def _as_date(value) -> date:
+    """Normalize DATE/DATETIME values and SQLite date() strings to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _datetime_filter(column, day: Optional[date]):
+    """Index-friendly range filter for a DateTime column covering one day"""
+    if day is None:
+        return []
+    start = datetime.combine(day, datetime.min.time())
+    return [column >= start, column < start + timedelta(days=1)]
+
+
+def _aggregate(db: Session, user_id: Optional[int] = None, day: Optional[date] = None) -> Dict[DayKey, Dict]:
+    """Aggregate raw tracking rows grouped by (user, day), optionally for one user/day"""
+    # Imported here: the fitness and hydration packages load their routes (which
+    # import this module) from __init__, so top-level imports would be circular
+    from nutrition.models import Meal
+    from hydration.models import HydrationLog
+    from sleep.models import SleepLog
+    from mind.models import MoodLog
+    from fitness.models import WorkoutLog
+    
+    days: Dict[DayKey, Dict] = {}
+    
+    def _merge(key_user, key_day, values):
+        key = (key_user, _as_date(key_day))
+        days.setdefault(key, dict(EMPTY_DAY)).update(values)
+    
+    def _user_filter(column):
+        return [column == user_id] if user_id is not None else []
+    
+    # Meals (DateTime column)
+    meal_day = func.date(Meal.meal_date)
+    for row in db.query(
+        Meal.user_id, meal_day,
+        func.count(Meal.id), func.sum(Meal.calories), func.sum(Meal.protein),
+        func.sum(Meal.carbs), func.sum(Meal.fats)
+    ).filter(
+        *_user_filter(Meal.user_id), *_datetime_filter(Meal.meal_date, day)
+    ).group_by(Meal.user_id, meal_day):
+        _merge(row[0], row[1], {
+            "meals_logged": row[2],
+            "calories": row[3],
+            "protein": row[4],
+            "carbs": row[5],
+            "fats": row[6]
+        })
+    
+    # Hydration (Date column, one log per day)
+    for row in db.query(
+        HydrationLog.user_id, HydrationLog.date, func.sum(HydrationLog.amount_ml)
+    ).filter(
+        *_user_filter(HydrationLog.user_id),
+        *([HydrationLog.date == day] if day is not None else [])
+    ).group_by(HydrationLog.user_id, HydrationLog.date):
+        _merge(row[0], row[1], {"water_ml": row[2]})
+    
+    # Sleep (Date column)
+    quality_score = case(SLEEP_QUALITY_SCORES, value=SleepLog.quality, else_=None)
+    for row in db.query(
+        SleepLog.user_id, SleepLog.date,
+        func.sum(SleepLog.duration_hours), func.avg(quality_score)
+    ).filter(
+        *_user_filter(SleepLog.user_id),
+        *([SleepLog.date == day] if day is not None else [])
+    ).group_by(SleepLog.user_id, SleepLog.date):
+        _merge(row[0], row[1], {"sleep_hours": row[2], "sleep_quality": row[3]})
+    
+    # Mood (DateTime column)
+    mood_day = func.date(MoodLog.created_at)
+    for row in db.query(
+        MoodLog.user_id, mood_day, func.count(MoodLog.id), func.avg(MoodLog.intensity)
+    ).filter(
+        *_user_filter(MoodLog.user_id), *_datetime_filter(MoodLog.created_at, day)
+    ).group_by(MoodLog.user_id, mood_day):
+        _merge(row[0], row[1], {"mood_count": row[2], "mood_avg": row[3]})
+    
+    # Workouts (counted on the day they were completed)
+    workout_day = func.date(WorkoutLog.completion_date)
+    for row in db.query(
+        WorkoutLog.user_id, workout_day, func.count(WorkoutLog.id)
+    ).filter(
+        WorkoutLog.completed == True,
+        WorkoutLog.completion_date.isnot(None),
+        *_user_filter(WorkoutLog.user_id),
+        *_datetime_filter(WorkoutLog.completion_date, day)
+    ).group_by(WorkoutLog.user_id, workout_day):
+        _merge(row[0], row[1], {"workouts_completed": row[2]})
+    
+    return days
+
+
+def refresh_day(db: Session, user_id: int, day) -> UserDailyStats:
+    """
+    Recompute one user's rollup row for a single day from the raw tables.
+    
+    Called from write paths before commit; flushes pending changes first so the
+    row reflects the write that triggered it. The caller commits.
+    """
+    if day is None:
+        day = date.today()
+    day = _as_date(day)
+    
+    db.flush()
+    values = _aggregate(db, user_id=user_id, day=day).get((user_id, day), EMPTY_DAY)
+    
+    stats = db.query(UserDailyStats).filter(
+        UserDailyStats.user_id == user_id,
+        UserDailyStats.date == day
+    ).first()
+    
+    if not stats:
+        stats = UserDailyStats(user_id=user_id, date=day)
+        db.add(stats)
+    
+    for field, value in values.items():
+        setattr(stats, field, value)
+    stats.updated_at = datetime.utcnow()
+    
+    return stats
+
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Rebuild user_daily_stats from scratch (all users, or one user) and commit.
+    
+    Returns:
+        Number of (user, day) rows written
+    """
+    query = db.query(UserDailyStats)
+    if user_id is not None:
+        query = query.filter(UserDailyStats.user_id == user_id)
+    query.delete(synchronize_session=False)
+    
+    days = _aggregate(db, user_id=user_id)
+    now = datetime.utcnow()
+    bulk_insert(db, UserDailyStats, [
+        {"user_id": key_user, "date": key_day, "updated_at": now, **values}
+        for (key_user, key_day), values in days.items()
+    ])
+    
+    db.commit()
+    return len(days)
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from db import Base
+
+
+class UserDailyStats(Base):
+    """One row per user per day, maintained by rollups.engine on every tracking write.
+
+    Nullable metrics stay NULL when nothing was logged that day so SQL AVG() skips them.
+    """
+    __tablename__ = "user_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    
+    # Nutrition (sums of meals logged that day)
+    meals_logged = Column(Integer, default=0)
+    calories = Column(Float, nullable=True)
+    protein = Column(Float, nullable=True)  # grams
+    carbs = Column(Float, nullable=True)    # grams
+    fats = Column(Float, nullable=True)     # grams
+    
+    # Hydration
+    water_ml = Column(Float, nullable=True)
+    
+    # Sleep (hours summed across logs, quality averaged on a 1-4 scale)
+    sleep_hours = Column(Float, nullable=True)
+    sleep_quality = Column(Float, nullable=True)
+    
+    # Mood (average intensity on the 1-10 scale)
+    mood_count = Column(Integer, default=0)
+    mood_avg = Column(Float, nullable=True)
+    
+    # Fitness
+    workouts_completed = Column(Integer, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', name='uq_user_daily_stats_user_date'),
+    )
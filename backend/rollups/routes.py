@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import List
+from datetime import date, timedelta
+
+from db import get_db
+from auth.routes import get_current_user
+from auth.models import User
+from rollups.models import UserDailyStats
+from schemas import UserDailyStatsResponse, TrendBucketResponse
+
+router = APIRouter(prefix="/rollups", tags=["rollups"])
+
+
+def _trend_buckets(db: Session, user_id: int, bucket_format: str, start_date: date) -> List[dict]:
+    """Group daily rollup rows into strftime buckets - O(days), never touches raw logs"""
+    bucket = func.strftime(bucket_format, UserDailyStats.date)
+    
+    rows = db.query(
+        bucket,
+        func.min(UserDailyStats.date),
+        func.count(UserDailyStats.id),
+        func.avg(UserDailyStats.calories),
+        func.avg(UserDailyStats.protein),
+        func.avg(UserDailyStats.carbs),
+        func.avg(UserDailyStats.fats),
+        func.avg(UserDailyStats.water_ml),
+        func.avg(UserDailyStats.sleep_hours),
+        func.avg(UserDailyStats.sleep_quality),
+        # Weight each day's mood average by the number of entries that day
+        func.sum(UserDailyStats.mood_avg * UserDailyStats.mood_count) / func.nullif(func.sum(UserDailyStats.mood_count), 0),
+        func.sum(UserDailyStats.workouts_completed)
+    ).filter(
+        UserDailyStats.user_id == user_id,
+        UserDailyStats.date >= start_date
+    ).group_by(bucket).order_by(bucket).all()
+    
+    return [
+        {
+            "period": row[0],
+            "start_date": row[1],
+            "days_logged": row[2],
+            "avg_calories": row[3],
+            "avg_protein": row[4],
+            "avg_carbs": row[5],
+            "avg_fats": row[6],
+            "avg_water_ml": row[7],
+            "avg_sleep_hours": row[8],
+            "avg_sleep_quality": row[9],
+            "avg_mood": row[10],
+            "total_workouts": row[11] or 0
+        }
+        for row in rows
+    ]
+
+
+@router.get("/daily", response_model=List[UserDailyStatsResponse])
+def get_daily_stats(
+    days: int = 7,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get per-day totals for the last N days"""
+    start_date = date.today() - timedelta(days=days-1)
+    
+    return db.query(UserDailyStats).filter(
+        UserDailyStats.user_id == current_user.id,
+        UserDailyStats.date >= start_date
+    ).order_by(UserDailyStats.date.desc()).all()
+
+
+@router.get("/trends/weekly", response_model=List[TrendBucketResponse])
+def get_weekly_trends(
+    weeks: int = 12,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get weekly averages for the last N weeks"""
+    today = date.today()
+    start_date = today - timedelta(days=today.weekday()) - timedelta(weeks=weeks-1)
+    return _trend_buckets(db, current_user.id, "%Y-W%W", start_date)
+
+
+@router.get("/trends/monthly", response_model=List[TrendBucketResponse])
+def get_monthly_trends(
+    months: int = 6,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get monthly averages for the last N months"""
+    start_date = date.today().replace(day=1)
+    for _ in range(months - 1):
+        start_date = (start_date - timedelta(days=1)).replace(day=1)
+    return _trend_buckets(db, current_user.id, "%Y-%m", start_date)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal, Union, Annotated
 from datetime import datetime, date
+from mind.schemas import MoodCreate
 
 class UserCreate(BaseModel):
     name: str
@@ -246,13 +247,46 @@ class LabReportResponse(BaseModel):
     uploaded_at: Optional[datetime] = None
     report_date: Optional[datetime] = None
     next_test_date: Optional[datetime] = None
-    analysis_status: str  # pending, analyzing, completed, failed
+    analysis_status: str  # pending, analyzing, completed, partial, failed
     ai_summary: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class LabReportSummary(BaseModel):
+    """Slim lab report row for list views (no extracted text or analysis)"""
+    id: int
+    report_name: str
+    uploaded_at: Optional[datetime] = None
+    report_date: Optional[datetime] = None
+    next_test_date: Optional[datetime] = None
+    analysis_status: str
+    reminder_created: Optional[bool] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class LabResultPoint(BaseModel):
+    report_id: int
+    sample_date: datetime
+    value: Optional[float] = None
+    value_text: Optional[str] = None
+    unit: Optional[str] = None
+    ref_low: Optional[float] = None
+    ref_high: Optional[float] = None
+    status: str
+
+    class Config:
+        from_attributes = True
+
+class LabTrendResponse(BaseModel):
+    code: str
+    parameter: str
+    unit: Optional[str] = None
+    points: List[LabResultPoint]
+
 class LabReportAnalysis(BaseModel):
     id: int
     report_name: str
@@ -262,6 +296,17 @@ class LabReportAnalysis(BaseModel):
     recommendations: List[str]
     risk_factors: List[str]
 
+class MealPlanHistoryItem(BaseModel):
+    """Meal plan history row; modification_notes is truncated to 100 characters"""
+    id: int
+    expectations: str
+    is_active: bool
+    created_at: datetime
+    modification_notes: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 class NutritionRecommendationResponse(BaseModel):
     id: int
     user_id: int
@@ -353,3 +398,127 @@ class WorkoutLogUpdate(BaseModel):
     workout_log_id: int
     completed: bool
     notes: Optional[str] = None
+
+# Rollup Schemas
+class UserDailyStatsResponse(BaseModel):
+    date: date
+    meals_logged: int
+    calories: Optional[float]
+    protein: Optional[float]
+    carbs: Optional[float]
+    fats: Optional[float]
+    water_ml: Optional[float]
+    sleep_hours: Optional[float]
+    sleep_quality: Optional[float]
+    mood_count: int
+    mood_avg: Optional[float]
+    workouts_completed: int
+
+    class Config:
+        from_attributes = True
+
+class TrendBucketResponse(BaseModel):
+    period: str  # "2025-W07" or "2025-02"
+    start_date: date
+    days_logged: int
+    avg_calories: Optional[float]
+    avg_protein: Optional[float]
+    avg_carbs: Optional[float]
+    avg_fats: Optional[float]
+    avg_water_ml: Optional[float]
+    avg_sleep_hours: Optional[float]
+    avg_sleep_quality: Optional[float]
+    avg_mood: Optional[float]
+    total_workouts: int
+
+class WorkoutLogResponse(BaseModel):
+    id: int
+    user_id: int
+    plan_id: int
+    day_number: int
+    workout_name: str
+    completed: bool
+    completion_date: Optional[datetime]
+    notes: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Batch Schemas
+MAX_BATCH_OPERATIONS = 100
+
+class BatchMealOperation(BaseModel):
+    op: Literal["meal"]
+    idempotency_key: Optional[str] = None
+    data: MealCreate
+
+class BatchHydrationOperation(BaseModel):
+    op: Literal["hydration"]
+    idempotency_key: Optional[str] = None
+    data: HydrationCreate
+
+class BatchSleepOperation(BaseModel):
+    op: Literal["sleep"]
+    idempotency_key: Optional[str] = None
+    data: SleepLogCreate
+
+class BatchMoodOperation(BaseModel):
+    op: Literal["mood"]
+    idempotency_key: Optional[str] = None
+    data: MoodCreate
+
+class BatchWorkoutOperation(BaseModel):
+    op: Literal["workout"]
+    idempotency_key: Optional[str] = None
+    data: WorkoutLogUpdate
+
+BatchOperation = Annotated[
+    Union[
+        BatchMealOperation,
+        BatchHydrationOperation,
+        BatchSleepOperation,
+        BatchMoodOperation,
+        BatchWorkoutOperation
+    ],
+    Field(discriminator="op")
+]
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+class BatchItemResult(BaseModel):
+    index: int
+    op: str
+    idempotency_key: Optional[str] = None
+    status_code: int
+    replayed: bool = False
+    data: Optional[dict] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    applied: int
+    failed: int
+
+# Calendar Schemas
+class CalendarEvent(BaseModel):
+    uid: str
+    source: str  # appointment, reminder, lab_retest
+    source_id: int
+    title: str
+    category: Optional[str] = None
+    start: datetime
+    description: Optional[str] = None
+    location: Optional[str] = None
+    doctor_name: Optional[str] = None
+    completed: bool = False
+
+class CalendarResponse(BaseModel):
+    from_date: date = Field(..., alias="from")
+    to_date: date = Field(..., alias="to")
+    events: List[CalendarEvent]
+
+class CalendarFeedTokenResponse(BaseModel):
+    token: str  # Shown once; only its hash is stored
+    ics_url: str
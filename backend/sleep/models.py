@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -30,3 +30,7 @@ class SleepLog(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="sleep_logs")
+
+    __table_args__ = (
+        Index('idx_sleep_logs_user_date', 'user_id', 'date'),
+    )
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from typing import Optional, List
 from datetime import datetime, timedelta, date
 from db import get_db
 from auth.routes import get_current_user
 from auth.models import User
 from sleep.models import SleepSchedule, SleepLog
+from rollups.engine import refresh_day
 from schemas import SleepScheduleCreate, SleepScheduleResponse, SleepLogCreate, SleepLogResponse
 
 router = APIRouter(prefix="/sleep", tags=["sleep"])
@@ -73,13 +75,8 @@ def delete_sleep_schedule(
     return {"message": "Sleep schedule deleted successfully"}
 
 # Sleep Log Routes
-@router.post("/log", response_model=SleepLogResponse)
-def create_sleep_log(
-    log_data: SleepLogCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Log a sleep session"""
+def add_sleep_log(db: Session, user_id: int, log_data: SleepLogCreate) -> SleepLog:
+    """Stage a sleep session and its daily rollup (caller commits)"""
     # Calculate duration
     duration = (log_data.wake_time - log_data.bed_time).total_seconds() / 3600
     
@@ -87,7 +84,7 @@ def create_sleep_log(
         duration += 24  # Handle sleep crossing midnight
     
     new_log = SleepLog(
-        user_id=current_user.id,
+        user_id=user_id,
         date=log_data.date or date.today(),
         bed_time=log_data.bed_time,
         wake_time=log_data.wake_time,
@@ -97,6 +94,17 @@ def create_sleep_log(
     )
     
     db.add(new_log)
+    refresh_day(db, user_id, new_log.date)
+    return new_log
+
+@router.post("/log", response_model=SleepLogResponse)
+def create_sleep_log(
+    log_data: SleepLogCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Log a sleep session"""
+    new_log = add_sleep_log(db, current_user.id, log_data)
     db.commit()
     db.refresh(new_log)
     return new_log
@@ -126,23 +134,29 @@ def get_sleep_stats(
     """Get sleep statistics and suggestions"""
     start_date = date.today() - timedelta(days=days-1)
     
-    logs = db.query(SleepLog).filter(
+    total_logs, avg_duration = db.query(
+        func.count(SleepLog.id),
+        func.avg(SleepLog.duration_hours)
+    ).filter(
         SleepLog.user_id == current_user.id,
         SleepLog.date >= start_date
-    ).all()
+    ).one()
     
-    if not logs:
+    if not total_logs:
         return {
             "average_duration": 0,
             "total_logs": 0,
             "suggestion": "Start logging your sleep to get personalized insights!"
         }
     
-    avg_duration = sum(log.duration_hours for log in logs) / len(logs)
-    quality_counts = {}
-    for log in logs:
-        if log.quality:
-            quality_counts[log.quality] = quality_counts.get(log.quality, 0) + 1
+    quality_counts = dict(db.query(
+        SleepLog.quality,
+        func.count(SleepLog.id)
+    ).filter(
+        SleepLog.user_id == current_user.id,
+        SleepLog.date >= start_date,
+        SleepLog.quality != ''
+    ).group_by(SleepLog.quality).all())
     
     # Generate suggestions
     suggestion = ""
@@ -157,10 +171,9 @@ def get_sleep_stats(
     
     return {
         "average_duration": round(avg_duration, 2),
-        "total_logs": len(logs),
+        "total_logs": total_logs,
         "quality_distribution": quality_counts,
-        "suggestion": suggestion,
-        "logs": logs
+        "suggestion": suggestion
     }
 
 @router.delete("/log/{log_id}")
@@ -182,6 +195,7 @@ def delete_sleep_log(
         )
     
     db.delete(log)
+    refresh_day(db, current_user.id, log.date)
     db.commit()
     return {"message": "Sleep log deleted successfully"}
 
@@ -0,0 +1,67 @@
+"""
+Cached subscription lookups for per-request plan checks.
+
+require_plan() runs on every guarded request, so it reads a small immutable
+snapshot of the user's subscription from an in-process cache instead of the
+database. Every code path that writes a subscription (routes, webhooks, trial
+activation and the expiry sweeper) calls invalidate_subscription() after
+committing; the TTL bounds staleness across worker processes.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import Subscription
+
+CACHE_TTL_SECONDS = float(os.getenv("SUBSCRIPTION_CACHE_TTL_SECONDS", "60"))
+
+
+class SubscriptionSnapshot:
+    """Read-only copy of the subscription fields plan checks need"""
+    __slots__ = ("id", "user_id", "plan", "period", "status", "is_trial", "trial_ends_at", "ends_at")
+
+    def __init__(self, subscription: Subscription):
+        for field in self.__slots__:
+            setattr(self, field, getattr(subscription, field))
+
+    def trial_expired(self, now: Optional[datetime] = None) -> bool:
+        """Trial past its end date that the sweeper has not transitioned yet"""
+        return (
+            self.status == "trial"
+            and self.trial_ends_at is not None
+            and (now or datetime.utcnow()) > self.trial_ends_at
+        )
+
+
+_cache: Dict[str, Tuple[float, Optional[SubscriptionSnapshot]]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_subscription_snapshot(db: Session, user_id: str) -> Optional[SubscriptionSnapshot]:
+    """The user's subscription (None if they have none), from cache when fresh"""
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    subscription = db.query(Subscription).filter(Subscription.user_id == user_id).first()
+    snapshot = SubscriptionSnapshot(subscription) if subscription else None
+    with _cache_lock:
+        _cache[user_id] = (now + CACHE_TTL_SECONDS, snapshot)
+    return snapshot
+
+
+def invalidate_subscription(user_id: str) -> None:
+    with _cache_lock:
+        _cache.pop(str(user_id), None)
+
+
+def invalidate_subscriptions(user_ids: Iterable[str]) -> None:
+    with _cache_lock:
+        for user_id in user_ids:
+            _cache.pop(str(user_id), None)
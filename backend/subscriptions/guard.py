@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from auth.routes import get_current_user
 from db import get_db
-from .models import Subscription
+from .cache import get_subscription_snapshot
 
 PLAN_RANKS = {
     "basic": 1,
@@ -11,7 +11,10 @@ PLAN_RANKS = {
 }
 
 def require_plan(min_plan: str = "basic"):
-    """Dependency to check if user has required plan tier"""
+    """
+    Dependency to check if user has required plan tier.
+    Read-only: uses the cached subscription snapshot; expiry is applied by the sweeper.
+    """
     
     async def _check_plan(
         current_user = Depends(get_current_user),
@@ -19,10 +22,8 @@ def require_plan(min_plan: str = "basic"):
     ):
         user_id = str(current_user.id)
         
-        # Get user's subscription
-        subscription = db.query(Subscription).filter(
-            Subscription.user_id == user_id
-        ).first()
+        # Get user's subscription (cached)
+        subscription = get_subscription_snapshot(db, user_id)
         
         # Check if active subscription or trial exists
         if not subscription or subscription.status not in ["active", "trial"]:
@@ -31,14 +32,12 @@ def require_plan(min_plan: str = "basic"):
                 detail=f"This feature requires an active subscription. Please upgrade to {min_plan.title()} or higher."
             )
         
-        # Check if trial has expired
-        if subscription.status == "trial" and subscription.trial_ends_at:
-            from datetime import datetime
-            if datetime.utcnow() > subscription.trial_ends_at:
-                raise HTTPException(
-                    status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                    detail="Your free trial has ended. Please subscribe to continue using premium features."
-                )
+        # Trial ended since the last sweep
+        if subscription.trial_expired():
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail="Your free trial has ended. Please subscribe to continue using premium features."
+            )
         
         # Check plan tier
         user_rank = PLAN_RANKS.get(subscription.plan, 0)
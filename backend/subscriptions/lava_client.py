@@ -3,8 +3,22 @@ import hmac
 import hashlib
 import json
 import httpx
-import backoff
 from datetime import datetime
+from typing import Optional
+
+import resilience
+
+
+async def _lava_post(url: str, headers: dict, payload: Optional[dict] = None) -> httpx.Response:
+    """POST to Lava through its circuit breaker (per-attempt timeout and retries are set there)"""
+    async def post(timeout: float) -> httpx.Response:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(url, headers=headers, json=payload)
+            response.raise_for_status()
+            return response
+    
+    return await resilience.lava.acall(post)
+
 
 class LavaSubs:
     """Lava payment provider client (PRODUCTION)"""
@@ -38,7 +52,6 @@ class LavaSubs:
             "Content-Type": "application/json"
         }
     
-    @backoff.on_exception(backoff.expo, httpx.HTTPError, max_tries=3)
     async def create_checkout(self, user_id: str, plan: str, period: str) -> dict:
         """Create checkout session for recurring subscription"""
         price_id = self.price_map.get((plan, period))
@@ -52,34 +65,28 @@ class LavaSubs:
             "cancel_url": f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/billing?canceled=true"
         }
         
-        async with httpx.AsyncClient() as client:
-            # TODO: Adjust based on actual Lava API spec
-            response = await client.post(
-                f"{self.base_url}{self.create_path}",
-                headers=self._get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return {
-                "checkout_url": data.get("checkout_url") or data.get("url"),
-                "provider_ref": data.get("subscription_id") or data.get("id")
-            }
+        # TODO: Adjust based on actual Lava API spec
+        response = await _lava_post(
+            f"{self.base_url}{self.create_path}",
+            self._get_headers(),
+            payload
+        )
+        data = response.json()
+        
+        return {
+            "checkout_url": data.get("checkout_url") or data.get("url"),
+            "provider_ref": data.get("subscription_id") or data.get("id")
+        }
     
-    @backoff.on_exception(backoff.expo, httpx.HTTPError, max_tries=3)
     async def cancel(self, provider_ref: str) -> bool:
         """Cancel subscription at provider"""
-        async with httpx.AsyncClient() as client:
-            # TODO: Adjust based on actual Lava API spec
-            response = await client.post(
-                f"{self.base_url}{self.cancel_path}/{provider_ref}",
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            return True
+        # TODO: Adjust based on actual Lava API spec
+        await _lava_post(
+            f"{self.base_url}{self.cancel_path}/{provider_ref}",
+            self._get_headers()
+        )
+        return True
     
-    @backoff.on_exception(backoff.expo, httpx.HTTPError, max_tries=3)
     async def create_portal_session(self, provider_ref: str) -> dict:
         """Create customer portal session"""
         payload = {
@@ -87,19 +94,17 @@ class LavaSubs:
             "return_url": f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/billing"
         }
         
-        async with httpx.AsyncClient() as client:
-            # TODO: Adjust based on actual Lava API spec
-            response = await client.post(
-                f"{self.base_url}{self.portal_path}",
-                headers=self._get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return {
-                "url": data.get("portal_url") or data.get("url")
-            }
+        # TODO: Adjust based on actual Lava API spec
+        response = await _lava_post(
+            f"{self.base_url}{self.portal_path}",
+            self._get_headers(),
+            payload
+        )
+        data = response.json()
+        
+        return {
+            "url": data.get("portal_url") or data.get("url")
+        }
     
     def parse_webhook(self, headers: dict, body_bytes: bytes) -> dict:
         """Parse and verify webhook from Lava"""
@@ -128,6 +133,7 @@ class LavaSubs:
         return {
             "type": event_type,
             "event_id": payload.get("id") or payload.get("event_id"),
+            "occurred_at": payload.get("created_at") or payload.get("timestamp"),
             "data": {
                 "user_reference": data.get("user_reference") or data.get("customer_id"),
                 "provider_ref": data.get("subscription_id") or data.get("id"),
@@ -172,7 +178,6 @@ class LavaSandboxSubs:
             "Content-Type": "application/json"
         }
     
-    @backoff.on_exception(backoff.expo, httpx.HTTPError, max_tries=3)
     async def create_checkout(self, user_id: str, plan: str, period: str) -> dict:
         """Create checkout session for test subscription"""
         price_id = self.price_map.get((plan, period))
@@ -190,32 +195,26 @@ class LavaSandboxSubs:
             "cancel_url": f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/billing?canceled=true"
         }
         
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.post(
-                f"{self.base_url}{self.create_path}",
-                headers=self._get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return {
-                "checkout_url": data.get("checkout_url") or data.get("hosted_url") or data.get("url"),
-                "provider_ref": data.get("id") or data.get("intent_id") or data.get("subscription_id")
-            }
+        response = await _lava_post(
+            f"{self.base_url}{self.create_path}",
+            self._get_headers(),
+            payload
+        )
+        data = response.json()
+        
+        return {
+            "checkout_url": data.get("checkout_url") or data.get("hosted_url") or data.get("url"),
+            "provider_ref": data.get("id") or data.get("intent_id") or data.get("subscription_id")
+        }
     
-    @backoff.on_exception(backoff.expo, httpx.HTTPError, max_tries=3)
     async def cancel(self, provider_ref: str) -> bool:
         """Cancel test subscription"""
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.post(
-                f"{self.base_url}{self.cancel_path}/{provider_ref}",
-                headers=self._get_headers()
-            )
-            response.raise_for_status()
-            return True
+        await _lava_post(
+            f"{self.base_url}{self.cancel_path}/{provider_ref}",
+            self._get_headers()
+        )
+        return True
     
-    @backoff.on_exception(backoff.expo, httpx.HTTPError, max_tries=3)
     async def create_portal_session(self, provider_ref: str) -> dict:
         """Create test customer portal session"""
         payload = {
@@ -223,18 +222,16 @@ class LavaSandboxSubs:
             "return_url": f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/billing"
         }
         
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.post(
-                f"{self.base_url}{self.portal_path}",
-                headers=self._get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            return {
-                "url": data.get("portal_url") or data.get("url")
-            }
+        response = await _lava_post(
+            f"{self.base_url}{self.portal_path}",
+            self._get_headers(),
+            payload
+        )
+        data = response.json()
+        
+        return {
+            "url": data.get("portal_url") or data.get("url")
+        }
     
     def parse_webhook(self, headers: dict, body_bytes: bytes) -> dict:
         """Parse and verify webhook from Lava Sandbox (auto-succeeds for testing)"""
@@ -247,7 +244,8 @@ class LavaSandboxSubs:
         
         return {
             "type": event_type,
-            "event_id": payload.get("id") or payload.get("event_id") or "test_event_id",
+            "event_id": payload.get("id") or payload.get("event_id"),
+            "occurred_at": payload.get("created_at") or payload.get("timestamp"),
             "data": {
                 "user_reference": data.get("user_reference") or data.get("customer_id"),
                 "provider_ref": data.get("subscription_id") or data.get("id"),
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Index, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Index, Boolean, Text, JSON, UniqueConstraint
 from datetime import datetime
 from db import Base
 
@@ -16,8 +16,37 @@ class Subscription(Base):
     ends_at = Column(DateTime, nullable=True)
     provider = Column(String, nullable=False)  # MOCK|LAVA
     provider_ref = Column(String, nullable=True)  # subscription id at provider
+    last_event_at = Column(DateTime, nullable=True)  # Provider timestamp of the newest applied webhook event
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
         Index('idx_provider_ref', 'provider_ref'),
+        # Expiry sweeper lookups
+        Index('idx_subscriptions_status_trial_ends', 'status', 'trial_ends_at'),
+        Index('idx_subscriptions_status_ends', 'status', 'ends_at'),
+    )
+
+class WebhookEvent(Base):
+    """Inbox of received payment webhooks, applied asynchronously by the webhook worker"""
+    __tablename__ = "webhook_events"
+
+    id = Column(Integer, primary_key=True)
+    provider = Column(String, nullable=False)  # MOCK|LAVA|LAVA_SANDBOX
+    event_id = Column(String, nullable=False)  # Provider event id (body hash if the provider sends none)
+    event_type = Column(String, nullable=True)
+    provider_ref = Column(String, nullable=True)
+    user_reference = Column(String, nullable=True)
+    occurred_at = Column(DateTime, nullable=False)  # Provider timestamp, falls back to received_at
+    data = Column(JSON, nullable=True)  # Normalized event data
+    status = Column(String, nullable=False, default="pending")  # pending|processing|processed|stale|ignored|failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # When a worker moved it to "processing"
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('provider', 'event_id', name='uq_webhook_events_provider_event'),
+        Index('idx_webhook_events_status_order', 'status', 'occurred_at', 'id'),
+        {'sqlite_autoincrement': True},
     )
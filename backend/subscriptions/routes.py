@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
+import hmac
+import math
 import os
 from auth.routes import get_current_user
 from db import get_db
+from resilience import DependencyUnavailable
 from .models import Subscription
 from .client import get_subs_client
+from .cache import invalidate_subscription
+from .webhooks import ingest_event, replay_events, webhook_metrics, webhook_worker
 
 router = APIRouter(prefix="/subscriptions", tags=["subscriptions"])
 
@@ -18,6 +24,14 @@ class MockActivateRequest(BaseModel):
     plan: str
     period: str
 
+class ReplayWebhooksRequest(BaseModel):
+    ids: Optional[List[int]] = None  # Inbox ids; omit to replay every failed event
+
+def provider_unavailable(error: DependencyUnavailable) -> HTTPException:
+    """503 (with Retry-After when known) while calls to the payment provider are failing fast"""
+    headers = {"Retry-After": str(max(math.ceil(error.retry_after), 1))} if error.retry_after else None
+    return HTTPException(503, f"Payment provider unavailable: {error}", headers=headers)
+
 @router.get("/me")
 async def get_my_subscription(
     current_user = Depends(get_current_user),
@@ -42,18 +56,16 @@ async def get_my_subscription(
             "trial_ends_at": None
         }
     
-    # Check if trial has expired
-    if subscription.is_trial and subscription.trial_ends_at:
-        if datetime.utcnow() > subscription.trial_ends_at:
-            subscription.status = "expired"
-            subscription.updated_at = datetime.utcnow()
-            db.commit()
+    # Read-only: the sweeper persists expiry; report a trial that ended since the last sweep as expired
+    subscription_status = subscription.status
+    if subscription_status == "trial" and subscription.trial_ends_at and datetime.utcnow() > subscription.trial_ends_at:
+        subscription_status = "expired"
     
     return {
         "id": subscription.id,
         "plan": subscription.plan,
         "period": subscription.period,
-        "status": subscription.status,
+        "status": subscription_status,
         "is_trial": subscription.is_trial,
         "trial_ends_at": subscription.trial_ends_at.isoformat() if subscription.trial_ends_at else None,
         "started_at": subscription.started_at.isoformat() if subscription.started_at else None,
@@ -113,11 +125,14 @@ async def create_subscription(
             subscription.provider_ref = result.get("provider_ref")
         
         db.commit()
+        invalidate_subscription(user_id)
         
         return {
             "checkout_url": result["checkout_url"],
             "provider_ref": result.get("provider_ref")
         }
+    except DependencyUnavailable as e:
+        raise provider_unavailable(e)
     except Exception as e:
         raise HTTPException(500, f"Failed to create checkout: {str(e)}")
 
@@ -148,8 +163,11 @@ async def cancel_subscription(
         subscription.status = "canceled"
         subscription.updated_at = datetime.utcnow()
         db.commit()
+        invalidate_subscription(user_id)
         
         return {"message": "Subscription canceled successfully", "ends_at": subscription.ends_at}
+    except DependencyUnavailable as e:
+        raise provider_unavailable(e)
     except Exception as e:
         raise HTTPException(500, f"Failed to cancel subscription: {str(e)}")
 
@@ -172,12 +190,17 @@ async def create_portal_session(
     try:
         result = await client.create_portal_session(subscription.provider_ref)
         return {"url": result["url"]}
+    except DependencyUnavailable as e:
+        raise provider_unavailable(e)
     except Exception as e:
         raise HTTPException(500, f"Failed to create portal session: {str(e)}")
 
 @router.post("/webhook")
 async def handle_webhook(request: Request, db: Session = Depends(get_db)):
-    """Handle webhook from payment provider"""
+    """
+    Receive a webhook from the payment provider.
+    Verifies and stores the event in the inbox, then acknowledges; the webhook worker applies it.
+    """
     headers = dict(request.headers)
     body_bytes = await request.body()
     
@@ -185,64 +208,37 @@ async def handle_webhook(request: Request, db: Session = Depends(get_db)):
     
     try:
         event = client.parse_webhook(headers, body_bytes)
-        
-        event_type = event.get("type")
-        data = event.get("data", {})
-        
-        user_id = data.get("user_reference")
-        provider_ref = data.get("provider_ref")
-        
-        if not user_id or not provider_ref:
-            return {"status": "ignored", "reason": "missing user or subscription reference"}
-        
-        # Get or create subscription
-        subscription = db.query(Subscription).filter(
-            Subscription.user_id == user_id
-        ).first()
-        
-        if not subscription:
-            subscription = Subscription(
-                user_id=user_id,
-                provider=os.getenv("SUBS_MODE", "MOCK"),
-                provider_ref=provider_ref
-            )
-            db.add(subscription)
-        
-        # Update based on event type
-        if event_type in ["subscription.active", "subscription.created"]:
-            subscription.status = "active"
-            subscription.plan = data.get("plan", subscription.plan)
-            subscription.period = data.get("period", subscription.period)
-            subscription.started_at = datetime.utcnow()
-            
-            # Calculate ends_at
-            if data.get("current_period_end"):
-                subscription.ends_at = datetime.fromisoformat(data["current_period_end"])
-            elif hasattr(client, 'calculate_period_end'):
-                subscription.ends_at = client.calculate_period_end(subscription.period)
-        
-        elif event_type == "subscription.renewed":
-            subscription.status = "active"
-            if data.get("current_period_end"):
-                subscription.ends_at = datetime.fromisoformat(data["current_period_end"])
-        
-        elif event_type == "subscription.past_due":
-            subscription.status = "past_due"
-        
-        elif event_type in ["subscription.canceled", "subscription.cancelled"]:
-            subscription.status = "canceled"
-        
-        elif event_type == "subscription.expired":
-            subscription.status = "expired"
-        
-        subscription.updated_at = datetime.utcnow()
-        db.commit()
-        
-        return {"status": "processed", "event_type": event_type}
-    
     except Exception as e:
         print(f"Webhook error: {e}")
         raise HTTPException(400, f"Webhook processing failed: {str(e)}")
+    
+    provider = os.getenv("SUBS_MODE", "MOCK").upper()
+    inbox_id = ingest_event(db, provider, event, body_bytes)
+    if inbox_id is None:
+        return {"status": "duplicate", "event_type": event.get("type")}
+    
+    webhook_worker.notify()
+    return {"status": "accepted", "event_type": event.get("type")}
+
+def require_ops_token(x_ops_token: Optional[str] = Header(None)):
+    """Operator endpoints need X-Ops-Token matching OPS_TOKEN (open in MOCK mode when unset)"""
+    expected = os.getenv("OPS_TOKEN")
+    if expected:
+        if not x_ops_token or not hmac.compare_digest(x_ops_token, expected):
+            raise HTTPException(403, "Invalid operator token")
+    elif os.getenv("SUBS_MODE", "MOCK").upper() != "MOCK":
+        raise HTTPException(403, "Set OPS_TOKEN to use operator endpoints")
+
+@router.get("/webhooks/metrics", dependencies=[Depends(require_ops_token)])
+def get_webhook_metrics(db: Session = Depends(get_db)):
+    """Webhook inbox backlog and worker counters"""
+    return webhook_metrics(db)
+
+@router.post("/webhooks/replay", dependencies=[Depends(require_ops_token)])
+def replay_webhooks(request: ReplayWebhooksRequest, db: Session = Depends(get_db)):
+    """Requeue the given inbox events, or all failed events when no ids are given"""
+    count = replay_events(db, request.ids)
+    return {"requeued": count}
 
 # MOCK-only endpoint for development
 @router.post("/mock/activate")
@@ -282,6 +278,7 @@ async def mock_activate(
     
     db.commit()
     db.refresh(subscription)
+    invalidate_subscription(user_id)
     
     return {
         "message": "Subscription activated",
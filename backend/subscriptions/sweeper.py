@@ -0,0 +1,100 @@
+"""
+Periodic subscription expiry sweep.
+
+Expired trials and lapsed subscriptions are transitioned to "expired" by two
+batch UPDATEs served by the (status, trial_ends_at) and (status, ends_at)
+indexes, instead of being evaluated (and written) lazily on read paths.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from .cache import invalidate_subscriptions
+from .models import Subscription
+
+SWEEPER_ENABLED = os.getenv("SUBSCRIPTION_SWEEPER_ENABLED", "true").lower() == "true"
+SWEEP_INTERVAL_SECONDS = int(os.getenv("SUBSCRIPTION_SWEEP_SECONDS", "60"))
+# Paid subscriptions get a grace period for late renewal webhooks; canceled ones end on time
+RENEWAL_GRACE = timedelta(hours=int(os.getenv("SUBSCRIPTION_GRACE_HOURS", "24")))
+
+
+def expire_subscriptions(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """
+    Mark expired trials and lapsed subscriptions as expired (caller commits).
+    Returns the affected user ids.
+    """
+    now = now or datetime.utcnow()
+    expired_trials = db.execute(
+        update(Subscription)
+        .where(Subscription.status == "trial", Subscription.trial_ends_at <= now)
+        .values(status="expired", updated_at=now)
+        .returning(Subscription.user_id)
+    ).scalars().all()
+
+    lapsed_paid = db.execute(
+        update(Subscription)
+        .where(Subscription.status.in_(("active", "past_due")), Subscription.ends_at <= now - RENEWAL_GRACE)
+        .values(status="expired", updated_at=now)
+        .returning(Subscription.user_id)
+    ).scalars().all()
+
+    lapsed_canceled = db.execute(
+        update(Subscription)
+        .where(Subscription.status == "canceled", Subscription.ends_at <= now)
+        .values(status="expired", updated_at=now)
+        .returning(Subscription.user_id)
+    ).scalars().all()
+
+    return expired_trials + lapsed_paid + lapsed_canceled
+
+
+def sweep() -> int:
+    """Run one sweep in its own session; returns the number of subscriptions expired"""
+    db = SessionLocal()
+    try:
+        user_ids = expire_subscriptions(db)
+        db.commit()
+    except Exception as e:
+        print(f"❌ Subscription sweep failed: {e}")
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+    invalidate_subscriptions(user_ids)
+    if user_ids:
+        print(f"⏳ Expired {len(user_ids)} subscriptions")
+    return len(user_ids)
+
+
+class SubscriptionSweeper:
+    def __init__(self, interval: int = SWEEP_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(sweep)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+subscription_sweeper = SubscriptionSweeper()
@@ -2,6 +2,7 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from subscriptions.models import Subscription
+from subscriptions.cache import invalidate_subscription
 
 TRIAL_DAYS = 3
 DEFAULT_TRIAL_PLAN = "plus"  # Give everyone Plus plan for trial
@@ -36,5 +37,6 @@ def activate_trial(user_id: str, db: Session):
     db.add(trial_sub)
     db.commit()
     db.refresh(trial_sub)
+    invalidate_subscription(user_id)
     
     return trial_sub
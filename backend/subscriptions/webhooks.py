@@ -0,0 +1,295 @@
+"""
+Payment webhook inbox.
+
+POST /subscriptions/webhook only verifies the payload and inserts it into
+webhook_events, keyed by (provider, event id), then acknowledges. Provider
+retries of an event we already have are acknowledged without side effects.
+
+WebhookWorker applies pending events in provider-timestamp order. Several
+workers may run it: an event is claimed (pending -> processing, a conditional
+UPDATE) before it is applied, so only one worker applies it, and a subscription
+with an event claimed elsewhere is skipped until that event is settled. Claims
+older than WEBHOOK_CLAIM_TIMEOUT_SECONDS (a worker died) go back to pending. Each
+subscription records the timestamp of the newest event applied to it
+(Subscription.last_event_at), so an older event arriving late is marked "stale"
+instead of regressing the state (e.g. a delayed "renewed" after "canceled").
+A failing event is retried up to MAX_ATTEMPTS times and blocks later events of
+the same subscription until it succeeds or is dead-lettered as "failed";
+failed events can be replayed.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from .cache import invalidate_subscription
+from .client import get_subs_client
+from .models import Subscription, WebhookEvent
+
+WORKER_ENABLED = os.getenv("WEBHOOK_WORKER_ENABLED", "true").lower() == "true"
+BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+CLAIM_TIMEOUT = timedelta(seconds=int(os.getenv("WEBHOOK_CLAIM_TIMEOUT_SECONDS", "300")))
+POLL_SECONDS = 5  # Also picks up events inserted by other workers and retries
+
+# In-process counters reported by webhook_metrics()
+_counters = {"received": 0, "duplicates": 0, "processed": 0, "stale": 0, "ignored": 0, "errors": 0}
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """ISO-8601 string or epoch seconds -> naive UTC datetime"""
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.utcfromtimestamp(value)
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def ingest_event(db: Session, provider: str, event: Dict, body_bytes: bytes) -> Optional[int]:
+    """
+    Persist a verified webhook event (commits). Returns the inbox id, or None if the
+    event was already received.
+    """
+    now = datetime.utcnow()
+    data = event.get("data") or {}
+    event_id = event.get("event_id") or event.get("id") or hashlib.sha256(body_bytes).hexdigest()
+
+    statement = insert(WebhookEvent).values(
+        provider=provider,
+        event_id=str(event_id),
+        event_type=event.get("type"),
+        provider_ref=data.get("provider_ref"),
+        user_reference=data.get("user_reference"),
+        occurred_at=_parse_timestamp(event.get("occurred_at") or event.get("created_at")) or now,
+        data=data,
+        status="pending",
+        attempts=0,
+        received_at=now
+    ).on_conflict_do_nothing(index_elements=[WebhookEvent.provider, WebhookEvent.event_id])
+
+    inbox_id = db.execute(statement.returning(WebhookEvent.id)).scalar()
+    db.commit()
+
+    _counters["received" if inbox_id else "duplicates"] += 1
+    return inbox_id
+
+
+def apply_event(db: Session, event: WebhookEvent, client) -> str:
+    """Apply one inbox event to its subscription (caller commits). Returns the new event status."""
+    data = event.data or {}
+    user_id = event.user_reference
+    provider_ref = event.provider_ref
+
+    if not user_id or not provider_ref:
+        event.error = "missing user or subscription reference"
+        return "ignored"
+
+    subscription = db.query(Subscription).filter(
+        Subscription.user_id == user_id
+    ).first()
+
+    if subscription and subscription.last_event_at and event.occurred_at < subscription.last_event_at:
+        return "stale"
+
+    if not subscription:
+        subscription = Subscription(
+            user_id=user_id,
+            provider=os.getenv("SUBS_MODE", "MOCK"),
+            provider_ref=provider_ref
+        )
+        db.add(subscription)
+
+    # Update based on event type
+    event_type = event.event_type
+    if event_type in ["subscription.active", "subscription.created"]:
+        subscription.status = "active"
+        subscription.plan = data.get("plan", subscription.plan)
+        subscription.period = data.get("period", subscription.period)
+        subscription.started_at = event.occurred_at
+
+        # Calculate ends_at
+        if data.get("current_period_end"):
+            subscription.ends_at = datetime.fromisoformat(data["current_period_end"])
+        elif hasattr(client, 'calculate_period_end'):
+            subscription.ends_at = client.calculate_period_end(subscription.period)
+
+    elif event_type == "subscription.renewed":
+        subscription.status = "active"
+        if data.get("current_period_end"):
+            subscription.ends_at = datetime.fromisoformat(data["current_period_end"])
+
+    elif event_type == "subscription.past_due":
+        subscription.status = "past_due"
+
+    elif event_type in ["subscription.canceled", "subscription.cancelled"]:
+        subscription.status = "canceled"
+
+    elif event_type == "subscription.expired":
+        subscription.status = "expired"
+
+    subscription.last_event_at = event.occurred_at
+    subscription.updated_at = datetime.utcnow()
+    return "processed"
+
+
+def _claim(db: Session, event_id: int) -> bool:
+    """Atomically move one event from pending to processing (commits); False if another worker got it"""
+    claimed = db.execute(
+        update(WebhookEvent)
+        .where(WebhookEvent.id == event_id, WebhookEvent.status == "pending")
+        .values(status="processing", claimed_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def process_pending(batch_size: int = BATCH_SIZE) -> int:
+    """Apply one batch of pending events in timestamp order; returns how many were handled"""
+    client = get_subs_client()
+    db = SessionLocal()
+    handled = 0
+    try:
+        # Release claims of workers that died mid-event
+        db.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.status == "processing", WebhookEvent.claimed_at < datetime.utcnow() - CLAIM_TIMEOUT)
+            .values(status="pending", claimed_at=None)
+        )
+        db.commit()
+        
+        # Subscriptions with an event in flight on another worker, or awaiting retry here
+        blocked = {
+            row.provider_ref or row.user_reference
+            for row in db.query(WebhookEvent.provider_ref, WebhookEvent.user_reference).filter(
+                WebhookEvent.status == "processing"
+            )
+        }
+        events = db.query(WebhookEvent).filter(
+            WebhookEvent.status == "pending"
+        ).order_by(WebhookEvent.occurred_at, WebhookEvent.id).limit(batch_size).all()
+
+        for event in events:
+            key = event.provider_ref or event.user_reference
+            if key in blocked:
+                continue
+            if not _claim(db, event.id):
+                # Taken by another worker: keep this subscription's later events behind it
+                blocked.add(key)
+                continue
+            try:
+                status = apply_event(db, event, client)
+                event.status = status
+                event.processed_at = datetime.utcnow()
+                event.attempts += 1
+                db.commit()
+                _counters[status] += 1
+                handled += 1
+                if status == "processed":
+                    invalidate_subscription(event.user_reference)
+            except Exception as e:
+                db.rollback()
+                attempts = event.attempts + 1
+                db.execute(
+                    update(WebhookEvent)
+                    .where(WebhookEvent.id == event.id)
+                    .values(
+                        attempts=attempts,
+                        error=str(e)[:1000],
+                        status="failed" if attempts >= MAX_ATTEMPTS else "pending",
+                        claimed_at=None
+                    )
+                )
+                db.commit()
+                _counters["errors"] += 1
+                print(f"❌ Webhook event {event.event_id} failed (attempt {attempts}): {e}")
+                if attempts < MAX_ATTEMPTS:
+                    blocked.add(key)
+    finally:
+        db.close()
+    return handled
+
+
+def replay_events(db: Session, inbox_ids: Optional[List[int]] = None) -> int:
+    """Requeue events (by inbox id, or every failed event) for the worker (commits)"""
+    statement = update(WebhookEvent).values(status="pending", attempts=0, error=None, processed_at=None)
+    if inbox_ids:
+        statement = statement.where(WebhookEvent.id.in_(inbox_ids))
+    else:
+        statement = statement.where(WebhookEvent.status == "failed")
+    count = db.execute(statement).rowcount
+    db.commit()
+    webhook_worker.notify()
+    return count
+
+
+def webhook_metrics(db: Session) -> Dict:
+    """Inbox backlog by status plus this process's ingestion/processing counters"""
+    by_status = dict(db.query(WebhookEvent.status, func.count(WebhookEvent.id)).group_by(WebhookEvent.status).all())
+    oldest_pending = db.query(func.min(WebhookEvent.received_at)).filter(WebhookEvent.status == "pending").scalar()
+    return {
+        "backlog": by_status.get("pending", 0),
+        "failed": by_status.get("failed", 0),
+        "by_status": by_status,
+        "oldest_pending_age_seconds": (datetime.utcnow() - oldest_pending).total_seconds() if oldest_pending else None,
+        "worker": {**_counters, "last_run_at": webhook_worker.last_run_at}
+    }
+
+
+class WebhookWorker:
+    def __init__(self, poll_seconds: float = POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.last_run_at: Optional[str] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wake the worker after new events were inserted (callable from any thread)"""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            started = time.monotonic()
+            handled = await asyncio.to_thread(process_pending)
+            self.last_run_at = datetime.utcnow().isoformat()
+            if handled >= BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(self.poll_seconds - (time.monotonic() - started), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+webhook_worker = WebhookWorker()
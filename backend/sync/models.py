@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
+from datetime import datetime
+from db import Base
+
+
+class SyncChange(Base):
+    """
+    Latest change per synced record, used as the delta-sync change feed.
+
+    id is the sync cursor: AUTOINCREMENT never reuses values, and every write replaces
+    the record's row (INSERT OR REPLACE), so each record keeps one row whose id only
+    grows. Deletes leave a row with op="delete" (the tombstone).
+    """
+    __tablename__ = "sync_changes"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity = Column(String, nullable=False)  # table name: meals, reminders, fitness_plans, ...
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # upsert | delete
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('entity', 'entity_id', name='uq_sync_changes_entity'),
+        Index('idx_sync_changes_user_cursor', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
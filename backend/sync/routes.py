@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session, undefer
+from typing import Dict, List
+
+from db import get_db
+from auth.routes import get_current_user
+from auth.models import User
+from sync.models import SyncChange
+from sync.tracker import SYNC_ENTITIES
+from nutrition.models import Meal, MealPlan
+from hydration.models import HydrationLog
+from sleep.models import SleepLog
+from mind.models import MoodLog
+from mind.schemas import MoodResponse
+from reminder.models import Reminder
+from appointment.models import Appointment
+from status.models import Caretaker
+from fitness.models import FitnessPlan
+from schemas import (
+    MealResponse, HydrationResponse, SleepLogResponse,
+    ReminderResponse, AppointmentResponse, CaretakerResponse
+)
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+def _serialize_fitness_plan(plan: FitnessPlan) -> dict:
+    return {
+        "id": plan.id,
+        "goal_id": plan.goal_id,
+        "plan_data": plan.plan_data,
+        "is_active": plan.is_active,
+        "created_at": plan.created_at.isoformat() if plan.created_at else None
+    }
+
+
+def _serialize_meal_plan(plan: MealPlan) -> dict:
+    return {
+        "id": plan.id,
+        "expectations": plan.expectations,
+        "plan_data": plan.plan_data,
+        "modification_notes": plan.modification_notes,
+        "sources": plan.sources or [],
+        "is_active": plan.is_active,
+        "created_at": plan.created_at.isoformat() if plan.created_at else None
+    }
+
+
+def _schema_serializer(schema):
+    return lambda obj: schema.model_validate(obj).model_dump(mode="json")
+
+
+# entity (table name) -> (model, serializer)
+SYNC_MODELS = {
+    "meals": (Meal, _schema_serializer(MealResponse)),
+    "hydration_logs": (HydrationLog, _schema_serializer(HydrationResponse)),
+    "sleep_logs": (SleepLog, _schema_serializer(SleepLogResponse)),
+    "mood_logs": (MoodLog, _schema_serializer(MoodResponse)),
+    "reminders": (Reminder, _schema_serializer(ReminderResponse)),
+    "appointments": (Appointment, _schema_serializer(AppointmentResponse)),
+    "caretakers": (Caretaker, _schema_serializer(CaretakerResponse)),
+    "fitness_plans": (FitnessPlan, _serialize_fitness_plan),
+    "meal_plans": (MealPlan, _serialize_meal_plan),
+}
+
+
+@router.get("")
+def get_changes(
+    since: int = Query(0, ge=0, description="Cursor returned by the previous sync; 0 for a full sync"),
+    limit: int = Query(500, ge=1, le=2000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get every create, update and delete since a cursor.
+    
+    Returns the records changed after `since`, grouped by collection, with deletes as
+    id tombstones. Store the returned cursor and pass it as `since` next time; keep
+    calling while has_more is true.
+    """
+    changes = db.query(SyncChange).filter(
+        SyncChange.user_id == current_user.id,
+        SyncChange.id > since
+    ).order_by(SyncChange.id).limit(limit + 1).all()
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    upsert_ids: Dict[str, List[int]] = {}
+    deletes: Dict[str, List[int]] = {}
+    for change in changes:
+        target = deletes if change.op == "delete" else upsert_ids
+        target.setdefault(change.entity, []).append(change.entity_id)
+    
+    result = {}
+    for entity, (model, serialize) in SYNC_MODELS.items():
+        ids = upsert_ids.get(entity, [])
+        records = []
+        if ids:
+            records = db.query(model).options(undefer("*")).filter(
+                model.id.in_(ids),
+                model.user_id == current_user.id
+            ).all()
+        if records or deletes.get(entity):
+            result[entity] = {
+                "upserts": [serialize(record) for record in records],
+                "deletes": deletes.get(entity, [])
+            }
+    
+    return {
+        "cursor": changes[-1].id if changes else since,
+        "has_more": has_more,
+        "changes": result
+    }
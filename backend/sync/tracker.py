@@ -0,0 +1,63 @@
+"""
+Change tracking for delta sync.
+
+An after_flush listener records every ORM insert, update and delete of a synced
+table into sync_changes inside the same transaction. Writes that bypass the unit
+of work (bulk inserts, query-level UPDATEs) must call record_changes() themselves.
+"""
+from datetime import datetime
+from typing import Iterable
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from sync.models import SyncChange
+
+# Table names exposed through GET /sync
+SYNC_ENTITIES = (
+    "meals",
+    "hydration_logs",
+    "sleep_logs",
+    "mood_logs",
+    "reminders",
+    "appointments",
+    "caretakers",
+    "fitness_plans",
+    "meal_plans",
+)
+
+_upsert_changes = insert(SyncChange.__table__).prefix_with("OR REPLACE")
+
+
+def _write_changes(connection, rows):
+    if rows:
+        connection.execute(_upsert_changes, rows)
+
+
+def record_changes(db: Session, model, user_id: int, ids: Iterable[int], op: str = "upsert"):
+    """Record changes made outside the ORM unit of work (caller commits)"""
+    now = datetime.utcnow()
+    _write_changes(db.connection(), [
+        {"user_id": user_id, "entity": model.__tablename__, "entity_id": entity_id, "op": op, "changed_at": now}
+        for entity_id in ids
+    ])
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush(session, flush_context):
+    now = datetime.utcnow()
+    rows = []
+    
+    def _collect(objects, op, only_modified=False):
+        for obj in objects:
+            table = getattr(obj, "__tablename__", None)
+            if table not in SYNC_ENTITIES:
+                continue
+            if only_modified and not session.is_modified(obj, include_collections=False):
+                continue
+            rows.append({"user_id": obj.user_id, "entity": table, "entity_id": obj.id, "op": op, "changed_at": now})
+    
+    _collect(session.new, "upsert")
+    _collect(session.dirty, "upsert", only_modified=True)
+    _collect(session.deleted, "delete")
+    
+    _write_changes(session.connection(), rows)
@@ -286,9 +286,13 @@ const HealthRecords = () => {
                       </div>
                     </div>
                     <div className="report-status">
-                      {report.analysis_status === 'completed' ? (
+                      {report.analysis_status === 'completed' || report.analysis_status === 'partial' ? (
                         <>
-                          <CheckCircle size={20} className="status-icon success" />
+                          {report.analysis_status === 'partial' ? (
+                            <AlertCircle size={20} className="status-icon error" title="Part of the report could not be analyzed" />
+                          ) : (
+                            <CheckCircle size={20} className="status-icon success" />
+                          )}
                           <Button 
                             variant="secondary"
                             onClick={() => viewAnalysis(report.id)}